@@ -0,0 +1,84 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Optional
+
+from database import DatabaseManager
+
+
+def normalize_question(question: str) -> str:
+    """Case, spacing and trailing punctuation do not change the question."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.…")
+
+
+class AnswerCache:
+    """Opt-in cache of assistant answers to repeated questions, stored in SQLite.
+
+    Entries are keyed on the assistant, the normalized question and the universal prompt
+    version, expire after ``ttl_seconds`` and are evicted least recently used first beyond
+    ``max_entries``. Every hit saves the cost and run time of the answer it replays.
+    """
+
+    def __init__(self, db: DatabaseManager, enabled: bool = False, ttl_seconds: float = 86400.0,
+                 max_entries: int = 5000):
+        self.db = db
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_euros = 0.0
+        self.saved_ms = 0
+
+    def key_for(self, assistant_id: str, question: str, prompt_version: str) -> str:
+        raw = "\0".join((assistant_id, prompt_version, normalize_question(question)))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, assistant_id: str, question: str, prompt_version: str) -> Optional[str]:
+        """Cached answer, or None."""
+        if not self.enabled:
+            return None
+        entry = self.db.get_cached_answer(self.key_for(assistant_id, question, prompt_version), self.ttl_seconds)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_euros += entry['cost_euros']
+            self.saved_ms += entry['response_time_ms']
+        return entry['answer']
+
+    def put(self, assistant_id: str, question: str, prompt_version: str, answer: str,
+            input_tokens: int, output_tokens: int, response_time_ms: int):
+        if not self.enabled:
+            return
+        self.db.put_cached_answer(
+            self.key_for(assistant_id, question, prompt_version), assistant_id, normalize_question(question),
+            answer, input_tokens, output_tokens, response_time_ms, self.max_entries
+        )
+
+    def invalidate(self, assistant_id: str = None) -> int:
+        """Drop the answers of one assistant (chat cleared) or all of them (prompt changed)."""
+        return self.db.clear_cached_answers(assistant_id)
+
+    def purge_expired(self) -> int:
+        return self.db.clear_cached_answers(ttl_seconds=self.ttl_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'saved_euros': round(self.saved_euros, 4),
+                'saved_ms': self.saved_ms
+            }
+        # Savings recorded on the entries still cached, across all workers and restarts
+        stats['stored'] = self.db.get_answer_cache_savings()
+        return stats
@@ -0,0 +1,133 @@
+import asyncio
+import datetime
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from database import DatabaseManager
+from thread_registry import api_key_hash
+
+
+class AssistantReconciler:
+    """Keeps the local ``assistants`` table in line with the OpenAI assistants of each API key.
+
+    Listings are served from the local table; this runs the remote listing (all pages) off the
+    request path: once for a key the first time it is seen, then every ``interval`` seconds for
+    keys seen within ``key_ttl``. Remote listings are cached per key for ``remote_ttl`` seconds.
+    """
+
+    def __init__(self, db: DatabaseManager, get_client: Callable[[str], OpenAI], interval: float = 300.0,
+                 remote_ttl: float = 30.0, key_ttl: float = 86400.0, max_keys: int = 1000):
+        self.db = db
+        self.get_client = get_client
+        self.interval = interval
+        self.remote_ttl = remote_ttl
+        self.key_ttl = key_ttl
+        self.max_keys = max_keys
+        self._keys: Dict[str, Tuple[str, float]] = {}  # key hash -> (api key, last seen)
+        self._reconciled: Dict[str, float] = {}
+        self._remote: Dict[str, Tuple[float, str, List[Dict[str, Any]]]] = {}
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self.remote_hits = 0
+        self.remote_misses = 0
+        self.runs = 0
+        self.errors = 0
+        self.last_counts: Dict[str, int] = {}
+
+    def note_key(self, api_key: str) -> bool:
+        """Record that a key is in use; True if it was never reconciled by this process."""
+        key_hash = api_key_hash(api_key)
+        now = time.monotonic()
+        with self._lock:
+            self._keys[key_hash] = (api_key, now)
+            if len(self._keys) > self.max_keys:
+                oldest = min(self._keys, key=lambda k: self._keys[k][1])
+                del self._keys[oldest]
+            return key_hash not in self._reconciled and key_hash not in self._inflight
+
+    def remote_assistants(self, api_key: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """All assistants of a key (id, name, created_at) and the UTC time of the listing."""
+        key_hash = api_key_hash(api_key)
+        with self._lock:
+            cached = self._remote.get(key_hash)
+            if cached and time.monotonic() - cached[0] < self.remote_ttl:
+                self.remote_hits += 1
+                return cached[1], cached[2]
+            self.remote_misses += 1
+
+        listed_at = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        assistants = [
+            {
+                'id': assistant.id,
+                'name': assistant.name,
+                'created_at': datetime.datetime.utcfromtimestamp(assistant.created_at).strftime('%Y-%m-%d %H:%M:%S')
+            }
+            # Iterating the page follows the pagination cursor (no truncation at 100)
+            for assistant in self.get_client(api_key).beta.assistants.list(limit=100)
+        ]
+        with self._lock:
+            self._remote[key_hash] = (time.monotonic(), listed_at, assistants)
+        return listed_at, assistants
+
+    def invalidate(self, api_key: str):
+        """Forget the cached remote listing of a key (after a create or delete)."""
+        with self._lock:
+            self._remote.pop(api_key_hash(api_key), None)
+
+    def reconcile(self, api_key: str) -> Optional[Dict[str, int]]:
+        """Synchronise one key now; returns the change counts (None if already running)."""
+        key_hash = api_key_hash(api_key)
+        with self._lock:
+            if key_hash in self._inflight:
+                return None
+            self._inflight.add(key_hash)
+        try:
+            listed_at, remote = self.remote_assistants(api_key)
+            counts = self.db.reconcile_assistants(key_hash, remote, listed_at)
+            with self._lock:
+                self._reconciled[key_hash] = time.monotonic()
+                self.runs += 1
+                self.last_counts = counts
+            if any(counts.values()):
+                print(f"🔄 Assistants reconciled: {counts}")
+            return counts
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️ Assistant reconciliation failed: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.discard(key_hash)
+
+    async def reconcile_async(self, api_key: str):
+        await asyncio.to_thread(self.reconcile, api_key)
+
+    async def run(self):
+        """Reconcile the recently seen keys every ``interval`` seconds (until cancelled)."""
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            with self._lock:
+                for key_hash in [k for k, (_, seen) in self._keys.items() if now - seen > self.key_ttl]:
+                    del self._keys[key_hash]
+                    self._reconciled.pop(key_hash, None)
+                    self._remote.pop(key_hash, None)
+                keys = [api_key for api_key, _ in self._keys.values()]
+            for api_key in keys:
+                await self.reconcile_async(api_key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'keys': len(self._keys),
+                'interval_seconds': self.interval,
+                'runs': self.runs,
+                'errors': self.errors,
+                'remote_cache_hits': self.remote_hits,
+                'remote_cache_misses': self.remote_misses,
+                'last_changes': dict(self.last_counts)
+            }
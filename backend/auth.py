@@ -0,0 +1,134 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+
+from database import DatabaseManager
+
+ROLES = ("user", "admin")
+
+
+class Authenticator:
+    """JWT issuing and verification with in-process caches of decoded tokens and user roles.
+
+    A token is decoded and its signature checked once; later requests with the same token are
+    answered from a bounded LRU cache for ``token_cache_seconds`` (never past the token's own
+    expiry). Tokens carry the user's role at login. The claim is only trusted to refuse: a token
+    issued to a non-admin never grants admin access, so those requests need no lookup, and a
+    promoted user logs in again to get an admin token. Admin access is always checked against the
+    current role, cached for ``role_cache_seconds``, so a demotion takes effect immediately in
+    this process (``set_role`` invalidates the cache) and within ``role_cache_seconds`` in the
+    other worker processes.
+    """
+
+    def __init__(self, db: DatabaseManager, secret_key: str, algorithm: str = "HS256", expire_hours: float = 24,
+                 token_cache_seconds: float = 300.0, role_cache_seconds: float = 30.0, max_entries: int = 10000):
+        self.db = db
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.expire_hours = expire_hours
+        self.token_cache_seconds = token_cache_seconds
+        self.role_cache_seconds = role_cache_seconds
+        self.max_entries = max_entries
+        # token -> (claims, cached until (monotonic), token expiry (epoch))
+        self._tokens: "OrderedDict[str, Tuple[Dict[str, Any], float, float]]" = OrderedDict()
+        # user id -> (role, cached at (monotonic))
+        self._roles: Dict[int, Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+        self.token_hits = 0
+        self.token_misses = 0
+        self.role_hits = 0
+        self.role_misses = 0
+        self.denied_by_claim = 0
+        self.evictions = 0
+
+    def create_token(self, user_id: int, role: str) -> str:
+        expire = datetime.datetime.utcnow() + datetime.timedelta(hours=self.expire_hours)
+        return jwt.encode({"user_id": user_id, "role": role, "exp": expire}, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Optional[Dict[str, Any]]:
+        """Claims of a valid token ({'user_id', 'role'}, role None for tokens issued without it), else None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry and now < entry[1] and time.time() < entry[2]:
+                self._tokens.move_to_end(token)
+                self.token_hits += 1
+                return entry[0]
+            self.token_misses += 1
+
+        try:
+            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return None
+        if payload.get("user_id") is None:
+            return None
+        claims = {'user_id': payload["user_id"], 'role': payload.get("role")}
+        expires = float(payload.get("exp", time.time() + self.token_cache_seconds))
+        with self._lock:
+            self._tokens[token] = (claims, now + self.token_cache_seconds, expires)
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.max_entries:
+                self._tokens.popitem(last=False)
+                self.evictions += 1
+        return claims
+
+    def role(self, user_id: int) -> Optional[str]:
+        """Current role of a user (None if the user does not exist)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._roles.get(user_id)
+            if entry and now - entry[1] < self.role_cache_seconds:
+                self.role_hits += 1
+                return entry[0]
+            self.role_misses += 1
+        role = self.db.get_user_role(user_id)
+        with self._lock:
+            if len(self._roles) >= self.max_entries:
+                self._roles.clear()
+            self._roles[user_id] = (role, now)
+        return role
+
+    def is_admin(self, claims: Dict[str, Any]) -> bool:
+        """Whether the holder of a decoded token has the admin role now."""
+        if claims['role'] is not None and claims['role'] != 'admin':
+            with self._lock:
+                self.denied_by_claim += 1
+            return False
+        return self.role(claims['user_id']) == 'admin'
+
+    def set_role(self, user_id: int, role: str) -> bool:
+        """Change a user's role and drop its cached role; False if the user does not exist."""
+        if role not in ROLES:
+            raise ValueError(f"Unknown role '{role}', use {', '.join(ROLES)}")
+        updated = self.db.set_user_role(user_id, role)
+        self.invalidate_user(user_id)
+        return updated
+
+    def invalidate_user(self, user_id: int):
+        """Forget the cached role of a user (its next admin request reads it from the database)."""
+        with self._lock:
+            self._roles.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            token_lookups = self.token_hits + self.token_misses
+            role_lookups = self.role_hits + self.role_misses
+            return {
+                'cached_tokens': len(self._tokens),
+                'cached_roles': len(self._roles),
+                'max_entries': self.max_entries,
+                'token_hits': self.token_hits,
+                'token_misses': self.token_misses,
+                'token_hit_rate': round(self.token_hits / token_lookups, 3) if token_lookups else 0.0,
+                'role_hits': self.role_hits,
+                'role_misses': self.role_misses,
+                'role_hit_rate': round(self.role_hits / role_lookups, 3) if role_lookups else 0.0,
+                'denied_by_claim': self.denied_by_claim,
+                'evictions': self.evictions,
+                'token_cache_seconds': self.token_cache_seconds,
+                'role_cache_seconds': self.role_cache_seconds
+            }
@@ -0,0 +1,92 @@
+"""Answer cache on repeated analytical questions, against a local mock OpenAI server.
+
+Replays a question mix where analysts repeat questions with different case, spacing and punctuation,
+then checks that updating the universal prompt and clearing the chat invalidate the cache.
+
+Usage (from backend/): python -m benchmarks.bench_answer_cache --questions 40 --run-seconds 1
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.mock_openai import BackgroundServer, create_mock_app
+
+BASE_QUESTIONS = [
+    "Quels sont les top segments par Indice ?",
+    "Profil des femmes 25-34 ans",
+    "Compare les CSP+ et les retraités",
+    "Quels segments sont sous-représentés ?",
+    "Synthèse des 15-24 ans",
+]
+
+
+def _variant(question: str, rng: random.Random) -> str:
+    """Same question as typed again: other case, spacing or final punctuation."""
+    variants = [question, question.lower(), question.upper(), f"  {question}  ", question.rstrip(" ?") + " ?"]
+    return rng.choice(variants)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--run-seconds", type=float, default=1.0)
+    parser.add_argument("--mock-port", type=int, default=8774)
+    parser.add_argument("--api-port", type=int, default=8775)
+    args = parser.parse_args()
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    os.environ["ANSWER_CACHE_ENABLED"] = "true"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock-key")
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The API keeps its SQLite database and caches in the working directory
+        os.chdir(tmp)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import main as api
+
+        api.db.log_assistant_creation("asst_cache", "Bench", "Automobile", 1, "tgi.json", "JSON")
+        with BackgroundServer(create_mock_app(run_seconds=args.run_seconds), args.mock_port), \
+                BackgroundServer(api.app, args.api_port) as server, \
+                httpx.Client(base_url=server.url, timeout=60) as client:
+            token = client.post("/auth/login", json={"username": "admin", "password": "admin123"}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}", "X-OpenAI-Key": "sk-mock-key"}
+
+            def ask(question: str):
+                start = time.perf_counter()
+                r = client.post("/assistants/asst_cache/message", headers=headers, json={"message": question})
+                r.raise_for_status()
+                return r.json()["cached"], time.perf_counter() - start
+
+            latencies = {True: [], False: []}
+            for _ in range(args.questions):
+                cached, elapsed = ask(_variant(rng.choice(BASE_QUESTIONS), rng))
+                latencies[cached].append(elapsed)
+            stats = client.get("/admin/stats", headers=headers).json()["answer_cache"]
+
+            # Invalidation: a prompt change, then a chat clear, must both force a new run
+            client.put("/settings/universal-prompt", headers=headers, json={"prompt_content": "Thème : {theme}"})
+            after_prompt, _ = ask(BASE_QUESTIONS[0])
+            client.delete("/assistants/asst_cache/messages", headers=headers)
+            after_clear, _ = ask(BASE_QUESTIONS[0])
+            again, _ = ask(BASE_QUESTIONS[0].lower())
+            client.post("/settings/universal-prompt/reset", headers=headers)
+
+    print(f"{args.questions} questions drawn from {len(BASE_QUESTIONS)}, mock run time {args.run_seconds:.1f}s")
+    print(f"  hits/misses : {len(latencies[True])}/{len(latencies[False])} (hit rate {stats['hit_rate']:.0%})")
+    print(f"  latency     : uncached {statistics.median(latencies[False]) * 1000:.0f} ms, "
+          f"cached {statistics.median(latencies[True]) * 1000:.1f} ms (median)")
+    print(f"  saved       : {stats['saved_euros']:.4f} EUR, {stats['saved_ms'] / 1000:.1f} s of assistant runs")
+    print(f"  invalidation: after prompt change cached={after_prompt}, after chat clear cached={after_clear}, "
+          f"repeated afterwards cached={again}")
+    assert not after_prompt and not after_clear and again
+
+
+if __name__ == "__main__":
+    main()
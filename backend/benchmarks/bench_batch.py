@@ -0,0 +1,47 @@
+"""Scaling of the parallel batch converter with the process pool size.
+
+Usage (from backend/): python -m benchmarks.bench_batch --files 8 --size 100x100
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from conversion import available_cpus, convert_tgi_batch
+from benchmarks.synthetic import write_tgi_workbook
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--size", default="100x100", help="GROUPSxSEGMENTS per workbook")
+    parser.add_argument("--workers", default=None,
+                        help="comma-separated pool sizes (default: powers of two up to the available cores)")
+    args = parser.parse_args()
+
+    n_groups, n_segments = (int(x) for x in args.size.split("x"))
+    cpus = available_cpus()
+    if args.workers:
+        pool_sizes = [int(w) for w in args.workers.split(",")]
+    else:
+        pool_sizes = sorted({1, cpus} | {2 ** k for k in range(1, 8) if 2 ** k < cpus})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            write_tgi_workbook(os.path.join(tmp, f"wave_{i}.xlsx"), n_groups, n_segments, seed=i)
+            for i in range(args.files)
+        ]
+        print(f"{args.files} workbooks of {args.size}, {cpus} cores available")
+        print(f"{'workers':>8} {'rows':>9} {'wall (s)':>9} {'speedup':>8} {'efficiency':>11}")
+        baseline = None
+        for workers in pool_sizes:
+            start = time.perf_counter()
+            merged, _ = convert_tgi_batch(paths, max_workers=workers)
+            wall = time.perf_counter() - start
+            baseline = baseline or wall
+            speedup = baseline / wall
+            print(f"{workers:>8} {len(merged):>9} {wall:>9.2f} {speedup:>7.2f}x {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
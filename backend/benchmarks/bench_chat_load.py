@@ -0,0 +1,88 @@
+"""Load test of POST /assistants/{id}/message against a local mock OpenAI server.
+
+Fires concurrent chat requests while probing GET / to show the event loop stays responsive.
+
+Usage (from backend/): python -m benchmarks.bench_chat_load --concurrency 50 --run-seconds 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.mock_openai import BackgroundServer, create_mock_app
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+async def _load(api_url: str, token: str, concurrency: int, assistant_id: str):
+    headers = {"Authorization": f"Bearer {token}", "X-OpenAI-Key": "sk-mock-key"}
+    chat_latencies, probe_latencies = [], []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=api_url, timeout=120,
+                                 limits=httpx.Limits(max_connections=concurrency + 10)) as client:
+        async def chat(i: int):
+            start = time.perf_counter()
+            r = await client.post(f"/assistants/{assistant_id}/message", headers=headers,
+                                  json={"message": f"Question {i} : top segments par Indice ?"})
+            r.raise_for_status()
+            chat_latencies.append(time.perf_counter() - start)
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.02)
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(chat(i) for i in range(concurrency)))
+        wall = time.perf_counter() - start
+        done.set()
+        await prober
+    return wall, chat_latencies, probe_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--run-seconds", type=float, default=2.0, help="mock run duration")
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--api-port", type=int, default=8766)
+    args = parser.parse_args()
+
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    os.environ["OPENAI_BASE_URL"] = f"{mock_url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock-key")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The API keeps its SQLite database and caches in the working directory
+        os.chdir(tmp)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import main as api
+
+        api.db.log_assistant_creation("asst_bench", "Bench", "Automobile", 1, "tgi.json", "JSON")
+        with BackgroundServer(create_mock_app(run_seconds=args.run_seconds), args.mock_port), \
+                BackgroundServer(api.app, args.api_port) as server:
+            token = httpx.post(f"{server.url}/auth/login",
+                               json={"username": "admin", "password": "admin123"}).json()["token"]
+            wall, chats, probes = asyncio.run(_load(server.url, token, args.concurrency, "asst_bench"))
+
+    print(f"{args.concurrency} concurrent chats, mock run time {args.run_seconds:.1f}s")
+    print(f"  wall time            : {wall:.2f}s ({args.concurrency / wall:.1f} chats/s)")
+    print(f"  chat latency p50/p95 : {_pct(chats, 0.5):.0f} / {_pct(chats, 0.95):.0f} ms")
+    print(f"  GET / latency p50/p95/max: {statistics.median(probes) * 1000:.1f} / {_pct(probes, 0.95):.1f} / {max(probes) * 1000:.1f} ms "
+          f"over {len(probes)} probes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Input tokens per question over a long conversation, by context strategy.
+
+Holds one conversation per strategy (whole thread, last messages, last messages with a rolling
+summary) against a local mock whose runs bill the thread messages they keep, and reports the
+input tokens of the answers by position in the conversation, as /analytics/data does.
+
+Usage (from backend/): python -m benchmarks.bench_context --turns 40 --last-messages 6
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.mock_openai import BackgroundServer, create_mock_app
+
+# About 120 words, the length of a short audience analysis
+REPLY = " ".join(["Synthèse : les 25-34 ans sont surreprésentés (Indice 142), les CSP+ suivent (Indice 128)."] * 8)
+
+
+def _ask(client: httpx.Client, headers, assistant_id: str, question: str) -> dict:
+    """Stream one answer and return its final ``done`` event."""
+    with client.stream("POST", f"/assistants/{assistant_id}/message/stream", headers=headers,
+                       json={"message": question}) as r:
+        r.raise_for_status()
+        event = None
+        for line in r.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "error":
+                    raise RuntimeError(data["detail"])
+                if event == "done":
+                    return data
+    raise RuntimeError("Stream ended without a done event")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--last-messages", type=int, default=6)
+    parser.add_argument("--mock-port", type=int, default=8778)
+    parser.add_argument("--api-port", type=int, default=8779)
+    args = parser.parse_args()
+
+    configs = {
+        "full": {"strategy": "full"},
+        "last_messages": {"strategy": "last_messages", "last_messages": args.last_messages, "summary": False},
+        "last_messages+summary": {"strategy": "last_messages", "last_messages": args.last_messages, "summary": True},
+    }
+    mock = create_mock_app(run_seconds=0.01, reply=REPLY, first_token_seconds=0.01, token_seconds=0.0,
+                           simulate_history=True)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock-key")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The API keeps its SQLite database and caches in the working directory
+        os.chdir(tmp)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import main as api
+
+        with BackgroundServer(mock, args.mock_port), BackgroundServer(api.app, args.api_port) as server, \
+                httpx.Client(base_url=server.url, timeout=60) as client:
+            token = client.post("/auth/login", json={"username": "admin", "password": "admin123"}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}", "X-OpenAI-Key": "sk-mock-key"}
+
+            tokens = {}
+            for label, settings in configs.items():
+                assistant_id = f"asst_context_{label.replace('+', '_')}"
+                api.db.log_assistant_creation(assistant_id, label, "Automobile", 1, "tgi.json", "JSON")
+                client.put(f"/assistants/{assistant_id}/context", headers=headers, json=settings).raise_for_status()
+                tokens[label] = []
+                for turn in range(1, args.turns + 1):
+                    question = (f"Question {turn} : sur la cible Critère {turn % 7}: Modalité {turn}, quels segments "
+                                f"ressortent avec l'Indice le plus élevé et comment se compare-t-elle à l'ensemble ?")
+                    tokens[label].append(_ask(client, headers, assistant_id, question)["input_tokens"])
+                    # Leave the background summary time to finish, as a user reading the answer would
+                    while client.get("/admin/stats", headers=headers).json()["context"]["summaries_in_progress"]:
+                        time.sleep(0.01)
+
+            api.message_writer.flush()
+            analytics = client.get("/analytics/data", headers=headers).json()
+            stats = client.get("/admin/stats", headers=headers).json()["context"]
+
+    print(f"{args.turns} turns per conversation, {REPLY.count(' ') + 1}-word answers, "
+          f"last_messages={args.last_messages}")
+    for label, values in tokens.items():
+        print(f"  {label:22s}: turn 1 {values[0]:6d}, turn {args.turns} {values[-1]:6d}, "
+              f"mean {sum(values) // len(values):6d} input tokens")
+    print("  /analytics/data tokens_by_context_turn:")
+    for row in analytics["tokens_by_context_turn"]:
+        print(f"    {row['context_strategy']:22s} turns {row['turns']:>5s}: {row['avg_input_tokens']:6d} input tokens, "
+              f"{row['cost_euros']:.4f} EUR")
+    summaries = analytics["context_summaries"]
+    print(f"  summaries: {stats['summaries']} ({summaries['input_tokens']} input / "
+          f"{summaries['output_tokens']} output tokens on {stats['summary_model']})")
+
+
+if __name__ == "__main__":
+    main()
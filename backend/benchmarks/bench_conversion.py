@@ -0,0 +1,107 @@
+"""Benchmark of the TGI block converter against the original per-segment loop.
+
+Usage (from backend/): python -m benchmarks.bench_conversion
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from conversion import HEADER_ROWS, tgi_frame_to_long
+from benchmarks.synthetic import make_tgi_frame
+
+
+def legacy_frame_to_long(df: pd.DataFrame) -> pd.DataFrame:
+    """Original converter loop, kept as the reference for output equality."""
+    segments = df.iloc[0, 3:].tolist()
+    rows = []
+
+    total_block = df.iloc[1:6, :]
+    for seg_idx, segment in enumerate(segments):
+        seg_col_idx = 3 + seg_idx
+        label_val = dict(zip(total_block.iloc[:, 1], total_block.iloc[:, seg_col_idx]))
+        rows.append({
+            "Groupe_interviewé": "Total interviewé",
+            "Segment": segment,
+            "Echantillon": label_val.get("Echantillon"),
+            "(000)": label_val.get("(000)"),
+            "% Vert": label_val.get("% Vert"),
+            "% Horz": label_val.get("% Horz"),
+            "Indice": label_val.get("Indice"),
+        })
+    block_total = dict(zip(total_block.iloc[:, 1], total_block.iloc[:, 2]))
+    rows.append({
+        "Groupe_interviewé": "Total interviewé",
+        "Segment": "Total",
+        "Echantillon": block_total.get("Echantillon"),
+        "(000)": block_total.get("(000)"),
+        "% Vert": block_total.get("% Vert"),
+        "% Horz": block_total.get("% Horz"),
+        "Indice": block_total.get("Indice"),
+    })
+
+    group_indices = df.index[df[0].fillna("").str.contains("Interviewé:")].tolist()
+    for idx in group_indices:
+        group_name = df.iloc[idx, 0].strip()
+        if idx >= 5:
+            block = df.iloc[idx-5:idx, :]
+            for seg_idx, segment in enumerate(segments):
+                seg_col_idx = 3 + seg_idx
+                label_val = dict(zip(block.iloc[:, 1], block.iloc[:, seg_col_idx]))
+                rows.append({
+                    "Groupe_interviewé": group_name,
+                    "Segment": segment,
+                    "Echantillon": label_val.get("Echantillon"),
+                    "(000)": label_val.get("(000)"),
+                    "% Vert": label_val.get("% Vert"),
+                    "% Horz": label_val.get("% Horz"),
+                    "Indice": label_val.get("Indice"),
+                })
+            block_total = dict(zip(block.iloc[:, 1], block.iloc[:, 2]))
+            rows.append({
+                "Groupe_interviewé": f"Total interviewé : {group_name.split(':',1)[-1].strip()}",
+                "Segment": "Total",
+                "Echantillon": block_total.get("Echantillon"),
+                "(000)": block_total.get("(000)"),
+                "% Vert": block_total.get("% Vert"),
+                "% Horz": block_total.get("% Horz"),
+                "Indice": block_total.get("Indice"),
+            })
+
+    return pd.DataFrame(rows)
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10x20,50x100,200x300,400x500",
+                        help="comma-separated GROUPSxSEGMENTS sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'groups':>7} {'segments':>9} {'rows':>9} {'legacy (s)':>11} {'vectorized (s)':>15} {'speedup':>8}")
+    for size in args.sizes.split(","):
+        n_groups, n_segments = (int(x) for x in size.split("x"))
+        df = make_tgi_frame(n_groups, n_segments).iloc[HEADER_ROWS:].reset_index(drop=True)
+
+        expected = legacy_frame_to_long(df)
+        result = tgi_frame_to_long(df)
+        pd.testing.assert_frame_equal(result, expected)
+        assert result.to_json(orient="records", lines=True, force_ascii=False) == \
+            expected.to_json(orient="records", lines=True, force_ascii=False)
+
+        legacy_s = _best_of(lambda: legacy_frame_to_long(df), args.repeat)
+        vector_s = _best_of(lambda: tgi_frame_to_long(df), args.repeat)
+        print(f"{n_groups:>7} {n_segments:>9} {len(result):>9} {legacy_s:>11.3f} {vector_s:>15.4f} {legacy_s / vector_s:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
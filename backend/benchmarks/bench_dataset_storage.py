@@ -0,0 +1,65 @@
+"""Size and load time of a converted TGI dataset: XLSX, JSONL, NumPy archive and Arrow IPC files.
+
+Every load ends with a queryable TGIDataset, followed by one top-10 query.
+
+Usage (from backend/): python -m benchmarks.bench_dataset_storage --groups 2000 --segments 60
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import write_tgi_workbook
+from conversion import convert_tgi, convert_tgi_to_jsonl_bytes
+from tgi_query import TGIDataset
+
+
+def _median_seconds(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx = write_tgi_workbook(os.path.join(tmp, "tgi.xlsx"), args.groups, args.segments)
+        jsonl = os.path.join(tmp, "tgi.jsonl")
+        with open(jsonl, "wb") as f:
+            f.write(convert_tgi_to_jsonl_bytes(xlsx))
+        dataset = TGIDataset.from_jsonl(open(jsonl, "rb").read())
+
+        def from_jsonl():
+            with open(jsonl, "rb") as f:
+                return TGIDataset.from_jsonl(f.read())
+
+        # (label, path, loader, repeats); the workbook is converted once per load, hence one repeat
+        formats = [
+            ("XLSX (converted)", xlsx, lambda: TGIDataset.from_frame(convert_tgi(xlsx)), 1),
+            ("JSONL", jsonl, from_jsonl, args.repeat),
+            ("NumPy .npz", os.path.join(tmp, "tgi.npz"), None, args.repeat),
+        ]
+        for compression in ("none", "lz4", "zstd"):
+            formats.append((f"Arrow IPC {compression}", os.path.join(tmp, f"tgi_{compression}.arrow"), None,
+                            args.repeat))
+
+        print(f"{len(dataset)} rows ({args.groups} groups x {args.segments + 1} segments)")
+        for label, path, loader, repeat in formats:
+            if loader is None:
+                dataset.save(path, compression=label.rsplit(" ", 1)[-1] if path.endswith(".arrow") else "none")
+                loader = (lambda p: lambda: TGIDataset.load(p))(path)
+            seconds = _median_seconds(lambda: loader().top(k=10), repeat)
+            print(f"  {label:17s}: {os.path.getsize(path) / 2**20:6.2f} MB, load + top-10 {seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
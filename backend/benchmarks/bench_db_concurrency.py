@@ -0,0 +1,89 @@
+"""Throughput of DatabaseManager under concurrent chat traffic: pooled WAL versus connect-per-call.
+
+Usage (from backend/): python -m benchmarks.bench_db_concurrency --threads 16 --ops 300
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from database import DatabaseManager
+
+
+class ConnectPerCallPool:
+    """The previous access pattern: a fresh rollback-journal connection for every call."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def _seed(db: DatabaseManager, n_assistants: int):
+    for i in range(n_assistants):
+        db.log_assistant_creation(f"asst_{i}", f"Assistant {i}", "Automobile", 1, "tgi.json", "JSON")
+
+
+def _run(db: DatabaseManager, threads: int, ops: int, n_assistants: int):
+    errors = []
+
+    def worker(tid: int):
+        try:
+            for i in range(ops):
+                assistant = f"asst_{(tid + i) % n_assistants}"
+                if i % 4 == 3:
+                    db.get_dashboard_stats(1)
+                else:
+                    db.log_message(assistant, "assistant", "réponse", 1200, 900, 150)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=300, help="operations per thread")
+    parser.add_argument("--assistants", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label in ("connect-per-call", "pooled WAL"):
+            db = DatabaseManager(os.path.join(tmp, f"{label.replace(' ', '_')}.db"), pool_size=args.threads)
+            if label == "connect-per-call":
+                db.pool.close()
+                db.pool = ConnectPerCallPool(db.db_path)
+            _seed(db, args.assistants)
+            ops_per_s, errors = _run(db, args.threads, args.ops, args.assistants)
+            results[label] = ops_per_s
+            print(f"{label:>17}: {ops_per_s:>9.0f} ops/s ({len(errors)} errors)")
+        print(f"{'speedup':>17}: {results['pooled WAL'] / results['connect-per-call']:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
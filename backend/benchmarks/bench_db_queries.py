@@ -0,0 +1,71 @@
+"""Latency of the dashboard, analytics and history queries with and without the migration indexes.
+
+Usage (from backend/): python -m benchmarks.bench_db_queries --messages 2000000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from database import DatabaseManager
+from benchmarks.synthetic import make_synthetic_db
+
+INDEXES = ("idx_messages_assistant_created", "idx_assistants_user_created", "idx_activity_log_user_created")
+
+
+def _time_queries(db: DatabaseManager, user_id: int, openai_id: str, repeat: int):
+    queries = {
+        "get_dashboard_stats": lambda: db.get_dashboard_stats(user_id),
+        "get_analytics_data": lambda: db.get_analytics_data(user_id),
+        "get_user_assistants": lambda: db.get_user_assistants(user_id),
+        "get_assistant_messages": lambda: db.get_assistant_messages(openai_id),
+    }
+    timings = {}
+    for name, fn in queries.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--assistants", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        make_synthetic_db(path, args.users, args.assistants, args.messages)
+        print(f"synthetic db: {args.messages} messages in {time.perf_counter() - start:.1f}s")
+
+        db = DatabaseManager(path)
+        user_id, openai_id = db.pool._connect().execute(
+            "SELECT a.user_id, a.openai_id FROM assistants a ORDER BY a.message_count DESC LIMIT 1"
+        ).fetchone()
+
+        indexed = _time_queries(db, user_id, openai_id, args.repeat)
+
+        conn = sqlite3.connect(path)
+        for name in INDEXES:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute("ANALYZE")
+        conn.close()
+        db.pool.close()
+        db.pool = type(db.pool)(path)  # fresh connections, no stale query plans
+        unindexed = _time_queries(db, user_id, openai_id, args.repeat)
+
+        print(f"{'query':>24} {'no index (ms)':>14} {'indexed (ms)':>13} {'speedup':>8}")
+        for name in indexed:
+            print(f"{name:>24} {unindexed[name]:>14.2f} {indexed[name]:>13.2f} {unindexed[name] / indexed[name]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
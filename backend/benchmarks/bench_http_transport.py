@@ -0,0 +1,98 @@
+"""Pooled, retrying HTTP transport versus bare requests calls, against local mock OpenAI servers.
+
+1. Keep-alive: sequential vector store polls, counting TCP connections opened on the server.
+2. Retries: the create / upload / attach sequence against a server that injects 429 and 503.
+
+Usage (from backend/): python -m benchmarks.bench_http_transport --polls 200 --error-rate 0.3
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from benchmarks.mock_openai import BackgroundServer, create_mock_app
+from http_transport import HTTPTransport
+
+API_KEY = "sk-mock-key"
+BETA = {"OpenAI-Beta": "assistants=v2"}
+
+
+def _bare_sequence(base_url: str) -> bool:
+    """The pre-transport code path: one-off requests, no timeout, no retry."""
+    headers = {"Authorization": f"Bearer {API_KEY}", **BETA}
+    r = requests.post(f"{base_url}/vector_stores", headers=headers, json={"name": "vs_bench"})
+    if r.status_code != 200:
+        return False
+    vs_id = r.json()["id"]
+    r = requests.post(f"{base_url}/files", headers={"Authorization": f"Bearer {API_KEY}"},
+                      files={"file": ("tgi.json", b'{"Indice": 142}\n', "application/json"),
+                             "purpose": (None, "assistants")})
+    if r.status_code != 200:
+        return False
+    r = requests.post(f"{base_url}/vector_stores/{vs_id}/files", headers=headers, json={"file_id": r.json()["id"]})
+    return r.status_code == 200
+
+
+def _transport_sequence(transport: HTTPTransport) -> bool:
+    r = transport.post("/vector_stores", API_KEY, headers=BETA, json={"name": "vs_bench"})
+    if r.status_code != 200:
+        return False
+    vs_id = r.json()["id"]
+    r = transport.post("/files", API_KEY, files={"file": ("tgi.json", b'{"Indice": 142}\n', "application/json"),
+                                                 "purpose": (None, "assistants")})
+    if r.status_code != 200:
+        return False
+    r = transport.post(f"/vector_stores/{vs_id}/files", API_KEY, headers=BETA, json={"file_id": r.json()["id"]})
+    return r.status_code == 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--sequences", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=8769)
+    parser.add_argument("--faulty-port", type=int, default=8770)
+    args = parser.parse_args()
+
+    clean = create_mock_app()
+    faulty = create_mock_app(error_rate=args.error_rate, retry_after=0.05)
+    with BackgroundServer(clean, args.port) as clean_server, BackgroundServer(faulty, args.faulty_port) as faulty_server:
+        base_url = f"{clean_server.url}/v1"
+        vs_id = requests.post(f"{base_url}/vector_stores", json={"name": "vs_poll"}).json()["id"]
+
+        print(f"1. {args.polls} sequential GET /vector_stores/{{id}}")
+        for label in ("bare requests", "HTTPTransport"):
+            transport = HTTPTransport(base_url=base_url)
+            before = len(clean.state.mock["connections"])
+            latencies = []
+            for _ in range(args.polls):
+                start = time.perf_counter()
+                if label == "bare requests":
+                    r = requests.get(f"{base_url}/vector_stores/{vs_id}", headers={"Authorization": f"Bearer {API_KEY}"})
+                else:
+                    r = transport.get(f"/vector_stores/{vs_id}", API_KEY, headers=BETA)
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            opened = len(clean.state.mock["connections"]) - before
+            transport.close()
+            print(f"  {label:14s}: median {statistics.median(latencies) * 1000:.2f} ms, "
+                  f"{opened} TCP connections opened")
+
+        faulty_url = f"{faulty_server.url}/v1"
+        print(f"2. {args.sequences} create/upload/attach sequences, {args.error_rate:.0%} injected 429/503")
+        ok = sum(_bare_sequence(faulty_url) for _ in range(args.sequences))
+        print(f"  bare requests : {ok}/{args.sequences} succeeded")
+        transport = HTTPTransport(base_url=faulty_url, backoff_base=0.05, max_retries=6)
+        start = time.perf_counter()
+        ok = sum(_transport_sequence(transport) for _ in range(args.sequences))
+        elapsed = time.perf_counter() - start
+        stats = transport.stats()
+        transport.close()
+        print(f"  HTTPTransport : {ok}/{args.sequences} succeeded in {elapsed:.2f}s, "
+              f"{stats['retries']} retries, {stats['failures']} exhausted, statuses {stats['status_counts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Time from file attach to "ready": fixed 2-second store polling versus adaptive file-level polling.
+
+Also checks that a file still indexing at the deadline is reported as such and finished in the background.
+
+Usage (from backend/): python -m benchmarks.bench_indexing --index-seconds 0.2 1 4
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.mock_openai import BackgroundServer, create_mock_app
+from http_transport import HTTPTransport
+from indexing import IndexingTracker
+
+API_KEY = "sk-mock-key"
+BETA = {"OpenAI-Beta": "assistants=v2"}
+
+
+def _attach(transport: HTTPTransport):
+    vs_id = transport.post("/vector_stores", API_KEY, headers=BETA, json={"name": "vs_bench"}).json()["id"]
+    file_id = transport.post("/files", API_KEY, files={"file": ("tgi.json", b"{}\n", "application/json"),
+                                                       "purpose": (None, "assistants")}).json()["id"]
+    transport.post(f"/vector_stores/{vs_id}/files", API_KEY, headers=BETA, json={"file_id": file_id})
+    return vs_id, file_id
+
+
+def legacy_wait(transport: HTTPTransport, vs_id: str):
+    """The previous loop: store-level file_counts every 2 seconds, giving up silently after 30."""
+    wait_count = 0
+    while wait_count < 30:
+        file_counts = transport.get(f"/vector_stores/{vs_id}", API_KEY, headers=BETA).json().get("file_counts", {})
+        if file_counts.get("completed", 0) > 0 or file_counts.get("failed", 0) > 0:
+            break
+        time.sleep(2)
+        wait_count += 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index-seconds", type=float, nargs="+", default=[0.2, 1.0, 4.0])
+    parser.add_argument("--port", type=int, default=8771)
+    args = parser.parse_args()
+
+    for i, index_seconds in enumerate(args.index_seconds):
+        with BackgroundServer(create_mock_app(index_seconds=index_seconds), args.port + i) as server:
+            transport = HTTPTransport(base_url=f"{server.url}/v1")
+            tracker = IndexingTracker(transport)
+
+            vs_id, _ = _attach(transport)
+            start = time.perf_counter()
+            legacy_wait(transport, vs_id)
+            legacy = time.perf_counter() - start
+
+            vs_id, file_id = _attach(transport)
+            start = time.perf_counter()
+            state = tracker.wait_until_ready(vs_id, file_id, API_KEY, timeout=30)
+            adaptive = time.perf_counter() - start
+            assert state == "completed", state
+            requests_made = transport.stats()["requests"]
+            transport.close()
+        print(f"indexing {index_seconds:4.1f}s: legacy ready after {legacy:5.2f}s, "
+              f"adaptive after {adaptive:5.2f}s ({requests_made} requests in total)")
+
+    # Deadline shorter than indexing: explicit in_progress, then completion in the background
+    with BackgroundServer(create_mock_app(index_seconds=1.5), args.port + len(args.index_seconds)) as server:
+        transport = HTTPTransport(base_url=f"{server.url}/v1")
+        tracker = IndexingTracker(transport)
+        vs_id, file_id = _attach(transport)
+        state = tracker.wait_until_ready(vs_id, file_id, API_KEY, timeout=0.5)
+        done = threading.Event()
+        final = []
+        tracker.track(vs_id, file_id, API_KEY, on_done=lambda s: (final.append(s), done.set()))
+        assert done.wait(10), "background tracking did not finish"
+        transport.close()
+    print(f"deadline 0.5s on a 1.5s indexing: returned {state!r}, background tracking finished as {final[0]!r}")
+
+
+if __name__ == "__main__":
+    main()
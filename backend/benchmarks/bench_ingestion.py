@@ -0,0 +1,67 @@
+"""Peak memory of whole-sheet loading versus streaming read-only ingestion.
+
+Both paths must produce the same JSONL bytes, including on a sheet with suppressed ("*") cells
+and all-integer metric columns; the benchmark fails otherwise.
+
+Usage (from backend/): python -m benchmarks.bench_ingestion
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from conversion import convert_tgi_to_jsonl_bytes, iter_tgi_records, read_tgi_sheet, tgi_frame_to_long
+from benchmarks.synthetic import write_tgi_workbook
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def _check_cell_types(tmp):
+    # Suppressed cells stay strings, integer columns stay integers, whatever the path
+    path = write_tgi_workbook(os.path.join(tmp, "tgi_cells.xlsx"), 30, 20, empty_rate=0.0, suppressed_rate=0.3)
+    data = convert_tgi_to_jsonl_bytes(path)
+    if data != convert_tgi_to_jsonl_bytes(path, streaming=True):
+        raise SystemExit("cells: streaming JSONL differs from the in-memory conversion")
+    records = [json.loads(line) for line in data.splitlines()]
+    if not any(record[label] == "*" for record in records for label in ("(000)", "% Vert", "% Horz")):
+        raise SystemExit("cells: suppressed '*' values were not kept")
+    if not all(type(record[label]) is int for record in records for label in ("Echantillon", "Indice")):
+        raise SystemExit("cells: integer metrics were not written as integers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="50x50,200x100,400x200",
+                        help="comma-separated GROUPSxSEGMENTS sizes")
+    args = parser.parse_args()
+
+    print(f"{'groups':>7} {'segments':>9} {'file (MB)':>10} {'in-memory peak (MB)':>20} {'streaming peak (MB)':>20} {'in-memory (s)':>14} {'streaming (s)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes.split(","):
+            n_groups, n_segments = (int(x) for x in size.split("x"))
+            path = write_tgi_workbook(os.path.join(tmp, f"tgi_{size}.xlsx"), n_groups, n_segments)
+
+            n_frame, frame_s, frame_mb = _measure(lambda: len(tgi_frame_to_long(read_tgi_sheet(path))))
+            n_stream, stream_s, stream_mb = _measure(lambda: sum(1 for _ in iter_tgi_records(path)))
+            assert n_frame == n_stream
+            # Same records, same types and same serialization whatever the path
+            if convert_tgi_to_jsonl_bytes(path) != convert_tgi_to_jsonl_bytes(path, streaming=True):
+                raise SystemExit(f"{size}: streaming JSONL differs from the in-memory conversion")
+
+            file_mb = os.path.getsize(path) / 2**20
+            print(f"{n_groups:>7} {n_segments:>9} {file_mb:>10.1f} {frame_mb:>20.1f} {stream_mb:>20.1f} {frame_s:>14.2f} {stream_s:>14.2f}")
+        _check_cell_types(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Memory and sockets used by many per-key OpenAI clients: unbounded dict versus OpenAIClientManager.
+
+Each distinct API key makes one call against a local mock server.
+
+Usage (from backend/): python -m benchmarks.bench_openai_clients --keys 300 --max-clients 64
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from openai import OpenAI
+
+from benchmarks.mock_openai import BackgroundServer, create_mock_app
+from openai_clients import OpenAIClientManager
+
+
+def _run(get_client, n_keys: int, mock) -> dict:
+    before = len(mock.state.mock["connections"])
+    tracemalloc.start()
+    start = time.perf_counter()
+    for k in range(n_keys):
+        get_client(f"sk-user-{k:05d}").beta.threads.create()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": elapsed, "memory_mb": current / 2**20,
+            "connections": len(mock.state.mock["connections"]) - before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=300)
+    parser.add_argument("--max-clients", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8773)
+    args = parser.parse_args()
+
+    mock = create_mock_app()
+    with BackgroundServer(mock, args.port) as server:
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+
+        legacy_cache = {}
+
+        def legacy(api_key):
+            # Previous get_openai_client: one client (and connection pool) per key, never evicted
+            if api_key not in legacy_cache:
+                legacy_cache[api_key] = OpenAI(api_key=api_key)
+            return legacy_cache[api_key]
+
+        results = {"unbounded dict": _run(legacy, args.keys, mock)}
+        clients_kept = {"unbounded dict": len(legacy_cache)}
+        for client in legacy_cache.values():
+            client.close()
+
+        manager = OpenAIClientManager(max_clients=args.max_clients)
+        results["client manager"] = _run(manager.get, args.keys, mock)
+        stats = manager.stats()
+        clients_kept["client manager"] = stats["clients"]
+
+    print(f"{args.keys} API keys, one call each (max_clients={args.max_clients})")
+    for label, r in results.items():
+        print(f"  {label:14s}: {r['seconds']:.2f}s, {r['memory_mb']:.1f} MB retained, "
+              f"{clients_kept[label]} clients kept, {r['connections']} TCP connections opened")
+    print(f"  manager stats : {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Input tokens per answer: one JSONL file versus one document per interview group family.
+
+Creates one assistant per ingestion mode from the same synthetic TGI workbook, against a local
+mock whose runs bill the file_search chunks they retrieve, then asks each assistant about random
+interview groups. Reports the average input_tokens logged in the messages table and the share
+of the asked group's rows present in the retrieved chunks.
+
+Usage (from backend/): python -m benchmarks.bench_partitions --groups 300 --segments 30 --questions 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.mock_openai import BackgroundServer, create_mock_app
+from benchmarks.synthetic import write_tgi_workbook
+
+MODES = ("single", "groups")
+
+
+def _rows_found(mode: str, chunks, modality: str) -> int:
+    """Distinct segments of the asked group present in the retrieved chunks."""
+    segments = set()
+    for chunk in chunks:
+        for line in chunk.splitlines():
+            if mode == "single":
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get("Groupe_interviewé", "").endswith(f": {modality}"):
+                    segments.add(row["Segment"])
+            else:
+                fields = line.split(" | ")
+                # Lines cut at a chunk boundary are incomplete
+                if len(fields) == 7 and fields[0].endswith(f": {modality}"):
+                    segments.add(fields[1])
+    segments.discard("Total")
+    return len(segments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, default=300)
+    parser.add_argument("--segments", type=int, default=30)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--mock-port", type=int, default=8776)
+    parser.add_argument("--api-port", type=int, default=8777)
+    args = parser.parse_args()
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock-key")
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The API keeps its SQLite database and caches in the working directory
+        os.chdir(tmp)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import main as api
+
+        workbook = write_tgi_workbook(os.path.join(tmp, "tgi.xlsx"), args.groups, args.segments)
+        mock = create_mock_app(run_seconds=0.05, index_seconds=0.1, simulate_retrieval=True)
+        with BackgroundServer(mock, args.mock_port), BackgroundServer(api.app, args.api_port) as server, \
+                httpx.Client(base_url=server.url, timeout=120) as client:
+            token = client.post("/auth/login", json={"username": "admin", "password": "admin123"}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}", "X-OpenAI-Key": "sk-mock-key"}
+
+            assistants = {}
+            for mode in MODES:
+                with open(workbook, "rb") as f:
+                    job_id = client.post("/assistants", headers=headers, data={
+                        "name": f"TGI {mode}", "theme": "Automobile", "ingestion_mode": mode
+                    }, files={"file": ("tgi.xlsx", f, "application/octet-stream")}).json()["job_id"]
+                while True:
+                    job = client.get(f"/jobs/{job_id}", headers=headers).json()
+                    if job["status"] in ("succeeded", "failed"):
+                        break
+                    time.sleep(0.1)
+                assert job["status"] == "succeeded", job["error"]
+                assistants[mode] = job["result"]["assistant_id"]
+
+            found = {mode: 0 for mode in MODES}
+            for _ in range(args.questions):
+                g = rng.randrange(args.groups)
+                question = f"Profil des Critère {g % 7}: Modalité {g} : quels segments ont le plus fort Indice ?"
+                for mode in MODES:
+                    client.post(f"/assistants/{assistants[mode]}/message", headers=headers,
+                                json={"message": question}).raise_for_status()
+                    last_run = list(mock.state.mock["retrievals"])[-1]
+                    found[mode] += _rows_found(mode, mock.state.mock["retrievals"][last_run], f"Modalité {g}")
+
+            api.message_writer.flush()
+            by_mode = {row["ingestion_mode"]: row for row in
+                       client.get("/analytics/data", headers=headers).json()["tokens_by_ingestion_mode"]}
+
+    print(f"{args.groups} groups x {args.segments + 1} segments, {args.questions} questions per assistant")
+    for mode in MODES:
+        row = by_mode[mode]
+        recall = found[mode] / (args.questions * args.segments)
+        print(f"  {mode:7s}: {row['avg_input_tokens']:6d} input tokens per answer, {row['cost_euros']:.4f} EUR, "
+              f"{recall:.0%} of the asked group's rows retrieved")
+
+
+if __name__ == "__main__":
+    main()
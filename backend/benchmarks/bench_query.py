@@ -0,0 +1,70 @@
+"""Local TGI queries: indexed columnar dataset versus a pandas scan of the converted table.
+
+Usage (from backend/): python -m benchmarks.bench_query --groups 2000 --segments 60 --repeat 50
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import make_tgi_frame
+from conversion import tgi_frame_to_long
+from tgi_query import TGIDataset
+
+
+def _median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    df = tgi_frame_to_long(make_tgi_frame(args.groups, args.segments).iloc[4:].reset_index(drop=True))
+    dataset = TGIDataset.from_frame(df)
+    group = "Interviewé: Critère 3: Modalité 1501" if args.groups > 1501 else "Modalité 1"
+    segment_a, segment_b = "Segment 1: Marque 1", "Segment 2: Marque 2"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dataset.npz")
+        dataset.save(path)
+        load_ms = _median_ms(lambda: TGIDataset.load(path), 5)
+        size_mb = os.path.getsize(path) / 2**20
+
+    numeric = df.copy()
+    numeric["Indice"] = numeric["Indice"].astype(float)
+    cases = {
+        "filter group, Indice > 120": (
+            lambda: numeric[(numeric["Groupe_interviewé"].str.contains(group, regex=False))
+                            & (numeric["Indice"] > 120)].sort_values("Indice", ascending=False).head(50),
+            lambda: dataset.filter(group=group, min_value=120, sort_by="Indice"),
+        ),
+        "top 10 Indice, one segment": (
+            lambda: numeric[numeric["Segment"] == segment_a].nlargest(10, "Indice"),
+            lambda: dataset.top(k=10, segment=segment_a),
+        ),
+        "compare two segments": (
+            lambda: numeric[numeric["Segment"] == segment_a].merge(
+                numeric[numeric["Segment"] == segment_b], on="Groupe_interviewé"),
+            lambda: dataset.compare(segment_a, segment_b, limit=50),
+        ),
+    }
+
+    print(f"{len(df)} rows ({args.groups} groups x {args.segments + 1} segments), "
+          f"saved {size_mb:.1f} MB, loaded in {load_ms:.1f} ms")
+    for label, (scan, indexed) in cases.items():
+        print(f"  {label:28s}: pandas scan {_median_ms(scan, args.repeat):7.2f} ms, "
+              f"dataset {_median_ms(indexed, args.repeat):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Time-to-first-byte of the streaming chat endpoint versus the blocking one, against a local mock.
+
+Checks that the streamed text matches the non-streaming answer, that the first delta arrives
+well before the run ends, and that both paths log the same token usage.
+
+Usage (from backend/): python -m benchmarks.bench_streaming --requests 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.mock_openai import BackgroundServer, create_mock_app
+
+REPLY = ("Synthèse : les 25-34 ans sont surreprésentés (Indice 142) ; "
+         "les CSP+ suivent (Indice 128) et les retraités sont sous-représentés (Indice 71).")
+
+
+def _blocking(client: httpx.Client, headers, assistant_id: str, question: str):
+    start = time.perf_counter()
+    r = client.post(f"/assistants/{assistant_id}/message", headers=headers, json={"message": question})
+    r.raise_for_status()
+    elapsed = time.perf_counter() - start
+    # Nothing reaches the client before the whole answer
+    return r.json()["response"], elapsed, elapsed
+
+
+def _streaming(client: httpx.Client, headers, assistant_id: str, question: str):
+    start = time.perf_counter()
+    first, parts, done = None, [], None
+    with client.stream("POST", f"/assistants/{assistant_id}/message/stream", headers=headers,
+                       json={"message": question}) as r:
+        r.raise_for_status()
+        event = None
+        for line in r.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "delta":
+                    if first is None:
+                        first = time.perf_counter() - start
+                    parts.append(data["content"])
+                elif event == "error":
+                    raise RuntimeError(data["detail"])
+                elif event == "done":
+                    done = data
+    return "".join(parts), first, time.perf_counter() - start, done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--first-token-seconds", type=float, default=0.4)
+    parser.add_argument("--token-seconds", type=float, default=0.05)
+    parser.add_argument("--mock-port", type=int, default=8767)
+    parser.add_argument("--api-port", type=int, default=8768)
+    args = parser.parse_args()
+
+    # Same total generation time for both paths
+    run_seconds = args.first_token_seconds + args.token_seconds * (len(REPLY.split(" ")) - 1)
+    mock = create_mock_app(run_seconds=run_seconds, reply=REPLY, first_token_seconds=args.first_token_seconds,
+                           token_seconds=args.token_seconds)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock-key")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The API keeps its SQLite database and caches in the working directory
+        os.chdir(tmp)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import main as api
+
+        api.db.log_assistant_creation("asst_stream", "Bench", "Automobile", 1, "tgi.json", "JSON")
+        with BackgroundServer(mock, args.mock_port), BackgroundServer(api.app, args.api_port) as server, \
+                httpx.Client(base_url=server.url, timeout=60) as client:
+            token = client.post("/auth/login", json={"username": "admin", "password": "admin123"}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}", "X-OpenAI-Key": "sk-mock-key"}
+
+            blocking, streaming = [], []
+            for i in range(args.requests):
+                text, ttfb, total = _blocking(client, headers, "asst_stream", f"Question {i}")
+                assert text == REPLY, text
+                blocking.append((ttfb, total))
+
+                text, ttfb, total, done = _streaming(client, headers, "asst_stream", f"Question {i}")
+                assert text == REPLY, text
+                assert ttfb is not None and ttfb < total, (ttfb, total)
+                assert done["output_tokens"] > 0 and done["ttfb_ms"] <= done["response_time_ms"], done
+                streaming.append((ttfb, total))
+
+            # Both paths must log the same usage; only the time-to-first-byte differs
+            api.message_writer.flush()
+            logged = api.db.get_dashboard_stats(1)
+
+    def _ms(values):
+        return f"{statistics.median(values) * 1000:7.0f} ms"
+
+    print(f"{args.requests} requests per endpoint, {len(REPLY.split(' '))} words, "
+          f"first token after {args.first_token_seconds:.2f}s")
+    print(f"  blocking  : TTFB {_ms([b[0] for b in blocking])}, total {_ms([b[1] for b in blocking])}")
+    print(f"  streaming : TTFB {_ms([s[0] for s in streaming])}, total {_ms([s[1] for s in streaming])}")
+    print(f"  logged    : {logged['total_messages']} messages, {logged['total_tokens']} tokens, "
+          f"avg TTFB {logged['avg_ttfb_ms']} ms")
+    assert statistics.median(s[0] for s in streaming) < statistics.median(b[0] for b in blocking)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Local stand-in for the subset of the OpenAI Assistants API used by the backend.
+
+Runs complete after ``run_seconds``; streamed runs emit the first token after
+``first_token_seconds`` and one word every ``token_seconds`` after that. Files attached to a
+vector store finish indexing after ``index_seconds``. With ``error_rate`` > 0, vector store and
+file routes randomly answer 429 (with Retry-After) or 503 to exercise client retries.
+With ``simulate_retrieval``, runs mimic file_search billing: the files of the assistant's vector
+stores are cut into chunks (4 characters per token, the store's chunking strategy or 800/400),
+the ``max_num_results`` best chunks for the question are retrieved (word and word-pair overlap
+weighted by idf) and their tokens are added to ``prompt_tokens``. With ``simulate_history``, runs
+also bill the thread messages their ``truncation_strategy`` keeps (every message for ``auto``)
+and their ``additional_instructions``. Chat completions (used for conversation summaries) answer
+a summary of ``summary_words`` words and bill their messages.
+Every route answers with the minimal fields the SDK reads.
+"""
+import asyncio
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_ids = itertools.count(1)
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{next(_ids):06d}"
+
+
+def create_mock_app(run_seconds: float = 2.0, reply: str = "Synthèse : segment surreprésenté (Indice 142).",
+                    prompt_tokens: int = 1200, completion_tokens: int = 180,
+                    first_token_seconds: float = 0.3, token_seconds: float = 0.05,
+                    index_seconds: float = 1.0, error_rate: float = 0.0, retry_after: float = 0.1,
+                    simulate_retrieval: bool = False, simulate_history: bool = False, summary_words: int = 120,
+                    seed: int = 0) -> FastAPI:
+    app = FastAPI()
+    state: Dict[str, Any] = {
+        "runs": {}, "messages": {}, "vector_stores": {}, "assistants": {}, "requests": 0, "errors": 0, "connections": set(),
+        "files": {}, "file_batches": {}, "retrievals": {}, "summaries": 0,
+    }
+    app.state.mock = state
+    rng = random.Random(seed)
+
+    def _terms(text: str):
+        """Words and pairs of adjacent words ("modalité 12" only matches rows of that group)."""
+        words = re.findall(r"\w+", text.casefold())
+        return set(words) | set(zip(words, words[1:]))
+
+    def _chunks(vs: Dict[str, Any]):
+        """(text, terms) of every chunk in a vector store, cached per store."""
+        if vs.get("chunks") is None:
+            vs["chunks"] = []
+            for file_id, (size, overlap) in vs["chunking"].items():
+                text = state["files"].get(file_id, "")
+                step = max(size - overlap, 1) * 4
+                for start in range(0, max(len(text) - overlap * 4, 1), step):
+                    chunk = text[start:start + size * 4]
+                    vs["chunks"].append((chunk, _terms(chunk)))
+        return vs["chunks"]
+
+    def _retrieve(run: Dict[str, Any]) -> int:
+        """Tokens of the chunks file_search would add to the prompt of this run."""
+        assistant = state["assistants"].get(run["assistant_id"]) or {}
+        tool = next((t for t in assistant.get("tools", []) if t.get("type") == "file_search"), {})
+        max_results = (tool.get("file_search") or {}).get("max_num_results", 20)
+        vs_ids = ((assistant.get("tool_resources") or {}).get("file_search") or {}).get("vector_store_ids", [])
+        chunks = [c for vs_id in vs_ids for c in _chunks(state["vector_stores"][vs_id])]
+        question = next((m["content"][0]["text"]["value"] for m in reversed(state["messages"].get(run["thread_id"], []))
+                         if m["role"] == "user"), "")
+        terms = _terms(question)
+        df = {t: sum(t in c_terms for _, c_terms in chunks) for t in terms}
+        idf = {t: math.log((len(chunks) + 1) / (n + 0.5)) for t, n in df.items() if n}
+        scored = [(sum(idf.get(t, 0.0) for t in terms & c_terms), i) for i, (_, c_terms) in enumerate(chunks)]
+        best = sorted((x for x in scored if x[0] > 0), reverse=True)[:max_results]
+        state["retrievals"][run["id"]] = [chunks[i][0] for _, i in best]
+        return sum(len(chunks[i][0]) // 4 for _, i in best)
+
+    def _history(run: Dict[str, Any]) -> int:
+        """Tokens of the thread messages and extra instructions sent with this run."""
+        messages = [m for m in state["messages"].get(run["thread_id"], []) if m["run_id"] != run["id"]]
+        truncation = run["context"].get("truncation_strategy") or {}
+        if truncation.get("type") == "last_messages":
+            messages = messages[-truncation["last_messages"]:]
+        text = "".join(m["content"][0]["text"]["value"] for m in messages)
+        return (len(text) + len(run["context"].get("additional_instructions") or "")) // 4
+
+    def _usage(run: Dict[str, Any] = None):
+        prompt = prompt_tokens + (_retrieve(run) if simulate_retrieval and run else 0)
+        prompt += _history(run) if simulate_history and run else 0
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt + completion_tokens,
+        }
+
+    def _message(thread_id: str, role: str, text: str, run_id: str = None) -> Dict[str, Any]:
+        return {
+            "id": _new_id("msg"), "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "run_id": run_id, "status": "completed",
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "attachments": [], "metadata": {},
+        }
+
+    def _run(run: Dict[str, Any]) -> Dict[str, Any]:
+        done = time.monotonic() - run["started"] >= run_seconds
+        if done and run["status"] != "completed":
+            run["status"] = "completed"
+            run["usage"] = _usage(run)
+            state["messages"].setdefault(run["thread_id"], []).append(
+                _message(run["thread_id"], "assistant", reply, run["id"])
+            )
+        elif not done:
+            run["status"] = "in_progress"
+        return {k: v for k, v in run.items() if k not in ("started", "context")}
+
+    @app.middleware("http")
+    async def count_requests(request: Request, call_next):
+        state["requests"] += 1
+        # One client (host, port) pair per TCP connection: shows keep-alive reuse
+        state["connections"].add((request.client.host, request.client.port))
+        faulty = request.url.path.startswith(("/v1/vector_stores", "/v1/files"))
+        if faulty and error_rate and rng.random() < error_rate:
+            state["errors"] += 1
+            if rng.random() < 0.5:
+                return JSONResponse({"error": {"message": "Rate limit reached"}}, status_code=429,
+                                    headers={"Retry-After": str(retry_after)})
+            return JSONResponse({"error": {"message": "Service unavailable"}}, status_code=503)
+        return await call_next(request)
+
+    def _vector_store(vs: Dict[str, Any]) -> Dict[str, Any]:
+        counts = {"in_progress": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        for attached in vs["files"].values():
+            counts["completed" if time.monotonic() - attached >= index_seconds else "in_progress"] += 1
+        counts["total"] = sum(counts.values())
+        return {
+            "id": vs["id"], "object": "vector_store", "created_at": vs["created_at"], "name": vs["name"],
+            "status": "in_progress" if counts["in_progress"] else "completed", "file_counts": counts,
+            "usage_bytes": 0, "metadata": {},
+        }
+
+    @app.post("/v1/vector_stores")
+    async def create_vector_store(request: Request):
+        body = await request.json()
+        vs = {"id": _new_id("vs"), "created_at": int(time.time()), "name": body.get("name"), "files": {},
+              "chunking": {}, "chunks": None}
+        state["vector_stores"][vs["id"]] = vs
+        return _vector_store(vs)
+
+    @app.get("/v1/vector_stores/{vector_store_id}")
+    async def retrieve_vector_store(vector_store_id: str):
+        return _vector_store(state["vector_stores"][vector_store_id])
+
+    @app.post("/v1/files")
+    async def upload_file(request: Request):
+        form = await request.form()
+        upload = form["file"]
+        content = await upload.read()
+        file_id = _new_id("file")
+        state["files"][file_id] = content.decode("utf-8", "ignore")
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": upload.filename, "purpose": form.get("purpose", "assistants"), "status": "processed"}
+
+    def _vector_store_file(vs: Dict[str, Any], file_id: str) -> Dict[str, Any]:
+        done = time.monotonic() - vs["files"][file_id] >= index_seconds
+        return {"id": file_id, "object": "vector_store.file", "created_at": int(time.time()),
+                "vector_store_id": vs["id"], "status": "completed" if done else "in_progress",
+                "usage_bytes": 0, "last_error": None}
+
+    @app.post("/v1/vector_stores/{vector_store_id}/files")
+    async def attach_file(vector_store_id: str, request: Request):
+        body = await request.json()
+        vs = state["vector_stores"][vector_store_id]
+        _attach(vs, body["file_id"], body.get("chunking_strategy"))
+        return _vector_store_file(vs, body["file_id"])
+
+    def _attach(vs: Dict[str, Any], file_id: str, chunking_strategy: Dict[str, Any] = None):
+        static = (chunking_strategy or {}).get("static") or {}
+        vs["files"][file_id] = time.monotonic()
+        vs["chunking"][file_id] = (static.get("max_chunk_size_tokens", 800), static.get("chunk_overlap_tokens", 400))
+        vs["chunks"] = None
+
+    def _file_batch(batch: Dict[str, Any]) -> Dict[str, Any]:
+        vs = state["vector_stores"][batch["vector_store_id"]]
+        done = sum(time.monotonic() - vs["files"][file_id] >= index_seconds for file_id in batch["file_ids"])
+        counts = {"in_progress": len(batch["file_ids"]) - done, "completed": done, "failed": 0, "cancelled": 0,
+                  "total": len(batch["file_ids"])}
+        return {"id": batch["id"], "object": "vector_store.file_batch", "created_at": batch["created_at"],
+                "vector_store_id": batch["vector_store_id"],
+                "status": "in_progress" if counts["in_progress"] else "completed", "file_counts": counts}
+
+    @app.post("/v1/vector_stores/{vector_store_id}/file_batches")
+    async def create_file_batch(vector_store_id: str, request: Request):
+        body = await request.json()
+        vs = state["vector_stores"][vector_store_id]
+        for file_id in body["file_ids"]:
+            _attach(vs, file_id, body.get("chunking_strategy"))
+        batch = {"id": _new_id("vsfb"), "created_at": int(time.time()), "vector_store_id": vector_store_id,
+                 "file_ids": list(body["file_ids"])}
+        state["file_batches"][batch["id"]] = batch
+        return _file_batch(batch)
+
+    @app.get("/v1/vector_stores/{vector_store_id}/file_batches/{batch_id}")
+    async def retrieve_file_batch(vector_store_id: str, batch_id: str):
+        return _file_batch(state["file_batches"][batch_id])
+
+    @app.get("/v1/vector_stores/{vector_store_id}/files/{file_id}")
+    async def retrieve_vector_store_file(vector_store_id: str, file_id: str):
+        return _vector_store_file(state["vector_stores"][vector_store_id], file_id)
+
+    @app.post("/v1/assistants")
+    async def create_assistant(request: Request):
+        body = await request.json()
+        assistant = {"id": _new_id("asst"), "object": "assistant", "created_at": int(time.time()),
+                     "name": body.get("name"), "model": body.get("model"), "instructions": body.get("instructions"),
+                     "tools": body.get("tools", []), "tool_resources": body.get("tool_resources"), "metadata": {}}
+        state["assistants"][assistant["id"]] = assistant
+        return assistant
+
+    @app.get("/v1/assistants")
+    async def list_assistants(limit: int = 20, after: str = None):
+        data = sorted(state["assistants"].values(), key=lambda a: a["id"], reverse=True)
+        if after:
+            data = [a for a in data if a["id"] < after]
+        page = data[:limit]
+        return {"object": "list", "data": page, "has_more": len(data) > limit,
+                "first_id": page[0]["id"] if page else None, "last_id": page[-1]["id"] if page else None}
+
+    @app.delete("/v1/assistants/{assistant_id}")
+    async def delete_assistant(assistant_id: str):
+        state["assistants"].pop(assistant_id, None)
+        return {"id": assistant_id, "object": "assistant.deleted", "deleted": True}
+
+    @app.post("/v1/threads")
+    async def create_thread():
+        return {"id": _new_id("thread"), "object": "thread", "created_at": int(time.time()), "metadata": {}}
+
+    @app.post("/v1/threads/{thread_id}/messages")
+    async def create_message(thread_id: str, request: Request):
+        body = await request.json()
+        message = _message(thread_id, body.get("role", "user"), str(body.get("content", "")))
+        state["messages"].setdefault(thread_id, []).append(message)
+        return message
+
+    @app.get("/v1/threads/{thread_id}/messages")
+    async def list_messages(thread_id: str, run_id: str = None, limit: int = 20, order: str = "desc",
+                            after: str = None):
+        data = [m for m in state["messages"].get(thread_id, []) if run_id is None or m["run_id"] == run_id]
+        if order == "desc":
+            data.reverse()
+        if after:
+            data = data[next((i + 1 for i, m in enumerate(data) if m["id"] == after), 0):]
+        return {"object": "list", "data": data[:limit], "has_more": len(data) > limit}
+
+    @app.post("/v1/threads/{thread_id}/runs")
+    async def create_run(thread_id: str, request: Request):
+        body = await request.json()
+        run = {
+            "id": _new_id("run"), "object": "thread.run", "created_at": int(time.time()),
+            "thread_id": thread_id, "assistant_id": body.get("assistant_id"), "status": "queued",
+            "usage": None, "started": time.monotonic(),
+            "context": {k: body.get(k) for k in ("truncation_strategy", "additional_instructions")},
+        }
+        state["runs"][run["id"]] = run
+        if body.get("stream"):
+            return StreamingResponse(_stream_run(run), media_type="text/event-stream")
+        return {k: v for k, v in run.items() if k not in ("started", "context")}
+
+    def _sse(event: str, data) -> str:
+        return f"event: {event}\ndata: {data if isinstance(data, str) else json.dumps(data)}\n\n"
+
+    async def _stream_run(run: Dict[str, Any]):
+        public = lambda: {k: v for k, v in run.items() if k not in ("started", "context")}
+        yield _sse("thread.run.created", public())
+        await asyncio.sleep(first_token_seconds)
+        run["status"] = "in_progress"
+        yield _sse("thread.run.in_progress", public())
+        message_id = _new_id("msg")
+        for i, word in enumerate(reply.split(" ")):
+            if i:
+                await asyncio.sleep(token_seconds)
+            yield _sse("thread.message.delta", {
+                "id": message_id, "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text",
+                                       "text": {"value": word if i == 0 else f" {word}", "annotations": []}}]},
+            })
+        run["status"] = "completed"
+        run["usage"] = _usage(run)
+        state["messages"].setdefault(run["thread_id"], []).append(
+            _message(run["thread_id"], "assistant", reply, run["id"])
+        )
+        yield _sse("thread.run.completed", public())
+        yield _sse("done", "[DONE]")
+
+    @app.get("/v1/threads/{thread_id}/runs/{run_id}")
+    async def retrieve_run(thread_id: str, run_id: str):
+        return _run(state["runs"][run_id])
+
+    @app.post("/v1/threads/{thread_id}/runs/{run_id}/cancel")
+    async def cancel_run(thread_id: str, run_id: str):
+        state["runs"][run_id]["status"] = "cancelled"
+        return _run(state["runs"][run_id])
+
+    @app.post("/v1/chat/completions")
+    async def chat_completion(request: Request):
+        body = await request.json()
+        prompt = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+        words = " ".join(["résumé"] * summary_words)
+        state["summaries"] += 1
+        return {
+            "id": _new_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": words}}],
+            "usage": {"prompt_tokens": prompt, "completion_tokens": summary_words * 2,
+                      "total_tokens": prompt + summary_words * 2},
+        }
+
+    return app
+
+
+class BackgroundServer:
+    """Run an ASGI app with uvicorn in a daemon thread (for benchmarks)."""
+
+    def __init__(self, app, port: int, host: str = "127.0.0.1"):
+        self.url = f"http://{host}:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(5)
@@ -0,0 +1,325 @@
+"""Benchmark suite: TGI converter, local dataset, database layer and API handlers, saved as JSON.
+
+``run`` builds a synthetic TGI workbook (groups x segments) and a synthetic SQLite database
+(users, assistants, messages), times every case and writes the results to a JSON file.
+API cases go through the FastAPI test client, with OpenAI replaced by the local mock.
+``compare`` sets two result files side by side and exits with status 1 when a case got slower
+than the threshold (relative, and by at least --min-delta-ms to ignore sub-millisecond noise).
+
+Usage (from backend/):
+    python -m benchmarks.suite run --size small
+    python -m benchmarks.suite run --size medium --only conversion,db --output /tmp/after.json
+    python -m benchmarks.suite compare benchmarks/results/before.json /tmp/after.json --threshold 0.15
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, Tuple
+
+SUITE_VERSION = 1
+GROUPS = ("conversion", "dataset", "db", "api")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+MOCK_PORT = 8780
+API_KEY = "sk-mock-key"
+
+SIZES = {
+    "small": dict(groups=100, segments=20, users=20, assistants=100, messages=50_000, repeat=15),
+    "medium": dict(groups=500, segments=40, users=50, assistants=500, messages=300_000, repeat=10),
+    "large": dict(groups=2000, segments=60, users=100, assistants=2000, messages=2_000_000, repeat=5),
+}
+
+# name -> (function, repeat); repeat None uses the size's default
+Cases = Dict[str, Tuple[Callable[[], object], int]]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Median, min and p95 of ``repeat`` timed calls after one warm-up call, in milliseconds."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 4),
+        "min_ms": round(timings[0], 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 4),
+        "repeat": repeat,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _conversion_cases(params: dict, tmp: str) -> Cases:
+    from conversion import convert_tgi_to_jsonl_bytes, convert_tgi_to_xlsx_and_jsonl, read_tgi_sheet, tgi_frame_to_long
+
+    from benchmarks.synthetic import write_tgi_workbook
+
+    xlsx = write_tgi_workbook(os.path.join(tmp, "tgi.xlsx"), params["groups"], params["segments"])
+    sheet = read_tgi_sheet(xlsx)
+
+    def legacy():
+        # The legacy entry point prints the paths it wrote
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_tgi_to_xlsx_and_jsonl(xlsx, os.path.join(tmp, "long.xlsx"), os.path.join(tmp, "long.json"))
+
+    slow = max(params["repeat"] // 5, 1)
+    return {
+        "conversion.read_tgi_sheet": (lambda: read_tgi_sheet(xlsx), slow),
+        "conversion.tgi_frame_to_long": (lambda: tgi_frame_to_long(sheet), None),
+        "conversion.convert_tgi_to_jsonl_bytes": (lambda: convert_tgi_to_jsonl_bytes(xlsx), slow),
+        "conversion.convert_tgi_to_xlsx_and_jsonl": (legacy, slow),
+    }
+
+
+def _dataset_cases(params: dict, tmp: str) -> Cases:
+    from conversion import HEADER_ROWS, tgi_frame_to_long
+    from partitions import partition_documents
+    from tgi_query import TGIDataset
+
+    from benchmarks.synthetic import make_tgi_frame
+
+    frame = tgi_frame_to_long(make_tgi_frame(params["groups"], params["segments"]).iloc[HEADER_ROWS:].reset_index(drop=True))
+    jsonl = frame.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8")
+    dataset = TGIDataset.from_jsonl(jsonl)
+    path = os.path.join(tmp, "dataset.arrow")
+    dataset.save(path)
+    group = f"Modalité {params['groups'] // 2}"
+    segment_a, segment_b = "Segment 1: Marque 1", "Segment 2: Marque 2"
+    return {
+        "dataset.from_jsonl": (lambda: TGIDataset.from_jsonl(jsonl), None),
+        "dataset.save_arrow": (lambda: dataset.save(os.path.join(tmp, "saved.arrow")), None),
+        "dataset.load_arrow_top10": (lambda: TGIDataset.load(path).top(k=10), None),
+        "dataset.filter_group": (lambda: dataset.filter(group=group, min_value=120, sort_by="Indice"), None),
+        "dataset.top_segment": (lambda: dataset.top(k=10, segment=segment_a), None),
+        "dataset.compare_segments": (lambda: dataset.compare(segment_a, segment_b, limit=50), None),
+        "partitions.groups": (lambda: partition_documents(dataset, "groups", "tgi"), None),
+    }
+
+
+def _db_cases(params: dict, db_path: str) -> Cases:
+    from database import DatabaseManager
+    from thread_registry import api_key_hash
+
+    db = DatabaseManager(db_path)
+    with db.pool.connection() as conn:
+        user_id, openai_id = conn.execute(
+            "SELECT user_id, openai_id FROM assistants ORDER BY message_count DESC LIMIT 1"
+        ).fetchone()
+    key_hash = api_key_hash(API_KEY)
+    events = [{'assistant_openai_id': openai_id, 'role': 'assistant' if i % 2 else 'user',
+               'content': "Quels segments surreprésentés ?", 'response_time_ms': 1200 if i % 2 else None,
+               'input_tokens': 1500 if i % 2 else 5, 'output_tokens': 200 if i % 2 else 0} for i in range(100)]
+    return {
+        "db.get_dashboard_stats": (lambda: db.get_dashboard_stats(user_id), None),
+        "db.get_analytics_data": (lambda: db.get_analytics_data(user_id), None),
+        "db.get_user_assistants": (lambda: db.get_user_assistants(user_id), None),
+        "db.list_assistants": (lambda: db.list_assistants(user_id, key_hash, 100), None),
+        "db.get_assistant_messages": (lambda: db.get_assistant_messages(openai_id), None),
+        "db.log_messages_100": (lambda: db.log_messages(events), None),
+        "db.save_and_get_thread": (
+            lambda: (db.save_thread(openai_id, user_id, key_hash, "thread_bench", 86400),
+                     db.get_thread(openai_id, user_id, key_hash, 86400)), None),
+    }
+
+
+@contextlib.contextmanager
+def _api_cases(params: dict, tmp: str) -> Iterator[Cases]:
+    """Cases driven through the FastAPI test client; the app uses the synthetic database in ``tmp``."""
+    from fastapi.security import HTTPAuthorizationCredentials
+    from fastapi.testclient import TestClient
+
+    from benchmarks.mock_openai import BackgroundServer, create_mock_app
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}/v1"
+    os.environ["OPENAI_API_KEY"] = API_KEY
+    # Immediate answers: the cases measure the handlers, not the model
+    mock = create_mock_app(run_seconds=0.0, first_token_seconds=0.0, token_seconds=0.0, index_seconds=0.0)
+    cwd = os.getcwd()
+    # The API opens ddb_manager.db and its caches in the working directory
+    os.chdir(tmp)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        import main as api
+        from tgi_query import TGIDataset
+
+        with api.db.pool.connection() as conn:
+            assistants = conn.execute("SELECT openai_id, name FROM assistants").fetchall()
+            openai_id = conn.execute(
+                "SELECT openai_id FROM assistants WHERE user_id = 1 ORDER BY message_count DESC LIMIT 1"
+            ).fetchone()[0]
+        # The remote listing must know the synthetic assistants, or the first reconciliation deletes them
+        for assistant_id, name in assistants:
+            mock.state.mock["assistants"][assistant_id] = {
+                "id": assistant_id, "object": "assistant", "created_at": int(time.time()), "name": name,
+                "model": "gpt-4o", "instructions": "", "tools": [], "tool_resources": None, "metadata": {},
+            }
+        from conversion import HEADER_ROWS, tgi_frame_to_long
+
+        from benchmarks.synthetic import make_tgi_frame
+        frame = tgi_frame_to_long(make_tgi_frame(params["groups"], params["segments"]).iloc[HEADER_ROWS:].reset_index(drop=True))
+        api.dataset_store.save(openai_id, TGIDataset.from_frame(frame))
+
+        with BackgroundServer(mock, MOCK_PORT), TestClient(api.app) as client:
+            token = client.post("/auth/login", json={"username": "admin", "password": "admin123"}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}", "X-OpenAI-Key": API_KEY}
+
+            def call(method: str, url: str, **kwargs):
+                def run():
+                    response = client.request(method, url, headers=headers, **kwargs)
+                    response.raise_for_status()
+                    return response
+                return run
+
+            def stream():
+                with client.stream("POST", f"/assistants/{openai_id}/message/stream", headers=headers,
+                                   json={"message": "Quels segments sont surreprésentés ?", "use_cache": False}) as r:
+                    r.raise_for_status()
+                    for _ in r.iter_lines():
+                        pass
+
+            credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+            query = {"op": "top", "metric": "Indice", "limit": 10, "segment": "Segment 1: Marque 1"}
+            yield {
+                "api.verify_admin_role": (lambda: api.verify_admin_role(credentials), None),
+                "api.login": (call("POST", "/auth/login", json={"username": "admin", "password": "admin123"}), None),
+                "api.list_assistants": (call("GET", "/assistants", params={"limit": 100}), None),
+                "api.dashboard_stats": (call("GET", "/dashboard/stats"), None),
+                "api.analytics_data": (call("GET", "/analytics/data"), None),
+                "api.chat_history": (call("GET", f"/assistants/{openai_id}/messages"), None),
+                "api.dataset_query": (call("POST", f"/assistants/{openai_id}/query", json=query), None),
+                "api.message_stream": (stream, None),
+                "api.metrics": (call("GET", "/metrics"), None),
+            }
+    finally:
+        os.chdir(cwd)
+
+
+def run(args) -> int:
+    params = dict(SIZES[args.size])
+    for name in ("groups", "segments", "users", "assistants", "messages", "repeat"):
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        print(f"Unknown groups: {', '.join(sorted(unknown))} (use {', '.join(GROUPS)})")
+        return 2
+
+    from benchmarks.synthetic import make_synthetic_db
+    from thread_registry import api_key_hash
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if "db" in groups or "api" in groups:
+            start = time.perf_counter()
+            make_synthetic_db(os.path.join(tmp, "ddb_manager.db"), params["users"], params["assistants"],
+                              params["messages"], api_key_hash=api_key_hash(API_KEY))
+            print(f"synthetic db: {params['messages']} messages in {time.perf_counter() - start:.1f}s")
+
+        def record(cases: Cases):
+            for name, (fn, repeat) in cases.items():
+                results[name] = measure(fn, repeat or params["repeat"])
+                print(f"  {name:42s} median {results[name]['median_ms']:10.3f} ms  "
+                      f"p95 {results[name]['p95_ms']:10.3f} ms")
+
+        if "conversion" in groups:
+            record(_conversion_cases(params, tmp))
+        if "dataset" in groups:
+            record(_dataset_cases(params, tmp))
+        if "db" in groups:
+            record(_db_cases(params, os.path.join(tmp, "ddb_manager.db")))
+        if "api" in groups:
+            with _api_cases(params, tmp) as cases:
+                record(cases)
+
+    commit = _git_commit()
+    report = {
+        "suite_version": SUITE_VERSION,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": args.size,
+        "params": params,
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}-{args.size}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+    return 0
+
+
+def compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get("params") != current.get("params"):
+        print(f"⚠️ Different parameters: {baseline.get('params')} vs {current.get('params')}")
+
+    print(f"{'case':42s} {'baseline ms':>12s} {'current ms':>12s} {'change':>8s}")
+    regressions = []
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        before, after = baseline["results"].get(name), current["results"].get(name)
+        if before is None or after is None:
+            print(f"{name:42s} {'only in ' + ('current' if before is None else 'baseline'):>34s}")
+            continue
+        b, c = before["median_ms"], after["median_ms"]
+        change = (c - b) / b if b else 0.0
+        flag = ""
+        if change > args.threshold and c - b > args.min_delta_ms:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif change < -args.threshold and b - c > args.min_delta_ms:
+            flag = "improved"
+        print(f"{name:42s} {b:12.3f} {c:12.3f} {change:+8.1%} {flag}")
+
+    print(f"{baseline.get('git_commit')} -> {current.get('git_commit')}: "
+          f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite and write its results as JSON")
+    run_parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    run_parser.add_argument("--only", help=f"comma-separated groups among {', '.join(GROUPS)}")
+    run_parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>-<size>.json)")
+    for name in ("groups", "segments", "users", "assistants", "messages", "repeat"):
+        run_parser.add_argument(f"--{name}", type=int, help=f"override the size's {name}")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files, exit 1 on regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15, help="relative slowdown flagged")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.05, help="smaller slowdowns are noise")
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
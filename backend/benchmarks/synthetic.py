@@ -0,0 +1,130 @@
+"""Synthetic TGI inputs for the benchmarks."""
+import numpy as np
+import pandas as pd
+
+from conversion import METRIC_LABELS
+
+
+def make_tgi_frame(n_groups: int, n_segments: int, seed: int = 0, empty_rate: float = 0.1,
+                   suppressed_rate: float = 0.0) -> pd.DataFrame:
+    """Build a raw TGI sheet (4 header rows included) as read by pd.read_excel(header=None).
+
+    ``empty_rate`` is the share of metric rows with one empty cell, ``suppressed_rate`` the share of
+    "(000)" / "% Vert" / "% Horz" rows with one suppressed ("*") cell.
+    """
+    rng = np.random.default_rng(seed)
+    n_cols = 3 + n_segments
+    rows = [
+        ["TGI France"] + [None] * (n_cols - 1),
+        ["Base: Total interviewé"] + [None] * (n_cols - 1),
+        [None] * n_cols,
+        [None] * n_cols,
+        [None, None, "Total"] + [f"Segment {s}: Marque {s}" for s in range(n_segments)],
+    ]
+
+    def metric_rows():
+        block = []
+        for label in METRIC_LABELS:
+            if label == "Echantillon":
+                vals = rng.integers(5, 2000, size=n_segments + 1).tolist()
+            elif label == "Indice":
+                vals = rng.integers(20, 300, size=n_segments + 1).tolist()
+            else:
+                vals = np.round(rng.random(n_segments + 1) * 1000, 6).tolist()
+            # Quelques cellules vides, comme dans les vrais exports
+            if rng.random() < empty_rate:
+                vals[int(rng.integers(0, n_segments + 1))] = None
+            # Et des effectifs trop faibles, masqués par "*"
+            if suppressed_rate and label not in ("Echantillon", "Indice") and rng.random() < suppressed_rate:
+                vals[int(rng.integers(0, n_segments + 1))] = "*"
+            block.append([None, label] + vals)
+        return block
+
+    rows.extend(metric_rows())
+    for g in range(n_groups):
+        rows.extend(metric_rows())
+        rows.append([f"Interviewé: Critère {g % 7}: Modalité {g}"] + [None] * (n_cols - 1))
+    return pd.DataFrame(rows)
+
+
+def write_tgi_workbook(path: str, n_groups: int, n_segments: int, seed: int = 0, **options) -> str:
+    """Write a synthetic TGI workbook to ``path`` (``options`` as in make_tgi_frame)."""
+    make_tgi_frame(n_groups, n_segments, seed, **options).to_excel(path, header=False, index=False)
+    return path
+
+
+def make_synthetic_db(path: str, n_users: int, n_assistants: int, n_messages: int, seed: int = 0,
+                      api_key_hash: str = None) -> str:
+    """Create a migrated database filled with users, assistants and chat messages spread over 90 days.
+
+    With ``api_key_hash``, the assistants are listed under that key (GET /assistants).
+    """
+    import sqlite3
+
+    from database import DatabaseManager
+    from migrations import rebuild_usage_daily
+
+    db = DatabaseManager(path)
+    db.pool.close()
+    rng = np.random.default_rng(seed)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO users (username, password_hash, email, role) VALUES (?, ?, ?, 'user')",
+        ((f"user{u}", db.hash_password("pw"), f"user{u}@ddb.com") for u in range(n_users)),
+    )
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    owners = rng.choice(user_ids, size=n_assistants)
+    conn.executemany(
+        "INSERT INTO assistants (openai_id, name, theme, user_id, created_at, file_name, file_type, api_key_hash, "
+        "ingestion_mode) VALUES (?, ?, ?, ?, datetime('now', ?), 'tgi.json', 'JSON', ?, ?)",
+        ((f"asst_{a}", f"Assistant {a}", f"Thème {a % 12}", int(owners[a]), f"-{a % 90} days", api_key_hash,
+          ("single", "groups", "segments")[a % 3])
+         for a in range(n_assistants)),
+    )
+    conn.executemany(
+        "INSERT INTO activity_log (user_id, action, details, created_at) VALUES (?, 'assistant_created', ?, datetime('now', ?))",
+        ((int(owners[a]), f"Created assistant: Assistant {a}", f"-{a % 90} days") for a in range(n_assistants)),
+    )
+    assistant_ids = [row[0] for row in conn.execute("SELECT id FROM assistants")]
+
+    batch = 100_000
+    for offset in range(0, n_messages, batch):
+        size = min(batch, n_messages - offset)
+        assistants = rng.choice(assistant_ids, size=size)
+        seconds_ago = rng.integers(0, 90 * 86400, size=size)
+        input_tokens = rng.integers(200, 4000, size=size)
+        output_tokens = rng.integers(50, 800, size=size)
+        response_ms = rng.integers(800, 15000, size=size)
+        turns = rng.integers(1, 40, size=size)
+        rows = []
+        for i in range(size):
+            is_assistant = (offset + i) % 2 == 1
+            it, ot = int(input_tokens[i]), int(output_tokens[i]) if is_assistant else 0
+            rows.append((
+                int(assistants[i]), "assistant" if is_assistant else "user", "Quels segments surreprésentés ?",
+                f"-{int(seconds_ago[i])} seconds", int(response_ms[i]) if is_assistant else None,
+                it, ot, it + ot, db.calculate_gpt4o_cost(it, ot) if is_assistant else 0.0,
+                ("full", "last_messages", "last_messages+summary")[i % 3] if is_assistant else None,
+                int(turns[i]) if is_assistant else None,
+            ))
+        conn.executemany(
+            "INSERT INTO messages (assistant_id, role, content, created_at, response_time_ms, "
+            "input_tokens, output_tokens, total_tokens, cost_euros, context_strategy, context_turn) "
+            "VALUES (?, ?, ?, datetime('now', ?), ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+
+    conn.execute("""
+        UPDATE assistants SET
+            message_count = (SELECT COUNT(*) FROM messages m WHERE m.assistant_id = assistants.id),
+            total_tokens = (SELECT COALESCE(SUM(total_tokens), 0) FROM messages m WHERE m.assistant_id = assistants.id),
+            total_cost_euros = (SELECT COALESCE(SUM(cost_euros), 0) FROM messages m WHERE m.assistant_id = assistants.id)
+    """)
+    rebuild_usage_daily(conn)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return path
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from database import DatabaseManager
+
+# full: the whole thread; last_messages: the most recent messages only; auto: OpenAI drops the
+# oldest messages only when the model's context window is full
+CONTEXT_STRATEGIES = ("full", "last_messages", "auto")
+
+SUMMARY_PROMPT = (
+    "Tu résumes une conversation entre un utilisateur et un assistant d'analyse d'audience TGI. "
+    "Mets à jour le résumé existant avec les nouveaux échanges. Conserve les groupes, segments, "
+    "indicateurs et chiffres cités, les conclusions et les préférences de l'utilisateur. "
+    "Réponds uniquement par le résumé, en français, en moins de {max_words} mots."
+)
+# Longest part of one message sent to the summary (questions may carry a local query table)
+SUMMARY_MESSAGE_CHARS = 2000
+
+
+class ContextManager:
+    """Bounds the conversation history sent with each assistant run.
+
+    Every run gets the ``truncation_strategy`` of its assistant's strategy. With ``last_messages``
+    and rolling summaries enabled, turns leaving the window are summarized every ``summary_every``
+    turns with a small model; the summary goes with each run as ``additional_instructions``, and
+    the window is widened to the messages not summarized yet, so no message is ever out of both.
+    Input tokens per question then stay within a fixed bound however long the conversation gets.
+    Windows are sized on the messages counted in each thread, not on its turns: a failed run
+    leaves a question without answer.
+
+    Settings are per assistant (stored in SQLite, None falling back to the defaults given here)
+    and cached in-process for ``cache_seconds``. Summaries run in the background after the
+    answer is returned.
+    """
+
+    def __init__(self, db: DatabaseManager, strategy: str = "full", last_messages: int = 6, summary: bool = False,
+                 summary_model: str = "gpt-4o-mini", summary_every: int = 2, summary_max_tokens: int = 400,
+                 cache_seconds: float = 30.0):
+        self.db = db
+        self.defaults = {'strategy': strategy, 'last_messages': last_messages, 'summary': summary}
+        self.summary_model = summary_model
+        self.summary_every = max(summary_every, 1)
+        self.summary_max_tokens = summary_max_tokens
+        self.cache_seconds = cache_seconds
+        self._settings: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._summarizing: set = set()
+        self._tasks: set = set()
+        self._lock = threading.Lock()
+        self.truncated_runs = 0
+        self.summaries = 0
+        self.summary_failures = 0
+        self.summary_input_tokens = 0
+        self.summary_output_tokens = 0
+
+    def settings(self, assistant_id: str) -> Dict[str, Any]:
+        """Effective settings of an assistant: its own where set, the defaults otherwise."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._settings.get(assistant_id)
+            if entry and now - entry[1] < self.cache_seconds:
+                return entry[0]
+        stored = self.db.get_context_settings(assistant_id) or {}
+        settings = {name: stored.get(name) if stored.get(name) is not None else default
+                    for name, default in self.defaults.items()}
+        with self._lock:
+            self._settings[assistant_id] = (settings, now)
+        return settings
+
+    def update(self, assistant_id: str, strategy: Optional[str], last_messages: Optional[int],
+               summary: Optional[bool]) -> bool:
+        """Store the settings of an assistant (None restores a default); False if it is unknown."""
+        if strategy is not None and strategy not in CONTEXT_STRATEGIES:
+            raise ValueError(f"Unknown context strategy '{strategy}', use {', '.join(CONTEXT_STRATEGIES)}")
+        if last_messages is not None and last_messages < 2:
+            raise ValueError("last_messages must keep at least the question and one previous message")
+        updated = self.db.set_context_settings(assistant_id, strategy, last_messages, summary)
+        with self._lock:
+            self._settings.pop(assistant_id, None)
+        return updated
+
+    def _kept_turns(self, settings: Dict[str, Any]) -> int:
+        """Complete turns that fit in the window next to the new question."""
+        return (settings['last_messages'] - 1) // 2
+
+    def run_options(self, assistant_id: str, thread_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Arguments to add to ``runs.create`` and the context of this turn (strategy and turn number).
+
+        Called once the question is added to the thread, which it counts.
+        """
+        settings = self.settings(assistant_id)
+        state = self.db.record_thread_question(thread_id) or {
+            'turns': 0, 'summary': None, 'summarized_turns': 0, 'messages': 1, 'summarized_messages': 0
+        }
+        summarized = settings['strategy'] == 'last_messages' and settings['summary']
+        # Logged with the answer: strategy ('last_messages+summary' with summaries) and turn number
+        turn = {'context_strategy': settings['strategy'] + ('+summary' if summarized else ''),
+                'context_turn': state['turns'] + 1}
+        if settings['strategy'] == 'full':
+            return {}, turn
+        if settings['strategy'] == 'auto':
+            return {'truncation_strategy': {'type': 'auto'}}, turn
+
+        last_messages = settings['last_messages']
+        options = {}
+        if summarized:
+            # Messages not in the summary yet (the question included) stay in the window until the
+            # next summary covers them
+            last_messages = max(last_messages, state['messages'] - state['summarized_messages'])
+            if state['summary']:
+                options['additional_instructions'] = f"Résumé de la conversation précédente :\n{state['summary']}"
+        options['truncation_strategy'] = {'type': 'last_messages', 'last_messages': last_messages}
+        if state['messages'] > last_messages:
+            with self._lock:
+                self.truncated_runs += 1
+        return options, turn
+
+    def complete_turn(self, assistant_id: str, thread_id: str, client):
+        """Count an answered turn; start a summary in the background when enough turns left the window."""
+        turns = self.db.record_thread_turn(thread_id)
+        settings = self.settings(assistant_id)
+        if not (settings['strategy'] == 'last_messages' and settings['summary']) or not turns:
+            return
+        state = self.db.get_thread_context(thread_id)
+        if state['turns'] - state['summarized_turns'] < self._kept_turns(settings) + self.summary_every:
+            return
+        with self._lock:
+            if thread_id in self._summarizing:
+                return
+            self._summarizing.add(thread_id)
+        task = asyncio.create_task(self._summarize(client, thread_id, state, settings))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, client, thread_id: str, state: Dict[str, Any], settings: Dict[str, Any]):
+        """Fold the oldest messages that are not summarized yet and leave the window into the thread's summary."""
+        count = state['messages'] - state['summarized_messages'] - (settings['last_messages'] - 1)
+        try:
+            if count <= 0:
+                return
+            params = {'thread_id': thread_id, 'order': 'asc', 'limit': min(count, 100)}
+            if state['summary_until']:
+                params['after'] = state['summary_until']
+            page = await client.beta.threads.messages.list(**params)
+            folded = page.data
+            # A question is folded with its answer: one cut after it stays in the window
+            if folded and folded[-1].role == 'user':
+                folded = folded[:-1]
+            if not folded:
+                return
+            transcript = "\n\n".join(
+                f"{'Utilisateur' if m.role == 'user' else 'Assistant'} : "
+                + "".join(c.text.value for c in m.content if c.type == 'text')[:SUMMARY_MESSAGE_CHARS]
+                for m in folded
+            )
+            previous = state['summary'] or "(aucun)"
+            completion = await client.chat.completions.create(
+                model=self.summary_model,
+                max_tokens=self.summary_max_tokens,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT.format(max_words=self.summary_max_tokens * 2 // 3)},
+                    {"role": "user", "content": f"Résumé existant :\n{previous}\n\nNouveaux échanges :\n{transcript}"}
+                ]
+            )
+            summary = completion.choices[0].message.content.strip()
+            usage = completion.usage
+            input_tokens = usage.prompt_tokens if usage else 0
+            output_tokens = usage.completion_tokens if usage else 0
+            saved = self.db.save_thread_summary(
+                thread_id, summary, folded[-1].id,
+                state['summarized_turns'] + sum(m.role == 'assistant' for m in folded),
+                state['summarized_messages'] + len(folded), state['summarized_messages'],
+                input_tokens, output_tokens
+            )
+            with self._lock:
+                self.summary_input_tokens += input_tokens
+                self.summary_output_tokens += output_tokens
+                if saved:
+                    self.summaries += 1
+        except Exception as e:
+            # The window keeps every turn not summarized, the next turn retries
+            with self._lock:
+                self.summary_failures += 1
+            print(f"⚠️ Conversation summary failed for {thread_id}: {e}")
+        finally:
+            with self._lock:
+                self._summarizing.discard(thread_id)
+
+    async def drain(self):
+        """Wait for the summaries in progress (shutdown)."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'defaults': dict(self.defaults),
+                'summary_model': self.summary_model,
+                'truncated_runs': self.truncated_runs,
+                'summaries': self.summaries,
+                'summaries_in_progress': len(self._summarizing),
+                'summary_failures': self.summary_failures,
+                'summary_input_tokens': self.summary_input_tokens,
+                'summary_output_tokens': self.summary_output_tokens
+            }
@@ -1,8 +1,421 @@
 import pandas as pd
-import sys
+import numpy as np
+import openpyxl
+import csv
+import io
 import os
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def convert_tgi_to_xlsx_and_jsonl(input_xlsx, output_xlsx=None, output_jsonl=None):
+# À incrémenter dès que le format de sortie change (invalide le cache de conversion)
+CONVERTER_VERSION = "4"
+
+# Lignes de mesure d'un bloc TGI, dans l'ordre des colonnes de sortie
+METRIC_LABELS = ["Echantillon", "(000)", "% Vert", "% Horz", "Indice"]
+OUTPUT_COLUMNS = ["Groupe_interviewé", "Segment"] + METRIC_LABELS
+BLOCK_SIZE = len(METRIC_LABELS)
+HEADER_ROWS = 4
+TOTAL_LABEL = "Total interviewé"
+GROUP_MARKER = "Interviewé:"
+SOURCE_FILE_COLUMN = "Fichier_source"
+SOURCE_SHEET_COLUMN = "Feuille_source"
+
+
+def read_tgi_sheet(input_xlsx, sheet_name=0):
+    """Charge une feuille TGI brute, sans ses lignes d'entête."""
+    df = pd.read_excel(input_xlsx, sheet_name=sheet_name, header=None)
+    return df.iloc[HEADER_ROWS:].reset_index(drop=True)
+
+
+def tgi_frame_to_long(df):
+    """Convertit une feuille TGI (sans entête) en tableau long, sans boucle par segment.
+
+    Tous les blocs de 5 lignes (bloc "Total interviewé" puis un bloc par groupe
+    "Interviewé:") sont extraits en une seule indexation NumPy de forme
+    (blocs, mesures, colonnes), puis aplatis dans l'ordre de l'ancien convertisseur.
+    """
+    n_cols = df.shape[1]
+    segments = df.iloc[0, 3:].to_numpy(dtype=object)
+    n_seg = len(segments)
+
+    # Quelques lignes vides en fin de tableau pour les blocs tronqués
+    values = np.vstack([
+        df.to_numpy(dtype=object),
+        np.full((BLOCK_SIZE, n_cols), np.nan, dtype=object),
+    ])
+
+    first_col = df[0].fillna("").astype(str)
+    group_rows = np.flatnonzero(first_col.str.contains(GROUP_MARKER, regex=False).to_numpy(dtype=bool))
+    group_rows = group_rows[group_rows >= BLOCK_SIZE]
+
+    # Le bloc "Total interviewé" occupe les lignes 1 à 5, chaque groupe les 5 lignes qui précèdent son libellé
+    block_starts = np.concatenate([[1], group_rows - BLOCK_SIZE])
+    n_blocks = len(block_starts)
+    block_rows = block_starts[:, None] + np.arange(BLOCK_SIZE)
+    labels = values[block_rows, 1]
+
+    # Colonnes de valeurs : segments d'abord, colonne "Total" (2) en dernier
+    value_cols = np.append(np.arange(3, 3 + n_seg), 2)
+    metrics = np.full((n_blocks, n_seg + 1, BLOCK_SIZE), None, dtype=object)
+    block_ids = np.arange(n_blocks)
+    for m, label in enumerate(METRIC_LABELS):
+        mask = labels == label
+        found = mask.any(axis=1)
+        # Comme dict(zip(...)) : la dernière occurrence du libellé l'emporte
+        last = BLOCK_SIZE - 1 - np.argmax(mask[:, ::-1], axis=1)
+        src_rows = block_rows[block_ids, last][found]
+        metrics[found, :, m] = values[src_rows[:, None], value_cols[None, :]]
+
+    group_names = [TOTAL_LABEL] + [str(df.iat[i, 0]).strip() for i in group_rows]
+    total_names = [TOTAL_LABEL] + [
+        f"{TOTAL_LABEL} : {name.split(':', 1)[-1].strip()}" for name in group_names[1:]
+    ]
+    groups = np.empty((n_blocks, n_seg + 1), dtype=object)
+    groups[:, :n_seg] = np.array(group_names, dtype=object)[:, None]
+    groups[:, n_seg] = total_names
+
+    segment_row = np.empty(n_seg + 1, dtype=object)
+    segment_row[:n_seg] = segments
+    segment_row[n_seg] = "Total"
+
+    columns = {
+        "Groupe_interviewé": groups.ravel().tolist(),
+        "Segment": np.tile(segment_row, n_blocks).tolist(),
+    }
+    for m, label in enumerate(METRIC_LABELS):
+        columns[label] = metrics[:, :, m].ravel().tolist()
+    return pd.DataFrame(columns, columns=OUTPUT_COLUMNS)
+
+
+def _cell_value(value):
+    # Comme pd.read_excel : un flottant entier est rendu en int
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _block_records(block, group_name, total_name, segments):
+    """Enregistrements longs d'un bloc de 5 lignes (la dernière occurrence d'un libellé l'emporte)."""
+    by_label = {row[1]: row for row in block}
+    metric_rows = [by_label.get(label) for label in METRIC_LABELS]
+    for seg_idx, segment in enumerate(segments):
+        record = {"Groupe_interviewé": group_name, "Segment": segment}
+        for label, row in zip(METRIC_LABELS, metric_rows):
+            record[label] = row[3 + seg_idx] if row is not None else None
+        yield record
+    record = {"Groupe_interviewé": total_name, "Segment": "Total"}
+    for label, row in zip(METRIC_LABELS, metric_rows):
+        record[label] = row[2] if row is not None else None
+    yield record
+
+
+def iter_tgi_records(input_xlsx, sheet_name=0):
+    """Lit une feuille TGI ligne à ligne (openpyxl en lecture seule) et produit les enregistrements longs.
+
+    Seules les 5 dernières lignes lues sont conservées : la mémoire reste bornée par un bloc,
+    quelle que soit la taille de la feuille. Les enregistrements sont ceux de tgi_frame_to_long,
+    dans le même ordre (les cellules vides valent None au lieu de NaN).
+    """
+    wb = openpyxl.load_workbook(input_xlsx, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        rows = ws.iter_rows(values_only=True)
+        for _ in range(HEADER_ROWS):
+            next(rows, None)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        header = [_cell_value(v) for v in header]
+        segments = header[3:]
+        n_cols = len(header)
+        window = deque([header], maxlen=BLOCK_SIZE)
+        total_block = []
+        total_done = False
+
+        for i, raw in enumerate(rows, start=1):
+            row = [_cell_value(v) for v in raw[:n_cols]]
+            row.extend([None] * (n_cols - len(row)))
+
+            if i <= BLOCK_SIZE:
+                total_block.append(row)
+            if i == BLOCK_SIZE:
+                yield from _block_records(total_block, TOTAL_LABEL, TOTAL_LABEL, segments)
+                total_done = True
+
+            first = row[0]
+            if i >= BLOCK_SIZE and isinstance(first, str) and GROUP_MARKER in first:
+                group_name = first.strip()
+                total_name = f"{TOTAL_LABEL} : {group_name.split(':', 1)[-1].strip()}"
+                yield from _block_records(window, group_name, total_name, segments)
+            window.append(row)
+
+        if not total_done:
+            yield from _block_records(total_block, TOTAL_LABEL, TOTAL_LABEL, segments)
+    finally:
+        wb.close()
+
+
+SINK_FORMATS = ("jsonl", "csv", "parquet", "xlsx")
+# Enregistrements écrits par lot dans les sorties JSONL et Parquet en streaming
+STREAM_BATCH_ROWS = 10_000
+
+
+def _as_source(input_xlsx):
+    # Les octets d'un upload sont lus directement en mémoire, sans fichier temporaire
+    if isinstance(input_xlsx, (bytes, bytearray)):
+        return io.BytesIO(input_xlsx)
+    return input_xlsx
+
+
+def _open_sink(dest):
+    """Ouvre une destination (chemin ou objet fichier binaire) ; renvoie (fichier, à_fermer)."""
+    if isinstance(dest, (str, os.PathLike)):
+        return open(dest, "wb"), True
+    return dest, False
+
+
+def _json_cell(value):
+    # Cellule vide -> null ; les autres valeurs sont gardées telles quelles ("*" d'une cellule masquée compris)
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return _cell_value(value)
+
+
+def _jsonl_bytes(df):
+    """Lignes JSONL d'un tableau long ; chaque mesure est écrite cellule par cellule.
+
+    Un entier reste un entier, un texte reste un texte et une cellule vide vaut null : le type
+    d'une valeur ne dépend pas du reste de la colonne, et les modes normal et streaming
+    produisent les mêmes octets.
+    """
+    df = df.assign(**{
+        label: pd.Series([_json_cell(v) for v in df[label].tolist()], index=df.index, dtype=object)
+        for label in METRIC_LABELS
+    })
+    return df.to_json(orient='records', lines=True, force_ascii=False).encode("utf-8")
+
+
+def _write_frame(df, fmt, dest):
+    if fmt == "jsonl":
+        data = _jsonl_bytes(df)
+        f, owned = _open_sink(dest)
+        try:
+            f.write(data)
+        finally:
+            if owned:
+                f.close()
+    elif fmt == "csv":
+        df.to_csv(dest, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(dest, index=False)
+    elif fmt == "xlsx":
+        df.to_excel(dest, index=False)
+
+
+class _JsonlStreamSink:
+    def __init__(self, dest):
+        self.f, self.owned = _open_sink(dest)
+        self.batch = []
+
+    def write(self, record):
+        self.batch.append(record)
+        if len(self.batch) >= STREAM_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        # Même sérialisation que le mode normal, par lots de taille bornée
+        if self.batch:
+            self.f.write(_jsonl_bytes(pd.DataFrame(self.batch, columns=OUTPUT_COLUMNS)))
+            self.batch = []
+
+    def close(self):
+        self._flush()
+        if self.owned:
+            self.f.close()
+
+
+class _CsvStreamSink:
+    def __init__(self, dest):
+        self.f, self.owned = _open_sink(dest)
+        self.text = io.TextIOWrapper(self.f, encoding="utf-8", newline="", write_through=True)
+        self.writer = csv.writer(self.text, lineterminator="\n")
+        self.writer.writerow(OUTPUT_COLUMNS)
+
+    def write(self, record):
+        self.writer.writerow([record[col] for col in OUTPUT_COLUMNS])
+
+    def close(self):
+        self.text.flush()
+        # Ne pas fermer un objet fichier fourni par l'appelant avec le wrapper texte
+        self.text.detach()
+        if self.owned:
+            self.f.close()
+
+
+class _XlsxStreamSink:
+    def __init__(self, dest):
+        self.dest = dest
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        self.ws.append(OUTPUT_COLUMNS)
+
+    def write(self, record):
+        self.ws.append([record[col] for col in OUTPUT_COLUMNS])
+
+    def close(self):
+        self.wb.save(self.dest)
+
+
+class _ParquetStreamSink:
+    def __init__(self, dest):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema(
+            [(col, pa.string()) for col in OUTPUT_COLUMNS[:2]]
+            + [(col, pa.float64()) for col in METRIC_LABELS]
+        )
+        self.writer = pq.ParquetWriter(dest, self.schema)
+        self.batch = []
+
+    def write(self, record):
+        self.batch.append(record)
+        if len(self.batch) >= STREAM_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.batch:
+            self.writer.write_table(self.pa.Table.from_pylist(self.batch, schema=self.schema))
+            self.batch = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+_STREAM_SINKS = {
+    "jsonl": _JsonlStreamSink,
+    "csv": _CsvStreamSink,
+    "parquet": _ParquetStreamSink,
+    "xlsx": _XlsxStreamSink,
+}
+
+
+def convert_tgi(input_xlsx, sinks=None, sheet_name=0, streaming=False):
+    """Convertit une feuille TGI au format long et l'écrit dans les sorties choisies par l'appelant.
+
+    input_xlsx : chemin, objet fichier ou octets du classeur.
+    sinks : dict {format: destination} avec format parmi SINK_FORMATS et destination un chemin
+    ou un objet fichier binaire (ex. io.BytesIO). Sans sinks, rien n'est écrit.
+
+    En mode normal, renvoie le DataFrame long. En mode streaming, les enregistrements sont
+    écrits au fil de la lecture et la fonction renvoie leur nombre.
+    """
+    sinks = sinks or {}
+    unknown = set(sinks) - set(SINK_FORMATS)
+    if unknown:
+        raise ValueError(f"Format de sortie inconnu : {', '.join(sorted(unknown))}")
+    source = _as_source(input_xlsx)
+
+    if not streaming:
+        final_df = tgi_frame_to_long(read_tgi_sheet(source, sheet_name))
+        for fmt, dest in sinks.items():
+            _write_frame(final_df, fmt, dest)
+        return final_df
+
+    writers = [_STREAM_SINKS[fmt](dest) for fmt, dest in sinks.items()]
+    count = 0
+    try:
+        for record in iter_tgi_records(source, sheet_name):
+            for writer in writers:
+                writer.write(record)
+            count += 1
+    finally:
+        for writer in writers:
+            writer.close()
+    return count
+
+
+def convert_tgi_to_jsonl_bytes(input_xlsx, sheet_name=0, streaming=False):
+    """Convertit un classeur TGI directement en octets JSONL, sans fichier intermédiaire."""
+    buf = io.BytesIO()
+    convert_tgi(input_xlsx, sinks={"jsonl": buf}, sheet_name=sheet_name, streaming=streaming)
+    return buf.getvalue()
+
+
+def available_cpus():
+    """Nombre de cœurs réellement utilisables par le processus."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def list_sheets(input_xlsx):
+    """Noms des feuilles d'un classeur, sans charger leurs cellules (.xlsx)."""
+    if isinstance(input_xlsx, (str, os.PathLike)) and os.fspath(input_xlsx).lower().endswith(".xls"):
+        # Ancien format binaire : openpyxl ne le lit pas, pandas choisit le moteur comme pour read_tgi_sheet
+        with pd.ExcelFile(input_xlsx) as xls:
+            return list(xls.sheet_names)
+    wb = openpyxl.load_workbook(input_xlsx, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def _convert_batch_item(item):
+    # Exécuté dans un processus du pool : une feuille d'un fichier
+    path, sheet_name = item
+    start = time.perf_counter()
+    df = tgi_frame_to_long(read_tgi_sheet(path, sheet_name))
+    df.insert(0, SOURCE_SHEET_COLUMN, sheet_name)
+    df.insert(0, SOURCE_FILE_COLUMN, os.path.basename(path))
+    return df, time.perf_counter() - start
+
+
+def convert_tgi_batch(inputs, all_sheets=False, max_workers=None, sinks=None):
+    """Convertit plusieurs classeurs/feuilles TGI en parallèle et fusionne les résultats.
+
+    inputs : chemins de classeurs, ou tuples (chemin, feuille). Un chemin seul désigne sa première
+    feuille, ou toutes ses feuilles si all_sheets est vrai.
+    max_workers : taille du pool de processus (par défaut, les cœurs disponibles).
+
+    Renvoie (DataFrame fusionné avec les colonnes Fichier_source et Feuille_source, timings),
+    timings étant une liste de dicts {file, sheet, rows, seconds} dans l'ordre des entrées.
+    """
+    items = []
+    for entry in inputs:
+        if isinstance(entry, (tuple, list)):
+            items.append((entry[0], entry[1]))
+        else:
+            sheets = list_sheets(entry)
+            items.extend((entry, name) for name in (sheets if all_sheets else sheets[:1]))
+
+    workers = max(1, min(max_workers or available_cpus(), len(items)))
+    if workers == 1:
+        results = [_convert_batch_item(item) for item in items]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_convert_batch_item, items))
+
+    frames = [df for df, _ in results]
+    merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=[SOURCE_FILE_COLUMN, SOURCE_SHEET_COLUMN] + OUTPUT_COLUMNS
+    )
+    timings = [
+        {"file": os.path.basename(path), "sheet": sheet, "rows": len(df), "seconds": round(elapsed, 4)}
+        for (path, sheet), (df, elapsed) in zip(items, results)
+    ]
+    for fmt, dest in (sinks or {}).items():
+        _write_frame(merged, fmt, dest)
+    return merged, timings
+
+
+def convert_tgi_to_xlsx_and_jsonl(input_xlsx, output_xlsx=None, output_jsonl=None, streaming=False):
     # Définition des chemins de sortie si non précisés
     base = os.path.splitext(os.path.basename(input_xlsx))[0]
     if output_xlsx is None:
@@ -10,75 +423,36 @@ def convert_tgi_to_xlsx_and_jsonl(input_xlsx, output_xlsx=None, output_jsonl=Non
     if output_jsonl is None:
         output_jsonl = base + "_long_ALL_AVEC_TOTAL.json"
 
-    # Chargement du fichier Excel
-    df = pd.read_excel(input_xlsx, sheet_name=0, header=None)
-    df = df.iloc[4:].reset_index(drop=True)  # On saute les 4 premières lignes d'entête
+    convert_tgi(input_xlsx, sinks={"xlsx": output_xlsx, "jsonl": output_jsonl}, streaming=streaming)
+    print(f"✅ Fichier Excel généré : {output_xlsx}")
+    print(f"✅ Fichier JSONL généré : {output_jsonl}")
 
-    segments = df.iloc[0, 3:].tolist()
-    rows = []
 
-    # Bloc "Total interviewé" (lignes 6 à 10 → ici il reste 1:6)
-    total_block = df.iloc[1:6, :]
-    for seg_idx, segment in enumerate(segments):
-        seg_col_idx = 3 + seg_idx
-        label_val = dict(zip(total_block.iloc[:, 1], total_block.iloc[:, seg_col_idx]))
-        rows.append({
-            "Groupe_interviewé": "Total interviewé",
-            "Segment": segment,
-            "Echantillon": label_val.get("Echantillon"),
-            "(000)": label_val.get("(000)"),
-            "% Vert": label_val.get("% Vert"),
-            "% Horz": label_val.get("% Horz"),
-            "Indice": label_val.get("Indice"),
-        })
-    block_total = dict(zip(total_block.iloc[:, 1], total_block.iloc[:, 2]))
-    rows.append({
-        "Groupe_interviewé": "Total interviewé",
-        "Segment": "Total",
-        "Echantillon": block_total.get("Echantillon"),
-        "(000)": block_total.get("(000)"),
-        "% Vert": block_total.get("% Vert"),
-        "% Horz": block_total.get("% Horz"),
-        "Indice": block_total.get("Indice"),
-    })
+def _format_from_path(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return "jsonl" if ext in ("json", "jsonl") else ext
 
-    # Blocs Interviewé: ...
-    group_indices = df.index[df[0].fillna("").str.contains("Interviewé:")].tolist()
-    for idx_num, idx in enumerate(group_indices):
-        group_name = df.iloc[idx, 0].strip()
-        if idx >= 5:
-            block = df.iloc[idx-5:idx, :]
-            for seg_idx, segment in enumerate(segments):
-                seg_col_idx = 3 + seg_idx
-                label_val = dict(zip(block.iloc[:, 1], block.iloc[:, seg_col_idx]))
-                rows.append({
-                    "Groupe_interviewé": group_name,
-                    "Segment": segment,
-                    "Echantillon": label_val.get("Echantillon"),
-                    "(000)": label_val.get("(000)"),
-                    "% Vert": label_val.get("% Vert"),
-                    "% Horz": label_val.get("% Horz"),
-                    "Indice": label_val.get("Indice"),
-                })
-            block_total = dict(zip(block.iloc[:, 1], block.iloc[:, 2]))
-            rows.append({
-                "Groupe_interviewé": f"Total interviewé : {group_name.split(':',1)[-1].strip()}",
-                "Segment": "Total",
-                "Echantillon": block_total.get("Echantillon"),
-                "(000)": block_total.get("(000)"),
-                "% Vert": block_total.get("% Vert"),
-                "% Horz": block_total.get("% Horz"),
-                "Indice": block_total.get("Indice"),
-            })
-
-    final_df = pd.DataFrame(rows)
-    final_df.to_excel(output_xlsx, index=False)
-    final_df.to_json(output_jsonl, orient='records', lines=True, force_ascii=False)
-    print(f"✅ Fichier Excel généré : {output_xlsx}")
-    print(f"✅ Fichier JSONL généré : {output_jsonl}")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage : python convert_tgi_audi.py <fichier_excel_source>")
+    parser = argparse.ArgumentParser(description="Conversion des exports TGI au format long.")
+    parser.add_argument("inputs", nargs="+", help="classeur(s) Excel TGI source")
+    parser.add_argument("--streaming", action="store_true", help="lecture ligne à ligne (fichier unique)")
+    parser.add_argument("--all-sheets", action="store_true", help="convertir toutes les feuilles de chaque classeur")
+    parser.add_argument("--workers", type=int, default=None, help="taille du pool de processus (défaut : cœurs disponibles)")
+    parser.add_argument("--output", help="fichier fusionné (.jsonl, .csv, .parquet ou .xlsx) en mode lot")
+    args = parser.parse_args()
+
+    if len(args.inputs) == 1 and not args.all_sheets and not args.output:
+        convert_tgi_to_xlsx_and_jsonl(args.inputs[0], streaming=args.streaming)
     else:
-        convert_tgi_to_xlsx_and_jsonl(sys.argv[1])
+        output = args.output or "batch_long_ALL_AVEC_TOTAL.jsonl"
+        fmt = _format_from_path(output)
+        if fmt not in SINK_FORMATS:
+            parser.error(f"format de sortie non supporté : {output}")
+        start = time.perf_counter()
+        merged, timings = convert_tgi_batch(
+            args.inputs, all_sheets=args.all_sheets, max_workers=args.workers, sinks={fmt: output}
+        )
+        for t in timings:
+            print(f"⏱️  {t['file']} [{t['sheet']}] : {t['rows']} lignes en {t['seconds']:.2f}s")
+        print(f"✅ {len(merged)} lignes fusionnées en {time.perf_counter() - start:.2f}s : {output}")
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+from conversion import CONVERTER_VERSION
+
+
+class ConversionCache:
+    """Content-addressed disk cache of converted JSONL, keyed on the uploaded workbook bytes."""
+
+    def __init__(self, cache_dir: str = "conversion_cache", max_bytes: int = 512 * 2**20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conversion_seconds = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files already on disk (oldest access first)."""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".jsonl"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                files.append((st.st_mtime, name[:-len(".jsonl")], st.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.jsonl")
+
+    def key_for(self, data: bytes) -> str:
+        """Hash of the converter version and the uploaded bytes."""
+        digest = hashlib.sha256(f"tgi-v{CONVERTER_VERSION}:".encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached JSONL for a key, or None."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Keep the on-disk order in line with the LRU order across restarts
+        os.utime(self._path(key))
+        return content
+
+    def put(self, key: str, content: bytes):
+        """Store converted JSONL and evict least recently used entries above max_bytes."""
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._entries[key] = len(content)
+            self._entries.move_to_end(key)
+            total = sum(self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                old_key, size = self._entries.popitem(last=False)
+                try:
+                    os.unlink(self._path(old_key))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def get_or_convert(self, data: bytes, convert: Callable[[bytes], bytes]) -> bytes:
+        """Serve a repeat upload from the cache, otherwise convert it and store the result."""
+        key = self.key_for(data)
+        content = self.get(key)
+        if content is not None:
+            with self._lock:
+                self.hits += 1
+            return content
+
+        start = time.perf_counter()
+        content = convert(data)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.misses += 1
+            self.conversion_seconds += elapsed
+        self.put(key, content)
+        return content
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and an estimate of the conversion time saved."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_conversion = self.conversion_seconds / self.misses if self.misses else 0.0
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size_bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'estimated_seconds_saved': round(self.hits * avg_conversion, 3)
+            }
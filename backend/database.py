@@ -1,124 +1,32 @@
 import sqlite3
 import hashlib
 import datetime
-from typing import Optional, List, Dict, Any
+import json
+import time
+from typing import Optional, List, Dict, Any, Tuple
+from db_pool import SQLitePool
+from migrations import CONTEXT_TURN_BUCKETS, migrate, rebuild_usage_daily, turn_bucket
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "ddb_manager.db"):
+    def __init__(self, db_path: str = "ddb_manager.db", pool_size: int = 8):
         self.db_path = db_path
+        self.pool = SQLitePool(db_path, size=pool_size)
         self.init_database()
     
     def init_database(self):
-        """Initialize database with required tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Users table for authentication
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                email TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP
-            )
-        ''')
-        
-        # Assistants table for tracking created assistants
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS assistants (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                openai_id TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                theme TEXT NOT NULL,
-                user_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_used TIMESTAMP,
-                message_count INTEGER DEFAULT 0,
-                file_name TEXT,
-                file_type TEXT,
-                total_tokens INTEGER DEFAULT 0,
-                total_cost_euros REAL DEFAULT 0.0,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Messages table for tracking conversations with token usage
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                assistant_id INTEGER,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                response_time_ms INTEGER,
-                input_tokens INTEGER DEFAULT 0,
-                output_tokens INTEGER DEFAULT 0,
-                total_tokens INTEGER DEFAULT 0,
-                cost_euros REAL DEFAULT 0.0,
-                FOREIGN KEY (assistant_id) REFERENCES assistants (id)
-            )
-        ''')
-        
-        # Activity log table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS activity_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                action TEXT NOT NULL,
-                details TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Add new columns to existing tables if they don't exist
-        try:
-            cursor.execute('ALTER TABLE assistants ADD COLUMN total_tokens INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute('ALTER TABLE assistants ADD COLUMN total_cost_euros REAL DEFAULT 0.0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute('ALTER TABLE messages ADD COLUMN input_tokens INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute('ALTER TABLE messages ADD COLUMN output_tokens INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute('ALTER TABLE messages ADD COLUMN total_tokens INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute('ALTER TABLE messages ADD COLUMN cost_euros REAL DEFAULT 0.0')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        # Add role column to users table
-        try:
-            cursor.execute('ALTER TABLE users ADD COLUMN role TEXT DEFAULT "user"')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
+        """Initialize database by applying pending schema migrations."""
+        with self.pool.connection() as conn:
+            migrate(conn)
+            
+            # Create default admin user if no users exist
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM users')
+            has_users = cursor.fetchone()[0] > 0
         
-        # Create default admin user if no users exist
-        cursor.execute('SELECT COUNT(*) FROM users')
-        if cursor.fetchone()[0] == 0:
+        if not has_users:
             self.create_user('admin', 'admin123', 'admin@ddb.com', 'admin')
             # Create a test user with regular role
             self.create_user('user', 'user123', 'user@ddb.com', 'user')
-        
-        conn.commit()
-        conn.close()
     
     def hash_password(self, password: str) -> str:
         """Hash password using SHA-256."""
@@ -127,71 +35,72 @@ class DatabaseManager:
     def create_user(self, username: str, password: str, email: str = None, role: str = "user") -> bool:
         """Create a new user."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            password_hash = self.hash_password(password)
-            cursor.execute(
-                'INSERT INTO users (username, password_hash, email, role) VALUES (?, ?, ?, ?)',
-                (username, password_hash, email, role)
-            )
-            
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                
+                password_hash = self.hash_password(password)
+                cursor.execute(
+                    'INSERT INTO users (username, password_hash, email, role) VALUES (?, ?, ?, ?)',
+                    (username, password_hash, email, role)
+                )
             return True
         except sqlite3.IntegrityError:
             return False
     
     def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
         """Authenticate user and return user data."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        password_hash = self.hash_password(password)
-        cursor.execute(
-            'SELECT id, username, email, role FROM users WHERE username = ? AND password_hash = ?',
-            (username, password_hash)
-        )
-        
-        user = cursor.fetchone()
-        if user:
-            # Update last login
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            password_hash = self.hash_password(password)
             cursor.execute(
-                'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?',
-                (user[0],)
+                'SELECT id, username, email, role FROM users WHERE username = ? AND password_hash = ?',
+                (username, password_hash)
             )
-            conn.commit()
             
-            user_data = {
-                'id': user[0],
-                'username': user[1],
-                'email': user[2],
-                'role': user[3] or 'user'
-            }
-        else:
-            user_data = None
-        
-        conn.close()
+            user = cursor.fetchone()
+            if user:
+                # Update last login
+                cursor.execute(
+                    'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?',
+                    (user[0],)
+                )
+                
+                user_data = {
+                    'id': user[0],
+                    'username': user[1],
+                    'email': user[2],
+                    'role': user[3] or 'user'
+                }
+            else:
+                user_data = None
         return user_data
     
-    def log_assistant_creation(self, openai_id: str, name: str, theme: str, user_id: int, file_name: str, file_type: str):
+    def log_assistant_creation(self, openai_id: str, name: str, theme: str, user_id: int, file_name: str, file_type: str,
+                               vector_store_id: str = None, indexing_status: str = 'completed', api_key_hash: str = None,
+                               ingestion_mode: str = 'single'):
         """Log assistant creation."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO assistants (openai_id, name, theme, user_id, file_name, file_type, total_tokens, total_cost_euros)
-            VALUES (?, ?, ?, ?, ?, ?, 0, 0.0)
-        ''', (openai_id, name, theme, user_id, file_name, file_type))
-        
-        cursor.execute('''
-            INSERT INTO activity_log (user_id, action, details)
-            VALUES (?, ?, ?)
-        ''', (user_id, 'assistant_created', f'Created assistant: {name} for theme: {theme}'))
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # A reconciliation may already have imported the assistant from the remote listing
+            cursor.execute('''
+                INSERT INTO assistants (openai_id, name, theme, user_id, file_name, file_type, total_tokens, total_cost_euros,
+                                        vector_store_id, indexing_status, api_key_hash, ingestion_mode)
+                VALUES (?, ?, ?, ?, ?, ?, 0, 0.0, ?, ?, ?, ?)
+                ON CONFLICT (openai_id) DO UPDATE SET
+                    name = excluded.name, theme = excluded.theme, user_id = excluded.user_id,
+                    file_name = excluded.file_name, file_type = excluded.file_type,
+                    vector_store_id = excluded.vector_store_id, indexing_status = excluded.indexing_status,
+                    api_key_hash = excluded.api_key_hash, ingestion_mode = excluded.ingestion_mode, deleted_at = NULL
+            ''', (openai_id, name, theme, user_id, file_name, file_type, vector_store_id, indexing_status, api_key_hash,
+                  ingestion_mode))
+            
+            cursor.execute('''
+                INSERT INTO activity_log (user_id, action, details)
+                VALUES (?, ?, ?)
+            ''', (user_id, 'assistant_created', f'Created assistant: {name} for theme: {theme}'))
         
-        conn.commit()
-        conn.close()
-    
     def calculate_gpt4o_cost(self, input_tokens: int, output_tokens: int) -> float:
         """Calculate cost for GPT-4o in euros."""
         # GPT-4o pricing (as of 2024): $2.50 per 1M input tokens, $10.00 per 1M output tokens
@@ -205,239 +114,826 @@ class DatabaseManager:
         return total_cost_usd * usd_to_eur
     
     def log_message(self, assistant_openai_id: str, role: str, content: str, response_time_ms: int = None, 
-                   input_tokens: int = 0, output_tokens: int = 0):
+                   input_tokens: int = 0, output_tokens: int = 0, ttfb_ms: int = None,
+                   context_strategy: str = None, context_turn: int = None):
         """Log a message in conversation with token usage."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get assistant ID from OpenAI ID
-        cursor.execute('SELECT id FROM assistants WHERE openai_id = ?', (assistant_openai_id,))
-        assistant = cursor.fetchone()
-        
-        if assistant:
-            assistant_id = assistant[0]
-            total_tokens = input_tokens + output_tokens
-            cost_euros = self.calculate_gpt4o_cost(input_tokens, output_tokens) if role == 'assistant' else 0.0
-            
-            cursor.execute('''
-                INSERT INTO messages (assistant_id, role, content, response_time_ms, input_tokens, output_tokens, total_tokens, cost_euros)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (assistant_id, role, content, response_time_ms, input_tokens, output_tokens, total_tokens, cost_euros))
+        self.log_messages([{
+            'assistant_openai_id': assistant_openai_id,
+            'role': role,
+            'content': content,
+            'response_time_ms': response_time_ms,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'ttfb_ms': ttfb_ms,
+            'context_strategy': context_strategy,
+            'context_turn': context_turn
+        }])
+    
+    def log_messages(self, events: List[Dict[str, Any]]):
+        """Log a batch of messages (same fields as log_message) in a single transaction."""
+        assistants = {}
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
             
-            # Update assistant message count, tokens and cost
-            cursor.execute('''
-                UPDATE assistants 
-                SET message_count = message_count + 1, 
-                    last_used = CURRENT_TIMESTAMP,
-                    total_tokens = total_tokens + ?,
-                    total_cost_euros = total_cost_euros + ?
-                WHERE id = ?
-            ''', (total_tokens, cost_euros, assistant_id))
-        
-        conn.commit()
-        conn.close()
+            for event in events:
+                openai_id = event['assistant_openai_id']
+                
+                # Get assistant ID and owner from OpenAI ID (once per batch)
+                if openai_id not in assistants:
+                    cursor.execute('SELECT id, user_id FROM assistants WHERE openai_id = ?', (openai_id,))
+                    assistants[openai_id] = cursor.fetchone()
+                assistant = assistants[openai_id]
+                
+                if assistant:
+                    self._insert_message(
+                        cursor, assistant[0], assistant[1], event['role'], event['content'],
+                        event.get('response_time_ms'), event.get('input_tokens', 0), event.get('output_tokens', 0),
+                        event.get('ttfb_ms'), event.get('context_strategy'), event.get('context_turn')
+                    )
     
-    def get_dashboard_stats(self, user_id: int) -> Dict[str, Any]:
-        """Get dashboard statistics for a user."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Total assistants
-        cursor.execute('SELECT COUNT(*) FROM assistants WHERE user_id = ?', (user_id,))
-        total_assistants = cursor.fetchone()[0]
-        
-        # Total messages
-        cursor.execute('''
-            SELECT COUNT(*) FROM messages m
-            JOIN assistants a ON m.assistant_id = a.id
-            WHERE a.user_id = ?
-        ''', (user_id,))
-        total_messages = cursor.fetchone()[0]
+    def _insert_message(self, cursor: sqlite3.Cursor, assistant_id: int, owner_id: int, role: str, content: str,
+                        response_time_ms: Optional[int], input_tokens: int, output_tokens: int,
+                        ttfb_ms: Optional[int] = None, context_strategy: Optional[str] = None,
+                        context_turn: Optional[int] = None):
+        """Insert one message and update the assistant counters and usage rollups."""
+        total_tokens = input_tokens + output_tokens
+        cost_euros = self.calculate_gpt4o_cost(input_tokens, output_tokens) if role == 'assistant' else 0.0
         
-        # Total tokens and cost
         cursor.execute('''
-            SELECT SUM(a.total_tokens), SUM(a.total_cost_euros) FROM assistants a
-            WHERE a.user_id = ?
-        ''', (user_id,))
-        tokens_cost = cursor.fetchone()
-        total_tokens = tokens_cost[0] or 0
-        total_cost_euros = tokens_cost[1] or 0.0
+            INSERT INTO messages (assistant_id, role, content, response_time_ms, input_tokens, output_tokens, total_tokens, cost_euros, ttfb_ms,
+                                  context_strategy, context_turn)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (assistant_id, role, content, response_time_ms, input_tokens, output_tokens, total_tokens, cost_euros, ttfb_ms,
+              context_strategy, context_turn))
         
-        # Average response time
+        # Update assistant message count, tokens and cost
         cursor.execute('''
-            SELECT AVG(response_time_ms) FROM messages m
-            JOIN assistants a ON m.assistant_id = a.id
-            WHERE a.user_id = ? AND response_time_ms IS NOT NULL
-        ''', (user_id,))
-        avg_response_time = cursor.fetchone()[0] or 0
-        
-        # Most used theme
-        cursor.execute('''
-            SELECT theme, COUNT(*) as count FROM assistants 
-            WHERE user_id = ? 
-            GROUP BY theme 
-            ORDER BY count DESC 
-            LIMIT 1
-        ''', (user_id,))
-        most_used_theme = cursor.fetchone()
-        
-        # Recent activity
+            UPDATE assistants 
+            SET message_count = message_count + 1, 
+                last_used = CURRENT_TIMESTAMP,
+                total_tokens = total_tokens + ?,
+                total_cost_euros = total_cost_euros + ?
+            WHERE id = ?
+        ''', (total_tokens, cost_euros, assistant_id))
+        
+        # Keep the daily usage rollup in step, in the same transaction
+        # (answers billed by OpenAI: assistant messages with input tokens, cached replays have none)
+        answer = role == 'assistant' and input_tokens > 0
         cursor.execute('''
-            SELECT action, details, created_at FROM activity_log
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-            LIMIT 5
-        ''', (user_id,))
-        recent_activity = cursor.fetchall()
-        
-        conn.close()
-        
+            INSERT INTO usage_daily (user_id, assistant_id, day, message_count, total_tokens, cost_euros,
+                                     response_time_sum_ms, response_time_count, ttfb_sum_ms, ttfb_count,
+                                     answer_count, answer_input_tokens, answer_cost_euros)
+            VALUES (?, ?, DATE('now'), 1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (assistant_id, day) DO UPDATE SET
+                message_count = message_count + 1,
+                total_tokens = total_tokens + excluded.total_tokens,
+                cost_euros = cost_euros + excluded.cost_euros,
+                response_time_sum_ms = response_time_sum_ms + excluded.response_time_sum_ms,
+                response_time_count = response_time_count + excluded.response_time_count,
+                ttfb_sum_ms = ttfb_sum_ms + excluded.ttfb_sum_ms,
+                ttfb_count = ttfb_count + excluded.ttfb_count,
+                answer_count = answer_count + excluded.answer_count,
+                answer_input_tokens = answer_input_tokens + excluded.answer_input_tokens,
+                answer_cost_euros = answer_cost_euros + excluded.answer_cost_euros
+        ''', (owner_id, assistant_id, total_tokens, cost_euros,
+              response_time_ms or 0, 1 if response_time_ms is not None else 0,
+              ttfb_ms or 0, 1 if ttfb_ms is not None else 0,
+              int(answer), input_tokens if answer else 0, cost_euros if answer else 0.0))
+        
+        # Same for the answers per context strategy and turn bucket
+        if answer and context_strategy is not None and context_turn is not None:
+            cursor.execute('''
+                INSERT INTO usage_context (user_id, assistant_id, context_strategy, turn_bucket, answer_count, input_tokens,
+                                           response_time_sum_ms, response_time_count, cost_euros)
+                VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+                ON CONFLICT (assistant_id, context_strategy, turn_bucket) DO UPDATE SET
+                    answer_count = answer_count + 1,
+                    input_tokens = input_tokens + excluded.input_tokens,
+                    response_time_sum_ms = response_time_sum_ms + excluded.response_time_sum_ms,
+                    response_time_count = response_time_count + excluded.response_time_count,
+                    cost_euros = cost_euros + excluded.cost_euros
+            ''', (owner_id, assistant_id, context_strategy, turn_bucket(context_turn), input_tokens,
+                  response_time_ms or 0, 1 if response_time_ms is not None else 0, cost_euros))
+    
+    def get_dashboard_stats(self, user_id: int) -> Dict[str, Any]:
+        """Get dashboard statistics for a user."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Total assistants
+            cursor.execute('SELECT COUNT(*) FROM assistants WHERE user_id = ?', (user_id,))
+            total_assistants = cursor.fetchone()[0]
+            
+            # Total messages, average response time and time-to-first-byte, from the daily rollup
+            cursor.execute('''
+                SELECT SUM(message_count), SUM(response_time_sum_ms), SUM(response_time_count),
+                       SUM(ttfb_sum_ms), SUM(ttfb_count)
+                FROM usage_daily
+                WHERE user_id = ?
+            ''', (user_id,))
+            message_count, response_time_sum, response_time_count, ttfb_sum, ttfb_count = cursor.fetchone()
+            total_messages = message_count or 0
+            avg_response_time = response_time_sum / response_time_count if response_time_count else 0
+            avg_ttfb = ttfb_sum / ttfb_count if ttfb_count else 0
+            
+            # Total tokens and cost
+            cursor.execute('''
+                SELECT SUM(a.total_tokens), SUM(a.total_cost_euros) FROM assistants a
+                WHERE a.user_id = ?
+            ''', (user_id,))
+            tokens_cost = cursor.fetchone()
+            total_tokens = tokens_cost[0] or 0
+            total_cost_euros = tokens_cost[1] or 0.0
+            
+            # Most used theme
+            cursor.execute('''
+                SELECT theme, COUNT(*) as count FROM assistants 
+                WHERE user_id = ? 
+                GROUP BY theme 
+                ORDER BY count DESC 
+                LIMIT 1
+            ''', (user_id,))
+            most_used_theme = cursor.fetchone()
+            
+            # Recent activity
+            cursor.execute('''
+                SELECT action, details, created_at FROM activity_log
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+                LIMIT 5
+            ''', (user_id,))
+            recent_activity = cursor.fetchall()
+            
         return {
             'total_assistants': total_assistants,
             'total_messages': total_messages,
             'total_tokens': total_tokens,
             'total_cost_euros': round(total_cost_euros, 4),
             'avg_response_time': int(avg_response_time) if avg_response_time else 0,
+            'avg_ttfb_ms': int(avg_ttfb),
             'most_used_theme': most_used_theme[0] if most_used_theme else 'N/A',
             'recent_activity': recent_activity
         }
     
     def get_user_assistants(self, user_id: int) -> List[Dict]:
         """Get all assistants for a user."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT openai_id, name, theme, created_at, last_used, message_count, file_name, file_type, total_tokens, total_cost_euros
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT openai_id, name, theme, created_at, last_used, message_count, file_name, file_type, total_tokens, total_cost_euros,
+                       indexing_status
+                FROM assistants
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+            ''', (user_id,))
+            
+            assistants = []
+            for row in cursor.fetchall():
+                assistants.append({
+                    'openai_id': row[0],
+                    'name': row[1],
+                    'theme': row[2],
+                    'created_at': row[3],
+                    'last_used': row[4],
+                    'message_count': row[5],
+                    'file_name': row[6],
+                    'file_type': row[7],
+                    'total_tokens': row[8] or 0,
+                    'total_cost_euros': round(row[9] or 0.0, 4),
+                    'indexing_status': row[10] or 'completed'
+                })
+        return assistants
+    
+    def set_assistant_indexing_status(self, openai_id: str, indexing_status: str):
+        """Record the vector store indexing state of an assistant."""
+        with self.pool.connection() as conn:
+            conn.execute('UPDATE assistants SET indexing_status = ? WHERE openai_id = ?', (indexing_status, openai_id))
+    
+    def set_assistant_dataset_path(self, openai_id: str, dataset_path: Optional[str]):
+        """Link an assistant to its local dataset file (None to unlink)."""
+        with self.pool.connection() as conn:
+            conn.execute('UPDATE assistants SET dataset_path = ? WHERE openai_id = ?', (dataset_path, openai_id))
+    
+    def get_assistant_dataset_path(self, openai_id: str) -> Optional[str]:
+        with self.pool.connection() as conn:
+            row = conn.execute('SELECT dataset_path FROM assistants WHERE openai_id = ?', (openai_id,)).fetchone()
+        return row[0] if row else None
+    
+    def list_assistants(self, user_id: int, api_key_hash: str, limit: int = 100,
+                        cursor: Optional[Tuple[str, int]] = None) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """Page through the assistants a user sees with an API key, newest first.
+        
+        Visible: not deleted, created under this key (or not yet matched to a key), and owned by
+        the user or imported from the remote listing. Returns the page and the cursor of the next one.
+        """
+        query = '''
+            SELECT openai_id, name, theme, created_at, last_used, message_count, file_name, file_type, total_tokens,
+                   total_cost_euros, indexing_status, id, vector_store_id
             FROM assistants
-            WHERE user_id = ?
-            ORDER BY created_at DESC
-        ''', (user_id,))
-        
-        assistants = []
-        for row in cursor.fetchall():
-            assistants.append({
+            WHERE deleted_at IS NULL
+              AND (api_key_hash = ? OR api_key_hash IS NULL)
+              AND (user_id = ? OR user_id IS NULL)
+        '''
+        params: List[Any] = [api_key_hash, user_id]
+        if cursor:
+            query += ' AND (created_at, id) < (?, ?)'
+            params.extend(cursor)
+        query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        
+        with self.pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        assistants = [
+            {
                 'openai_id': row[0],
                 'name': row[1],
                 'theme': row[2],
                 'created_at': row[3],
                 'last_used': row[4],
-                'message_count': row[5],
+                'message_count': row[5] or 0,
                 'file_name': row[6],
                 'file_type': row[7],
                 'total_tokens': row[8] or 0,
-                'total_cost_euros': round(row[9] or 0.0, 4)
-            })
-        
-        conn.close()
-        return assistants
+                'total_cost_euros': round(row[9] or 0.0, 4),
+                'indexing_status': row[10] or 'completed',
+                'vector_store_id': row[12]
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = (rows[limit - 1][3], rows[limit - 1][11]) if len(rows) > limit else None
+        return assistants, next_cursor
+    
+    def mark_assistant_deleted(self, openai_id: str):
+        """Hide a deleted assistant from listings (its usage history is kept)."""
+        with self.pool.connection() as conn:
+            conn.execute(
+                'UPDATE assistants SET deleted_at = CURRENT_TIMESTAMP WHERE openai_id = ? AND deleted_at IS NULL',
+                (openai_id,)
+            )
+    
+    def reconcile_assistants(self, api_key_hash: str, remote: List[Dict[str, Any]], listed_at: str) -> Dict[str, int]:
+        """Align local assistants of an API key with its remote listing (id, name, created_at).
+        
+        Local rows missing remotely are marked deleted unless created after ``listed_at`` (UTC,
+        'YYYY-MM-DD HH:MM:SS'); remote assistants unknown locally are imported without an owner.
+        """
+        counts = {'imported': 0, 'deleted': 0, 'claimed': 0, 'restored': 0, 'renamed': 0}
+        remote_by_id = {a['id']: a for a in remote}
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            local = {
+                row[0]: row[1:]
+                for row in conn.execute('''
+                    SELECT openai_id, name, api_key_hash, deleted_at, created_at FROM assistants
+                    WHERE api_key_hash = ? OR api_key_hash IS NULL
+                ''', (api_key_hash,))
+            }
+            for openai_id, (name, key_hash, deleted_at, created_at) in local.items():
+                item = remote_by_id.get(openai_id)
+                if item is None:
+                    if key_hash == api_key_hash and deleted_at is None and created_at < listed_at:
+                        conn.execute('UPDATE assistants SET deleted_at = CURRENT_TIMESTAMP WHERE openai_id = ?',
+                                     (openai_id,))
+                        counts['deleted'] += 1
+                    continue
+                if key_hash is None:
+                    conn.execute('UPDATE assistants SET api_key_hash = ? WHERE openai_id = ?', (api_key_hash, openai_id))
+                    counts['claimed'] += 1
+                if deleted_at is not None:
+                    conn.execute('UPDATE assistants SET deleted_at = NULL WHERE openai_id = ?', (openai_id,))
+                    counts['restored'] += 1
+                if item['name'] and item['name'] != name:
+                    conn.execute('UPDATE assistants SET name = ? WHERE openai_id = ?', (item['name'], openai_id))
+                    counts['renamed'] += 1
+            
+            known = {
+                row[0] for row in conn.execute(
+                    f'SELECT openai_id FROM assistants WHERE openai_id IN ({",".join("?" * len(remote_by_id))})',
+                    list(remote_by_id)
+                )
+            } if remote_by_id else set()
+            for openai_id, item in remote_by_id.items():
+                if openai_id not in known:
+                    conn.execute('''
+                        INSERT INTO assistants (openai_id, name, theme, user_id, created_at, api_key_hash)
+                        VALUES (?, ?, 'N/A', NULL, ?, ?)
+                    ''', (openai_id, item['name'] or 'Assistant', item['created_at'], api_key_hash))
+                    counts['imported'] += 1
+        return counts
     
     def get_assistant_messages(self, assistant_openai_id: str) -> List[Dict]:
         """Get all messages for an assistant."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get assistant ID from OpenAI ID
-        cursor.execute('SELECT id FROM assistants WHERE openai_id = ?', (assistant_openai_id,))
-        assistant = cursor.fetchone()
-        
-        if not assistant:
-            conn.close()
-            return []
-        
-        assistant_id = assistant[0]
-        
-        cursor.execute('''
-            SELECT role, content, created_at, input_tokens, output_tokens, total_tokens, cost_euros
-            FROM messages
-            WHERE assistant_id = ?
-            ORDER BY created_at ASC
-        ''', (assistant_id,))
-        
-        messages = []
-        for row in cursor.fetchall():
-            messages.append({
-                'role': row[0],
-                'content': row[1],
-                'timestamp': row[2],
-                'input_tokens': row[3] or 0,
-                'output_tokens': row[4] or 0,
-                'total_tokens': row[5] or 0,
-                'cost_euros': round(row[6] or 0.0, 6)
-            })
-        
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Get assistant ID from OpenAI ID
+            cursor.execute('SELECT id FROM assistants WHERE openai_id = ?', (assistant_openai_id,))
+            assistant = cursor.fetchone()
+            
+            if not assistant:
+                return []
+            
+            assistant_id = assistant[0]
+            
+            cursor.execute('''
+                SELECT role, content, created_at, input_tokens, output_tokens, total_tokens, cost_euros
+                FROM messages
+                WHERE assistant_id = ?
+                ORDER BY created_at ASC
+            ''', (assistant_id,))
+            
+            messages = []
+            for row in cursor.fetchall():
+                messages.append({
+                    'role': row[0],
+                    'content': row[1],
+                    'timestamp': row[2],
+                    'input_tokens': row[3] or 0,
+                    'output_tokens': row[4] or 0,
+                    'total_tokens': row[5] or 0,
+                    'cost_euros': round(row[6] or 0.0, 6)
+                })
         return messages
     
     def clear_assistant_messages(self, assistant_openai_id: str):
         """Clear all messages for an assistant."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get assistant ID from OpenAI ID
-        cursor.execute('SELECT id FROM assistants WHERE openai_id = ?', (assistant_openai_id,))
-        assistant = cursor.fetchone()
-        
-        if assistant:
-            assistant_id = assistant[0]
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
             
-            # Delete all messages for this assistant
-            cursor.execute('DELETE FROM messages WHERE assistant_id = ?', (assistant_id,))
+            # Get assistant ID from OpenAI ID
+            cursor.execute('SELECT id FROM assistants WHERE openai_id = ?', (assistant_openai_id,))
+            assistant = cursor.fetchone()
             
-            # Reset message count, tokens and cost
-            cursor.execute('''
-                UPDATE assistants 
-                SET message_count = 0, total_tokens = 0, total_cost_euros = 0.0
-                WHERE id = ?
-            ''', (assistant_id,))
+            if assistant:
+                assistant_id = assistant[0]
+                
+                # Delete all messages for this assistant and their usage rollups
+                cursor.execute('DELETE FROM messages WHERE assistant_id = ?', (assistant_id,))
+                cursor.execute('DELETE FROM usage_daily WHERE assistant_id = ?', (assistant_id,))
+                cursor.execute('DELETE FROM usage_context WHERE assistant_id = ?', (assistant_id,))
+                
+                # Reset message count, tokens and cost
+                cursor.execute('''
+                    UPDATE assistants 
+                    SET message_count = 0, total_tokens = 0, total_cost_euros = 0.0
+                    WHERE id = ?
+                ''', (assistant_id,))
         
-        conn.commit()
-        conn.close()
-    
     def get_analytics_data(self, user_id: int) -> Dict[str, Any]:
         """Get detailed analytics data for a user."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Cost by assistant
-        cursor.execute('''
-            SELECT a.name, a.theme, a.total_tokens, a.total_cost_euros, a.message_count
-            FROM assistants a
-            WHERE a.user_id = ?
-            ORDER BY a.total_cost_euros DESC
-        ''', (user_id,))
-        
-        cost_by_assistant = []
-        for row in cursor.fetchall():
-            cost_by_assistant.append({
-                'name': row[0],
-                'theme': row[1],
-                'total_tokens': row[2] or 0,
-                'total_cost_euros': round(row[3] or 0.0, 4),
-                'message_count': row[4] or 0
-            })
-        
-        # Daily costs for the last 30 days
-        cursor.execute('''
-            SELECT DATE(m.created_at) as date, SUM(m.cost_euros) as daily_cost, SUM(m.total_tokens) as daily_tokens
-            FROM messages m
-            JOIN assistants a ON m.assistant_id = a.id
-            WHERE a.user_id = ? AND m.created_at >= date('now', '-30 days')
-            GROUP BY DATE(m.created_at)
-            ORDER BY date DESC
-        ''', (user_id,))
-        
-        daily_costs = []
-        for row in cursor.fetchall():
-            daily_costs.append({
-                'date': row[0],
-                'cost_euros': round(row[1] or 0.0, 4),
-                'tokens': row[2] or 0
-            })
-        
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Cost by assistant
+            cursor.execute('''
+                SELECT a.name, a.theme, a.total_tokens, a.total_cost_euros, a.message_count
+                FROM assistants a
+                WHERE a.user_id = ?
+                ORDER BY a.total_cost_euros DESC
+            ''', (user_id,))
+            
+            cost_by_assistant = []
+            for row in cursor.fetchall():
+                cost_by_assistant.append({
+                    'name': row[0],
+                    'theme': row[1],
+                    'total_tokens': row[2] or 0,
+                    'total_cost_euros': round(row[3] or 0.0, 4),
+                    'message_count': row[4] or 0
+                })
+            
+            # Daily costs for the last 30 days, from the daily rollup
+            cursor.execute('''
+                SELECT day as date, SUM(cost_euros) as daily_cost, SUM(total_tokens) as daily_tokens,
+                       SUM(ttfb_sum_ms) * 1.0 / NULLIF(SUM(ttfb_count), 0) as avg_ttfb_ms
+                FROM usage_daily
+                WHERE user_id = ? AND day >= date('now', '-30 days')
+                GROUP BY day
+                ORDER BY date DESC
+            ''', (user_id,))
+            
+            daily_costs = []
+            for row in cursor.fetchall():
+                daily_costs.append({
+                    'date': row[0],
+                    'cost_euros': round(row[1] or 0.0, 4),
+                    'tokens': row[2] or 0,
+                    'avg_ttfb_ms': int(row[3]) if row[3] is not None else None
+                })
+            
+            # Input tokens per answer by file_search ingestion mode, from the daily rollup
+            # (answers replayed from the cache excluded)
+            cursor.execute('''
+                SELECT COALESCE(a.ingestion_mode, 'single'), COUNT(DISTINCT a.id), SUM(u.answer_count),
+                       SUM(u.answer_input_tokens) * 1.0 / SUM(u.answer_count), SUM(u.answer_cost_euros)
+                FROM usage_daily u
+                JOIN assistants a ON u.assistant_id = a.id
+                WHERE u.user_id = ? AND u.answer_count > 0
+                GROUP BY 1
+                ORDER BY 1
+            ''', (user_id,))
+            
+            tokens_by_ingestion_mode = []
+            for row in cursor.fetchall():
+                tokens_by_ingestion_mode.append({
+                    'ingestion_mode': row[0],
+                    'assistants': row[1],
+                    'answers': row[2],
+                    'avg_input_tokens': int(row[3] or 0),
+                    'cost_euros': round(row[4] or 0.0, 4)
+                })
+            
+            # Input tokens and response time by position in the conversation, per context strategy
+            # (from the usage_context rollup)
+            cursor.execute('''
+                SELECT context_strategy, turn_bucket, SUM(answer_count), SUM(input_tokens) * 1.0 / SUM(answer_count),
+                       SUM(response_time_sum_ms) * 1.0 / NULLIF(SUM(response_time_count), 0), SUM(cost_euros)
+                FROM usage_context
+                WHERE user_id = ? AND answer_count > 0
+                GROUP BY 1, 2
+                ORDER BY 1, 2
+            ''', (user_id,))
+            
+            turn_labels = dict(CONTEXT_TURN_BUCKETS)
+            tokens_by_context_turn = []
+            for row in cursor.fetchall():
+                tokens_by_context_turn.append({
+                    'context_strategy': row[0],
+                    'turns': turn_labels[row[1]],
+                    'answers': row[2],
+                    'avg_input_tokens': int(row[3] or 0),
+                    'avg_response_time_ms': int(row[4]) if row[4] is not None else None,
+                    'cost_euros': round(row[5] or 0.0, 4)
+                })
+            
+            # Rolling summaries of the threads still registered (their tokens are not in the messages table)
+            cursor.execute('''
+                SELECT COUNT(*), COALESCE(SUM(t.summarized_turns), 0),
+                       COALESCE(SUM(t.summary_input_tokens), 0), COALESCE(SUM(t.summary_output_tokens), 0)
+                FROM threads t
+                JOIN assistants a ON t.assistant_id = a.openai_id
+                WHERE a.user_id = ? AND t.summary IS NOT NULL
+            ''', (user_id,))
+            row = cursor.fetchone()
+            context_summaries = {
+                'threads': row[0],
+                'summarized_turns': row[1],
+                'input_tokens': row[2],
+                'output_tokens': row[3]
+            }
         
         return {
             'cost_by_assistant': cost_by_assistant,
-            'daily_costs': daily_costs
+            'daily_costs': daily_costs,
+            'tokens_by_ingestion_mode': tokens_by_ingestion_mode,
+            'tokens_by_context_turn': tokens_by_context_turn,
+            'context_summaries': context_summaries
+        }
+    
+    def get_user_role(self, user_id: int) -> Optional[str]:
+        """Get the role of a user, or None if the user does not exist."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT role FROM users WHERE id = ?', (user_id,))
+            user = cursor.fetchone()
+        return user[0] if user else None
+    
+    def get_user(self, user_id: int) -> Optional[Dict]:
+        """Get a user's public data, or None if the user does not exist."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, username, email, role FROM users WHERE id = ?', (user_id,))
+            user = cursor.fetchone()
+        if not user:
+            return None
+        return {'id': user[0], 'username': user[1], 'email': user[2], 'role': user[3] or 'user'}
+    
+    def set_user_role(self, user_id: int, role: str) -> bool:
+        """Set the role of a user; False if the user does not exist."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE users SET role = ? WHERE id = ?', (role, user_id))
+            return cursor.rowcount > 0
+    
+    def get_universal_prompt(self) -> Optional[Dict[str, Any]]:
+        """Get the stored universal prompt, or None if the default is in use."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT prompt_content, updated_at FROM universal_prompt WHERE id = 1')
+            result = cursor.fetchone()
+        if not result:
+            return None
+        return {'prompt_content': result[0], 'updated_at': result[1]}
+    
+    def set_universal_prompt(self, prompt_content: str, user_id: int) -> str:
+        """Insert or update the universal prompt and return its update time."""
+        current_time = datetime.datetime.now().isoformat()
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO universal_prompt (id, prompt_content, updated_at, updated_by)
+                VALUES (1, ?, ?, ?)
+            ''', (prompt_content, current_time, user_id))
+        return current_time
+    
+    def reset_universal_prompt(self):
+        """Delete the custom universal prompt to fall back to the default."""
+        with self.pool.connection() as conn:
+            conn.execute('DELETE FROM universal_prompt WHERE id = 1')
+    
+    def create_job(self, job_id: str, kind: str, user_id: int, stages: List[Dict[str, Any]],
+                   payload: Dict[str, Any], uses_default_key: bool, owner: str = None):
+        """Insert a queued background job, owned by the worker that will run it."""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO jobs (id, kind, user_id, status, stages, payload, uses_default_key, owner, heartbeat_at)
+                VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)
+            ''', (job_id, kind, user_id, json.dumps(stages), json.dumps(payload, ensure_ascii=False),
+                  int(uses_default_key), owner, time.time()))
+    
+    def claim_job(self, job_id: str, owner: str, stale_before: float) -> bool:
+        """Take over an unfinished job whose owner has not beaten since ``stale_before``.
+
+        The condition is checked in the UPDATE itself, so a single worker wins the job.
+        """
+        with self.pool.connection() as conn:
+            cursor = conn.execute('''
+                UPDATE jobs SET owner = ?, heartbeat_at = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status IN ('queued', 'running')
+                  AND (owner IS NULL OR owner = ? OR heartbeat_at IS NULL OR heartbeat_at < ?)
+            ''', (owner, time.time(), job_id, owner, stale_before))
+            return cursor.rowcount > 0
+    
+    def heartbeat_jobs(self, owner: str) -> int:
+        """Refresh the heartbeat of the unfinished jobs of a worker; returns how many."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), owner)
+            )
+            return cursor.rowcount
+    
+    def update_job(self, job_id: str, owner: str = None, **fields) -> bool:
+        """Update job columns (status, current_stage, stages, payload, result, error).
+
+        With ``owner``, only while that worker still owns the job; returns whether a row changed.
+        """
+        columns = []
+        values = []
+        for name, value in fields.items():
+            if name not in ('status', 'current_stage', 'stages', 'payload', 'result', 'error'):
+                raise ValueError(f"Unknown job field: {name}")
+            if name in ('stages', 'payload', 'result') and value is not None:
+                value = json.dumps(value, ensure_ascii=False)
+            columns.append(f'{name} = ?')
+            values.append(value)
+        if fields.get('status') in ('succeeded', 'failed'):
+            columns.append('finished_at = CURRENT_TIMESTAMP')
+        condition = 'id = ?'
+        if owner is not None:
+            condition += ' AND owner = ?'
+            values.append(job_id)
+            values.append(owner)
+        else:
+            values.append(job_id)
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                f'UPDATE jobs SET {", ".join(columns)}, updated_at = CURRENT_TIMESTAMP WHERE {condition}',
+                values
+            )
+            return cursor.rowcount > 0
+    
+    def _job_from_row(self, row) -> Dict[str, Any]:
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'user_id': row[2],
+            'status': row[3],
+            'current_stage': row[4],
+            'stages': json.loads(row[5]),
+            'payload': json.loads(row[6]),
+            'result': json.loads(row[7]) if row[7] else None,
+            'error': row[8],
+            'uses_default_key': bool(row[9]),
+            'created_at': row[10],
+            'updated_at': row[11],
+            'finished_at': row[12]
+        }
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by id, or None."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT id, kind, user_id, status, current_stage, stages, payload, result, error,
+                       uses_default_key, created_at, updated_at, finished_at
+                FROM jobs WHERE id = ?
+            ''', (job_id,)).fetchone()
+        return self._job_from_row(row) if row else None
+    
+    def get_unfinished_jobs(self) -> List[Dict[str, Any]]:
+        """Get queued and running jobs with their owner and heartbeat, oldest first (used to resume work)."""
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT id, kind, user_id, status, current_stage, stages, payload, result, error,
+                       uses_default_key, created_at, updated_at, finished_at, owner, heartbeat_at
+                FROM jobs WHERE status IN ('queued', 'running')
+                ORDER BY created_at, rowid
+            ''').fetchall()
+        return [{**self._job_from_row(row), 'owner': row[13], 'heartbeat_at': row[14]} for row in rows]
+    
+    def get_thread(self, assistant_id: str, user_id: int, api_key_hash: str, ttl_seconds: float) -> Optional[str]:
+        """Get the conversation thread of a user with an assistant unless unused for ttl_seconds."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                UPDATE threads SET last_used_at = CURRENT_TIMESTAMP
+                WHERE assistant_id = ? AND user_id = ? AND api_key_hash = ?
+                  AND last_used_at > datetime('now', ?)
+                RETURNING thread_id
+            ''', (assistant_id, user_id, api_key_hash, f'-{int(ttl_seconds)} seconds')).fetchone()
+        return row[0] if row else None
+    
+    def save_thread(self, assistant_id: str, user_id: int, api_key_hash: str, thread_id: str, ttl_seconds: float) -> str:
+        """Store a new thread and return the one in use (another worker may have stored one first)."""
+        with self.pool.connection() as conn:
+            # An expired row is replaced, a live one is kept
+            conn.execute('''
+                INSERT INTO threads (assistant_id, user_id, api_key_hash, thread_id)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (assistant_id, user_id, api_key_hash) DO UPDATE SET
+                    thread_id = excluded.thread_id,
+                    created_at = CURRENT_TIMESTAMP,
+                    last_used_at = CURRENT_TIMESTAMP,
+                    turns = 0, summary = NULL, summary_until = NULL, summarized_turns = 0,
+                    messages = 0, summarized_messages = 0, summary_input_tokens = 0, summary_output_tokens = 0
+                WHERE threads.last_used_at <= datetime('now', ?)
+            ''', (assistant_id, user_id, api_key_hash, thread_id, f'-{int(ttl_seconds)} seconds'))
+            row = conn.execute(
+                'SELECT thread_id FROM threads WHERE assistant_id = ? AND user_id = ? AND api_key_hash = ?',
+                (assistant_id, user_id, api_key_hash)
+            ).fetchone()
+        return row[0]
+    
+    def delete_threads(self, assistant_id: str):
+        """Forget every conversation thread of an assistant."""
+        with self.pool.connection() as conn:
+            conn.execute('DELETE FROM threads WHERE assistant_id = ?', (assistant_id,))
+    
+    def purge_threads(self, ttl_seconds: float) -> int:
+        """Delete threads unused for ttl_seconds and return how many were removed."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM threads WHERE last_used_at <= datetime('now', ?)", (f'-{int(ttl_seconds)} seconds',)
+            )
+            return cursor.rowcount
+    
+    @staticmethod
+    def _thread_context(row) -> Optional[Dict[str, Any]]:
+        if not row:
+            return None
+        return {'turns': row[0], 'summary': row[1], 'summary_until': row[2], 'summarized_turns': row[3],
+                'messages': row[4], 'summarized_messages': row[5]}
+    
+    def get_thread_context(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """Completed turns, message counts and rolling summary of a thread, or None if it is not registered."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT turns, summary, summary_until, summarized_turns, messages, summarized_messages
+                FROM threads WHERE thread_id = ?
+            ''', (thread_id,)).fetchone()
+        return self._thread_context(row)
+    
+    def record_thread_question(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """Count a question added to a thread and return its context (None if not registered)."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                UPDATE threads SET messages = messages + 1 WHERE thread_id = ?
+                RETURNING turns, summary, summary_until, summarized_turns, messages, summarized_messages
+            ''', (thread_id,)).fetchone()
+        return self._thread_context(row)
+    
+    def record_thread_turn(self, thread_id: str) -> int:
+        """Count one more completed turn (and its answer) on a thread and return the new count (0 if not registered)."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'UPDATE threads SET turns = turns + 1, messages = messages + 1 WHERE thread_id = ? RETURNING turns',
+                (thread_id,)
+            ).fetchone()
+        return row[0] if row else 0
+    
+    def save_thread_summary(self, thread_id: str, summary: str, summary_until: str, summarized_turns: int,
+                            summarized_messages: int, previous_messages: int, input_tokens: int,
+                            output_tokens: int) -> bool:
+        """Store a new rolling summary unless another worker already moved it past previous_messages."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute('''
+                UPDATE threads
+                SET summary = ?, summary_until = ?, summarized_turns = ?, summarized_messages = ?,
+                    summary_input_tokens = summary_input_tokens + ?,
+                    summary_output_tokens = summary_output_tokens + ?
+                WHERE thread_id = ? AND summarized_messages = ?
+            ''', (summary, summary_until, summarized_turns, summarized_messages, input_tokens, output_tokens,
+                  thread_id, previous_messages))
+            return cursor.rowcount > 0
+    
+    def get_context_settings(self, openai_id: str) -> Optional[Dict[str, Any]]:
+        """Context settings of an assistant (None values use the defaults), or None if it is unknown."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT context_strategy, context_last_messages, context_summary
+                FROM assistants WHERE openai_id = ? AND deleted_at IS NULL
+            ''', (openai_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            'strategy': row[0],
+            'last_messages': row[1],
+            'summary': bool(row[2]) if row[2] is not None else None
         }
+    
+    def set_context_settings(self, openai_id: str, strategy: Optional[str], last_messages: Optional[int],
+                             summary: Optional[bool]) -> bool:
+        """Set the context settings of an assistant (None restores a default); False if it is unknown."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute('''
+                UPDATE assistants SET context_strategy = ?, context_last_messages = ?, context_summary = ?
+                WHERE openai_id = ? AND deleted_at IS NULL
+            ''', (strategy, last_messages, None if summary is None else int(summary), openai_id))
+            return cursor.rowcount > 0
+    
+    def get_cached_answer(self, cache_key: str, ttl_seconds: float) -> Optional[Dict[str, Any]]:
+        """Get a cached answer younger than ttl_seconds and count the hit."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                UPDATE answer_cache SET hits = hits + 1, last_hit_at = CURRENT_TIMESTAMP
+                WHERE cache_key = ? AND created_at > datetime('now', ?)
+                RETURNING answer, cost_euros, response_time_ms
+            ''', (cache_key, f'-{int(ttl_seconds)} seconds')).fetchone()
+        if not row:
+            return None
+        return {'answer': row[0], 'cost_euros': row[1] or 0.0, 'response_time_ms': row[2] or 0}
+    
+    def put_cached_answer(self, cache_key: str, assistant_id: str, question: str, answer: str, input_tokens: int,
+                          output_tokens: int, response_time_ms: int, max_entries: int):
+        """Store an answer, then evict the least recently used entries above max_entries."""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO answer_cache (cache_key, assistant_id, question, answer, input_tokens, output_tokens,
+                                                     cost_euros, response_time_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (cache_key, assistant_id, question, answer, input_tokens, output_tokens,
+                  self.calculate_gpt4o_cost(input_tokens, output_tokens), response_time_ms))
+            conn.execute('''
+                DELETE FROM answer_cache WHERE cache_key IN (
+                    SELECT cache_key FROM answer_cache ORDER BY last_hit_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (max_entries,))
+    
+    def clear_cached_answers(self, assistant_id: str = None, ttl_seconds: float = None) -> int:
+        """Delete cached answers of one assistant, expired ones, or all of them; returns the count."""
+        with self.pool.connection() as conn:
+            if assistant_id is not None:
+                cursor = conn.execute('DELETE FROM answer_cache WHERE assistant_id = ?', (assistant_id,))
+            elif ttl_seconds is not None:
+                cursor = conn.execute("DELETE FROM answer_cache WHERE created_at <= datetime('now', ?)",
+                                      (f'-{int(ttl_seconds)} seconds',))
+            else:
+                cursor = conn.execute('DELETE FROM answer_cache')
+            return cursor.rowcount
+    
+    def get_answer_cache_savings(self) -> Dict[str, Any]:
+        """Entries, hits and the cost and time saved by the answers currently cached."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * cost_euros), 0.0),
+                       COALESCE(SUM(hits * response_time_ms), 0)
+                FROM answer_cache
+            ''').fetchone()
+        return {
+            'entries': row[0],
+            'hits': row[1],
+            'saved_euros': round(row[2], 4),
+            'saved_ms': row[3]
+        }
+    
+    def rebuild_usage_rollup(self):
+        """Recompute the usage rollups from the messages table."""
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rebuild_usage_daily(conn)
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="DDB TGI Audience Manager database maintenance")
+    parser.add_argument("command", choices=["migrate", "rebuild-rollup"])
+    parser.add_argument("--db", default="ddb_manager.db", help="path to the SQLite database")
+    args = parser.parse_args()
+    
+    # Opening the database applies pending migrations
+    db = DatabaseManager(args.db)
+    if args.command == "rebuild-rollup":
+        db.rebuild_usage_rollup()
+        print(f"✅ Usage rollup rebuilt for {args.db}")
+    else:
+        print(f"✅ Database {args.db} is up to date")
@@ -0,0 +1,92 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Connection-level settings applied to every pooled connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # readers no longer block the writer (persistent in the file)
+    "PRAGMA synchronous=NORMAL",      # durable at checkpoints, safe with WAL
+    "PRAGMA busy_timeout=5000",       # wait for the writer lock instead of failing
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",       # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",
+)
+
+
+class SQLitePool:
+    """Thread-safe pool of long-lived SQLite connections in WAL mode.
+
+    Connections are reused across calls, so the sqlite3 statement cache
+    (``cached_statements``) keeps prepared statements warm between requests.
+    """
+
+    def __init__(self, db_path: str, size: int = 8, timeout: float = 30.0, cached_statements: int = 256):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a pooled database connection")
+
+    def _release(self, conn: sqlite3.Connection):
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commit on success, roll back on error."""
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
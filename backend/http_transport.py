@@ -0,0 +1,162 @@
+import email.utils
+import http.cookiejar
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+# Statuses worth retrying: rate limits, timeouts and transient server errors
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Delay requested by the server, from retry-after-ms or Retry-After (seconds or HTTP date)."""
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HTTPTransport:
+    """Shared HTTP layer for the OpenAI REST calls made outside the SDK.
+
+    Every API key shares one keep-alive ``requests.Session``, whose pool holds at most
+    ``pool_size`` idle connections whatever the number of keys; the key goes in each request's
+    Authorization header, so nothing is kept per key. Applies connect/read timeouts, and
+    retries connection errors, 429 and 5xx responses with jittered exponential backoff,
+    waiting at least as long as the server's Retry-After.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 20.0, pool_size: int = 10):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.status_counts: Dict[str, int] = {}
+
+    def session(self) -> requests.Session:
+        """Shared keep-alive session (created on first use)."""
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # No cookie jar: responses to one API key must not flow into requests of another
+                session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+                self._session = session
+            return self._session
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        # Full jitter spreads out clients that were throttled at the same time
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if response is not None:
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def request(self, method: str, path: str, api_key: str, **kwargs: Any) -> requests.Response:
+        """Send a request to ``base_url + path``, retrying transient failures.
+
+        Returns the last response (which may still be an error status once retries are
+        exhausted); raises the last connection error if no response was ever received.
+        """
+        session = self.session()
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs["headers"] = {**(kwargs.get("headers") or {}), "Authorization": f"Bearer {api_key}"}
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            response = None
+            try:
+                response = session.request(method, url, **kwargs)
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            elapsed = time.perf_counter() - start
+
+            status = str(response.status_code) if response is not None else type(error).__name__
+            with self._lock:
+                self.requests += 1
+                self._latencies.append(elapsed)
+                self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not retryable:
+                return response
+            if attempt >= self.max_retries:
+                with self._lock:
+                    self.failures += 1
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self._backoff(attempt, response)
+            with self._lock:
+                self.retries += 1
+            print(f"⏳ {method} {path} -> {status}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, path: str, api_key: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", path, api_key, **kwargs)
+
+    def post(self, path: str, api_key: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", path, api_key, **kwargs)
+
+    def close(self):
+        """Close the pooled session and its connections."""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'base_url': self.base_url,
+                'pool_size': self.pool_size,
+                'requests': self.requests,
+                'retries': self.retries,
+                'failures': self.failures,
+                'status_counts': dict(self.status_counts)
+            }
+        if latencies:
+            stats['latency_ms'] = {
+                'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1)
+            }
+        return stats
@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from http_transport import HTTPTransport
+
+# Terminal states of a vector store file, plus our own state when a deadline passes first
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+TIMED_OUT = "timed_out"
+
+
+class IndexingTracker:
+    """Readiness of files attached to vector stores.
+
+    ``wait_until_ready`` polls the file-level status in the calling thread, starting with short
+    intervals (small files index in well under a second) and backing off for large ones.
+    Files still indexing when the caller stops waiting can be handed to ``track``, which keeps
+    polling them from one background thread and reports the final state through a callback.
+    With ``batch=True`` the id is a file batch and its overall status is followed instead; without
+    a file id, the vector store itself is followed (all of its files, see ``store_state``).
+    A vector store is tracked at most once at a time.
+    """
+
+    def __init__(self, transport: HTTPTransport, initial_delay: float = 0.25, max_delay: float = 5.0,
+                 backoff: float = 1.3, background_timeout: float = 1800.0):
+        self.transport = transport
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.background_timeout = background_timeout
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._tracked = set()
+        self.counts = {state: 0 for state in TERMINAL_STATES + (TIMED_OUT,)}
+        self.ready_seconds = 0.0
+
+    def file_status(self, vector_store_id: str, file_id: Optional[str], api_key: str,
+                    batch: bool = False) -> Dict[str, Any]:
+        """Current status of one file (``status``, ``last_error``) or file batch (``status``, ``file_counts``).
+
+        Without ``file_id``, the status of the vector store (``status``, ``file_counts``).
+        """
+        path = f"/vector_stores/{vector_store_id}"
+        if file_id is not None:
+            path += f"/{'file_batches' if batch else 'files'}/{file_id}"
+        response = self.transport.get(path, api_key, headers={"OpenAI-Beta": "assistants=v2"})
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to get vector store file status: {response.text}")
+        return response.json()
+
+    @staticmethod
+    def store_state(store: Dict[str, Any]) -> str:
+        """Indexing state of a whole vector store: in_progress while a file is, failed if none indexed."""
+        counts = store.get("file_counts") or {}
+        if store.get("status") == "in_progress" or counts.get("in_progress"):
+            return "in_progress"
+        if store.get("status") == "expired" or (counts.get("failed") and not counts.get("completed")):
+            return "failed"
+        return "completed"
+
+    def _state(self, item: Dict[str, Any]) -> str:
+        status = self.file_status(item['vector_store_id'], item['file_id'], item['api_key'], item['batch'])
+        return self.store_state(status) if item['file_id'] is None else status["status"]
+
+    def _next_delay(self, delay: float) -> float:
+        return min(delay * self.backoff, self.max_delay)
+
+    def _record(self, state: str, started: float):
+        with self._cond:
+            self.counts[state] += 1
+            if state == "completed":
+                self.ready_seconds += time.monotonic() - started
+
+    def wait_until_ready(self, vector_store_id: str, file_id: str, api_key: str, timeout: float,
+                         batch: bool = False) -> str:
+        """Poll until the file leaves ``in_progress`` or ``timeout`` seconds pass.
+
+        Returns the file status, or ``"in_progress"`` if the deadline passed first.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        delay = self.initial_delay
+        while True:
+            status = self.file_status(vector_store_id, file_id, api_key, batch)
+            if status["status"] in TERMINAL_STATES:
+                self._record(status["status"], started)
+                if status["status"] == "failed" and status.get("last_error"):
+                    print(f"❌ Indexing failed for {file_id}: {status['last_error'].get('message')}")
+                if batch and status.get("file_counts", {}).get("failed"):
+                    print(f"⚠️ {status['file_counts']['failed']} file(s) of batch {file_id} failed to index")
+                return status["status"]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "in_progress"
+            time.sleep(min(delay, remaining))
+            delay = self._next_delay(delay)
+
+    def track(self, vector_store_id: str, file_id: Optional[str], api_key: str, on_done: Callable[[str], None],
+              batch: bool = False) -> bool:
+        """Keep polling a file (or file batch, or vector store) in the background; ``on_done`` receives its final state.
+
+        Returns False if the vector store is already tracked.
+        """
+        item = {
+            'vector_store_id': vector_store_id,
+            'file_id': file_id,
+            'batch': batch,
+            'api_key': api_key,
+            'on_done': on_done,
+            'started': time.monotonic(),
+            'delay': self.initial_delay
+        }
+        with self._cond:
+            added = vector_store_id not in self._tracked
+            if added:
+                self._tracked.add(vector_store_id)
+                heapq.heappush(self._heap, (time.monotonic(), next(self._seq), item))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="indexing-tracker", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return added
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                _, _, item = heapq.heappop(self._heap)
+
+            try:
+                state = self._state(item)
+            except Exception as e:
+                # Transient errors are already retried by the transport; keep tracking
+                print(f"⚠️ Indexing status check failed for {item['vector_store_id']}: {e}")
+                state = "in_progress"
+
+            if state == "in_progress" and time.monotonic() - item['started'] >= self.background_timeout:
+                state = TIMED_OUT
+            if state == "in_progress":
+                item['delay'] = self._next_delay(item['delay'])
+                with self._cond:
+                    heapq.heappush(self._heap, (time.monotonic() + item['delay'], next(self._seq), item))
+                continue
+
+            self._record(state, item['started'])
+            with self._cond:
+                self._tracked.discard(item['vector_store_id'])
+            try:
+                item['on_done'](state)
+            except Exception as e:
+                print(f"❌ Could not record indexing state for {item['vector_store_id']}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            completed = self.counts["completed"]
+            return {
+                'tracking': len(self._heap),
+                **self.counts,
+                'avg_ready_seconds': round(self.ready_seconds / completed, 2) if completed else None
+            }
@@ -0,0 +1,240 @@
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from database import DatabaseManager
+
+# A stage receives the job context (id, user_id, payload, api_key, dir, input_path) and records
+# its outputs in context['payload'], which is persisted after every completed stage.
+Stage = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+INTERRUPTED_ERROR = "Interrupted by a server restart, please upload the file again"
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued or running."""
+
+
+class JobOwnershipLost(Exception):
+    """Raised in a worker whose job was taken over by another worker (its heartbeat went stale)."""
+
+
+class JobManager:
+    """Bounded worker pool running multi-stage background jobs persisted in SQLite.
+
+    Each job kind is a pipeline of named stages. Progress and timing of every stage are
+    written to the ``jobs`` table, so ``get`` reports them and ``resume`` can pick up
+    unfinished jobs after a restart from the first stage that did not complete.
+
+    Several worker processes may share the database (``gunicorn -w 4``): every job is owned by
+    the process running it, which refreshes a heartbeat every ``heartbeat_seconds``. Only jobs
+    whose owner has not beaten for ``stale_seconds`` are taken over, with a conditional
+    UPDATE so that a single worker claims each one; every worker sweeps for them at startup
+    and then every ``stale_seconds``. A worker whose job was taken over stops at its next
+    write and leaves the job directory to the new owner.
+    """
+
+    def __init__(self, db: DatabaseManager, jobs_dir: str = "jobs", max_workers: int = 2, max_pending: int = 20,
+                 heartbeat_seconds: float = 5.0, stale_seconds: float = 30.0):
+        self.db = db
+        self.jobs_dir = jobs_dir
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = max(stale_seconds, 2 * heartbeat_seconds)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pipelines: Dict[str, List[Tuple[str, Stage]]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        self._lock = threading.Lock()
+        self._active = set()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._default_api_key: Optional[str] = None
+        self.jobs_succeeded = 0
+        self.jobs_failed = 0
+        self.jobs_taken_over = 0
+        self.jobs_lost = 0
+        self.stage_seconds: Dict[str, float] = {}
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def register(self, kind: str, stages: List[Tuple[str, Stage]]):
+        """Declare the ordered stages of a job kind."""
+        self._pipelines[kind] = stages
+
+    def _dir(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id)
+
+    def submit(self, kind: str, user_id: int, payload: Dict[str, Any], input_bytes: bytes,
+               api_key: str, uses_default_key: bool) -> str:
+        """Persist the job and its input file, queue it and return its id."""
+        with self._lock:
+            if len(self._active) >= self.max_pending:
+                raise JobQueueFull(f"{len(self._active)} jobs already pending")
+            job_id = uuid.uuid4().hex
+            self._active.add(job_id)
+
+        try:
+            os.makedirs(self._dir(job_id))
+            input_path = os.path.join(self._dir(job_id), "input")
+            with open(input_path, "wb") as f:
+                f.write(input_bytes)
+            stages = [{'name': name, 'status': 'pending'} for name, _ in self._pipelines[kind]]
+            # The API key itself is never persisted
+            self.db.create_job(job_id, kind, user_id, stages, payload, uses_default_key, owner=self.owner)
+        except BaseException:
+            with self._lock:
+                self._active.discard(job_id)
+            shutil.rmtree(self._dir(job_id), ignore_errors=True)
+            raise
+
+        self._executor.submit(self._run, job_id, api_key)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status with per-stage progress and timing, or None."""
+        job = self.db.get_job(job_id)
+        if job:
+            done = sum(1 for stage in job['stages'] if stage['status'] == 'completed')
+            job['progress'] = done / len(job['stages']) if job['stages'] else 1.0
+        return job
+
+    def start(self, default_api_key: str) -> Tuple[int, int]:
+        """Take over the jobs of stopped workers, then start the heartbeat; return (requeued, failed)."""
+        self._default_api_key = default_api_key
+        result = self.resume(default_api_key)
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+        return result
+
+    def _beat(self):
+        last_sweep = time.monotonic()
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.db.heartbeat_jobs(self.owner)
+                if time.monotonic() - last_sweep >= self.stale_seconds:
+                    last_sweep = time.monotonic()
+                    requeued, failed = self.resume(self._default_api_key)
+                    if requeued or failed:
+                        print(f"🔁 Jobs of a stopped worker: {requeued} resumed, {failed} marked as interrupted")
+            except Exception as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+
+    def resume(self, default_api_key: str) -> Tuple[int, int]:
+        """Take over the jobs of workers that stopped beating; return (requeued, failed).
+
+        Only jobs created with the server's default API key can be resumed, since the keys sent
+        by clients are kept in memory only (by their worker). The others are failed as interrupted.
+        Jobs of live workers, including this one, are left alone.
+        """
+        requeued = failed = 0
+        now = time.time()
+        for job in self.db.get_unfinished_jobs():
+            if job['owner'] == self.owner:
+                continue
+            if job['owner'] and job['heartbeat_at'] and now - job['heartbeat_at'] < self.stale_seconds:
+                continue
+            if not self.db.claim_job(job['id'], self.owner, now - self.stale_seconds):
+                # Another worker claimed it first
+                continue
+            with self._lock:
+                self.jobs_taken_over += 1
+            resumable = (job['kind'] in self._pipelines and job['uses_default_key'] and default_api_key
+                         and os.path.exists(os.path.join(self._dir(job['id']), "input")))
+            if resumable:
+                with self._lock:
+                    self._active.add(job['id'])
+                self.db.update_job(job['id'], owner=self.owner, status='queued')
+                self._executor.submit(self._run, job['id'], default_api_key)
+                requeued += 1
+            else:
+                if self.db.update_job(job['id'], owner=self.owner, status='failed', error=INTERRUPTED_ERROR):
+                    shutil.rmtree(self._dir(job['id']), ignore_errors=True)
+                failed += 1
+        return requeued, failed
+
+    def _update(self, job_id: str, **fields):
+        """Persist job fields while this worker still owns the job."""
+        if not self.db.update_job(job_id, owner=self.owner, **fields):
+            raise JobOwnershipLost(job_id)
+
+    def _run(self, job_id: str, api_key: str):
+        job = self.db.get_job(job_id)
+        stages = job['stages']
+        context = {
+            'id': job_id,
+            'user_id': job['user_id'],
+            'payload': job['payload'],
+            'api_key': api_key,
+            'dir': self._dir(job_id),
+            'input_path': os.path.join(self._dir(job_id), "input"),
+        }
+        lost = False
+        try:
+            self._update(job_id, status='running')
+            for (name, stage), state in zip(self._pipelines[job['kind']], stages):
+                if state['status'] == 'completed':
+                    continue
+                state.update(status='running', started_at=time.time())
+                self._update(job_id, current_stage=name, stages=stages)
+                start = time.perf_counter()
+                try:
+                    result = stage(context)
+                except Exception:
+                    state.update(status='failed', duration_ms=int((time.perf_counter() - start) * 1000))
+                    raise
+                elapsed = time.perf_counter() - start
+                state.update(status='completed', finished_at=time.time(), duration_ms=int(elapsed * 1000))
+                with self._lock:
+                    self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + elapsed
+                if result is not None:
+                    # The last stage's return value is the job result
+                    job['result'] = result
+                self._update(job_id, stages=stages, payload=context['payload'])
+
+            self._update(job_id, status='succeeded', current_stage=None, result=job['result'])
+            with self._lock:
+                self.jobs_succeeded += 1
+        except JobOwnershipLost:
+            # Another worker took the job over: its state and directory are no longer ours
+            lost = True
+            print(f"⚠️ Job {job_id} was taken over by another worker, stopping here")
+            with self._lock:
+                self.jobs_lost += 1
+        except Exception as e:
+            error = getattr(e, 'detail', None) or str(e)
+            print(f"❌ Job {job_id} failed: {error}")
+            if self.db.update_job(job_id, owner=self.owner, status='failed', stages=stages, error=error):
+                with self._lock:
+                    self.jobs_failed += 1
+            else:
+                lost = True
+        finally:
+            if not lost:
+                shutil.rmtree(self._dir(job_id), ignore_errors=True)
+            with self._lock:
+                self._active.discard(job_id)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work; queued jobs stay queued in the database and are taken over once stale."""
+        self._stop.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'active': len(self._active),
+                'max_pending': self.max_pending,
+                'jobs_succeeded': self.jobs_succeeded,
+                'jobs_failed': self.jobs_failed,
+                'jobs_taken_over': self.jobs_taken_over,
+                'jobs_lost': self.jobs_lost,
+                'owner': self.owner,
+                'stage_seconds': {name: round(s, 3) for name, s in self.stage_seconds.items()}
+            }
@@ -1,34 +1,88 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Header
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 import os
 import json
 import PyPDF2
 import io
-from openai import OpenAI
+import base64
+from openai import AsyncOpenAI
+import asyncio
 import time
-import requests
-import sqlite3
 import hashlib
 import datetime
 from database import DatabaseManager
-import jwt
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from conversion import convert_tgi_to_xlsx_and_jsonl
-import tempfile
+from conversion import convert_tgi_to_jsonl_bytes
+from conversion_cache import ConversionCache
+from message_writer import MessageLogWriter
+from jobs import JobManager, JobQueueFull
+from http_transport import HTTPTransport
+from indexing import IndexingTracker
+from thread_registry import ThreadRegistry, api_key_hash
+from openai_clients import OpenAIClientManager
+from assistant_sync import AssistantReconciler
+from answer_cache import AnswerCache
+from auth import Authenticator
+from context_manager import CONTEXT_STRATEGIES, ContextManager
+from metrics import CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, instrument_methods, monitor_event_loop
+from tgi_query import MAX_LIMIT, DatasetStore, TGIDataset, format_context
+from partitions import DOCUMENT_COLUMNS, INGESTION_MODES, partition_documents
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
 # Load environment variables from .env file (in parent directory)
 load_dotenv('../.env')
 
+# Prometheus metrics of this process, served on /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+metrics = MetricsRegistry()
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route, until the last body byte",
+    ("method", "route", "status")
+)
+http_requests_in_progress = metrics.gauge("http_requests_in_progress", "HTTP requests being served")
+openai_request_duration = metrics.histogram(
+    "openai_request_duration_seconds", "Latency of OpenAI API calls by operation", ("operation",)
+)
+assistant_run_duration = metrics.histogram(
+    "assistant_run_duration_seconds", "Assistant runs, from creation to their final status", ("mode", "status")
+)
+assistant_run_polls = metrics.counter("assistant_run_polls_total", "Status polls of non-streamed assistant runs")
+tgi_conversion_duration = metrics.histogram(
+    "tgi_conversion_duration_seconds", "TGI workbook conversion to JSONL (conversion cache hits included)"
+)
+job_stage_duration = metrics.histogram(
+    "assistant_creation_stage_duration_seconds", "Stages of the assistant creation pipeline", ("stage",)
+)
+vector_store_indexing_duration = metrics.histogram(
+    "vector_store_indexing_seconds", "From the end of the upload to searchable vector store files", ("status",)
+)
+db_call_duration = metrics.histogram("db_call_duration_seconds", "DatabaseManager calls", ("method",))
+event_loop_lag = metrics.histogram("event_loop_lag_seconds", "Delay of the event loop waking up from a sleep")
+event_loop_lag_last = metrics.gauge("event_loop_lag_last_seconds", "Last measured event loop delay")
+
 # Initialize OpenAI client
 DEFAULT_OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
-# Global client cache
-client_cache = {}
+# Bounded cache of SDK clients per API key (sync for one-off calls, async for assistant runs),
+# all sharing one connection pool
+openai_clients = OpenAIClientManager(
+    max_clients=int(os.getenv("OPENAI_CLIENT_CACHE_SIZE", "64")),
+    idle_seconds=float(os.getenv("OPENAI_CLIENT_IDLE_SECONDS", "900")),
+    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+    max_keepalive=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+)
+
+# Assistant run polling: start with short waits for quick answers, back off for long file_search runs
+RUN_POLL_INITIAL_DELAY = 0.2
+RUN_POLL_MAX_DELAY = 2.0
+RUN_POLL_BACKOFF = 1.5
+RUN_TIMEOUT_SECONDS = float(os.getenv("ASSISTANT_RUN_TIMEOUT", "300"))
 
 def get_openai_client(api_key: str = None):
     """Get OpenAI client with specified API key or default."""
@@ -38,16 +92,21 @@ def get_openai_client(api_key: str = None):
     if not api_key:
         raise HTTPException(status_code=400, detail="No OpenAI API key provided")
     
-    # Use cached client if available
-    if api_key in client_cache:
-        return client_cache[api_key]
+    try:
+        return openai_clients.get(api_key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating OpenAI client: {str(e)}")
+
+def get_async_openai_client(api_key: str = None):
+    """Get async OpenAI client with specified API key or default."""
+    if api_key is None:
+        api_key = DEFAULT_OPENAI_API_KEY
+    
+    if not api_key:
+        raise HTTPException(status_code=400, detail="No OpenAI API key provided")
     
-    # Create new client with simplified initialization
     try:
-        client = OpenAI(api_key=api_key)
-        # Cache the client
-        client_cache[api_key] = client
-        return client
+        return openai_clients.get_async(api_key)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating OpenAI client: {str(e)}")
 
@@ -60,19 +119,149 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
 
-# Initialize database
-db = DatabaseManager()
+# Pooled, retrying HTTP sessions for the vector store and file REST calls
+# (OPENAI_BASE_URL is also picked up by the SDK clients)
+http_transport = HTTPTransport(
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    connect_timeout=float(os.getenv("OPENAI_HTTP_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("OPENAI_HTTP_READ_TIMEOUT", "60")),
+    max_retries=int(os.getenv("OPENAI_HTTP_MAX_RETRIES", "4")),
+    pool_size=int(os.getenv("OPENAI_HTTP_POOL_SIZE", "10"))
+)
+
+# Vector store readiness: wait briefly during creation, then finish tracking in the background
+INDEXING_WAIT_SECONDS = float(os.getenv("INDEXING_WAIT_SECONDS", "20"))
+indexing_tracker = IndexingTracker(
+    http_transport,
+    max_delay=float(os.getenv("INDEXING_POLL_MAX_SECONDS", "5")),
+    background_timeout=float(os.getenv("INDEXING_BACKGROUND_TIMEOUT", "1800"))
+)
+
+# TGI ingestion: one JSONL file, or one document per group / segment family uploaded as a file batch,
+# cut into small chunks and searched with fewer results
+INGESTION_MODE = os.getenv("INGESTION_MODE", "single")
+PARTITION_CHUNK_TOKENS = int(os.getenv("PARTITION_CHUNK_TOKENS", "400"))
+PARTITION_CHUNK_OVERLAP = int(os.getenv("PARTITION_CHUNK_OVERLAP", "50"))
+PARTITION_MAX_RESULTS = int(os.getenv("PARTITION_MAX_RESULTS", "8"))
+PARTITION_UPLOAD_WORKERS = int(os.getenv("PARTITION_UPLOAD_WORKERS", "4"))
+
+# Initialize database (every call timed in db_call_duration_seconds)
+db = instrument_methods(DatabaseManager(), db_call_duration, exclude=("hash_password", "calculate_gpt4o_cost"))
+
+# Background writer for chat message logging (keeps SQLite writes off the request path)
+message_writer = MessageLogWriter(
+    db,
+    max_batch=int(os.getenv("MESSAGE_LOG_BATCH_SIZE", "200")),
+    max_delay=int(os.getenv("MESSAGE_LOG_FLUSH_MS", "250")) / 1000
+)
+
+# Cache of converted TGI workbooks, keyed on the uploaded bytes
+conversion_cache = ConversionCache(
+    cache_dir=os.getenv("CONVERSION_CACHE_DIR", "conversion_cache"),
+    max_bytes=int(os.getenv("CONVERSION_CACHE_MAX_MB", "512")) * 2**20
+)
+
+# Conversation threads per user and API key, persisted so they survive restarts and are shared by workers
+thread_registry = ThreadRegistry(
+    db,
+    ttl_seconds=float(os.getenv("THREAD_TTL_HOURS", "168")) * 3600,
+    max_entries=int(os.getenv("THREAD_CACHE_SIZE", "10000"))
+)
+
+# Assistant listings are served from the local table; OpenAI is reconciled in the background
+assistant_sync = AssistantReconciler(
+    db,
+    get_client=lambda api_key: get_openai_client(api_key),
+    interval=float(os.getenv("ASSISTANT_SYNC_INTERVAL", "300")),
+    remote_ttl=float(os.getenv("ASSISTANT_REMOTE_CACHE_SECONDS", "30"))
+)
+
+# Opt-in cache of answers to repeated questions (per assistant, question and prompt version)
+answer_cache = AnswerCache(
+    db,
+    enabled=os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes"),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_HOURS", "24")) * 3600,
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+)
+
+# Decoded tokens and user roles cached in-process, so authenticated requests skip JWT decoding and SQLite
+authenticator = Authenticator(
+    db,
+    SECRET_KEY,
+    algorithm=ALGORITHM,
+    expire_hours=ACCESS_TOKEN_EXPIRE_HOURS,
+    token_cache_seconds=float(os.getenv("AUTH_TOKEN_CACHE_SECONDS", "300")),
+    role_cache_seconds=float(os.getenv("AUTH_ROLE_CACHE_SECONDS", "30")),
+    max_entries=int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+)
+
+# Conversation history sent with each run: truncation strategy and rolling summaries, per assistant
+context_manager = ContextManager(
+    db,
+    strategy=os.getenv("CONTEXT_STRATEGY", "full"),
+    last_messages=int(os.getenv("CONTEXT_LAST_MESSAGES", "6")),
+    summary=os.getenv("CONTEXT_SUMMARY_ENABLED", "false").lower() in ("1", "true", "yes"),
+    summary_model=os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini"),
+    summary_every=int(os.getenv("CONTEXT_SUMMARY_EVERY", "2")),
+    summary_max_tokens=int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "400"))
+)
+
+# Local query engine over the converted TGI data of each assistant (answers numeric questions without OpenAI)
+dataset_store = DatasetStore(
+    db,
+    data_dir=os.getenv("DATASETS_DIR", "datasets"),
+    max_loaded=int(os.getenv("DATASET_CACHE_SIZE", "16")),
+    compression=os.getenv("DATASET_COMPRESSION", "none")
+)
+
+# Background jobs (assistant creation runs outside the request, in a bounded worker pool)
+job_manager = JobManager(
+    db,
+    jobs_dir=os.getenv("JOBS_DIR", "jobs"),
+    max_workers=int(os.getenv("JOB_WORKERS", "2")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "20")),
+    heartbeat_seconds=float(os.getenv("JOB_HEARTBEAT_SECONDS", "5")),
+    stale_seconds=float(os.getenv("JOB_STALE_SECONDS", "30"))
+)
+
+metrics.gauge("message_log_pending", "Chat messages queued for the background writer", function=message_writer.pending)
+metrics.gauge("jobs_active", "Assistant creations queued or running", function=lambda: job_manager.stats()['active'])
+# Vector store file status polls, during creation and in background tracking
+indexing_tracker.file_status = openai_request_duration.wrap(indexing_tracker.file_status, operation="indexing_status")
 
 # Security
 security = HTTPBearer()
 
+# Fire-and-forget tasks started by requests; referenced until done so they are not garbage-collected
+background_tasks: set = set()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("Starting DDB TGI Audience Manager API...")
+    message_writer.start()
+    expired = thread_registry.purge_expired()
+    if answer_cache.enabled:
+        answer_cache.purge_expired()
+    if expired:
+        print(f"🧹 {expired} expired conversation threads removed")
+    requeued, failed = job_manager.start(DEFAULT_OPENAI_API_KEY)
+    if requeued or failed:
+        print(f"🔁 Jobs after restart: {requeued} resumed, {failed} marked as interrupted")
+    sync_task = asyncio.create_task(assistant_sync.run())
+    lag_task = asyncio.create_task(monitor_event_loop(event_loop_lag, event_loop_lag_last))
     yield
     # Shutdown
     print("Shutting down DDB TGI Audience Manager API...")
+    sync_task.cancel()
+    lag_task.cancel()
+    await context_manager.drain()
+    # Durable flush of queued message logs before exit
+    message_writer.stop()
+    # Queued jobs stay queued in the database; another worker (or the next start) takes them over once stale
+    job_manager.shutdown(wait=False)
+    http_transport.close()
+    await openai_clients.aclose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -89,15 +278,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Outermost: per-route latency, status and concurrency
+app.add_middleware(MetricsMiddleware, duration=http_request_duration, in_progress=http_requests_in_progress)
+
 # Pydantic models
 class LoginRequest(BaseModel):
     username: str
     password: str
 
+class DatasetQueryRequest(BaseModel):
+    # filter: rows in [min_value, max_value]; top: the limit highest (or lowest) rows; compare: segment vs segment_b
+    op: str = "filter"
+    group: Optional[str] = None
+    segment: Optional[str] = None
+    segment_b: Optional[str] = None
+    metric: str = "Indice"
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    sort_by: Optional[str] = None
+    descending: bool = True
+    limit: int = Field(50, ge=1, le=MAX_LIMIT)
+    include_totals: bool = False
+
 class MessageRequest(BaseModel):
     message: str
+    # Allow a cached answer to a previous identical question (when the answer cache is enabled)
+    use_cache: bool = True
+    # Local query whose results are sent to the assistant with the question
+    query: Optional[DatasetQueryRequest] = None
 
 class UserResponse(BaseModel):
     id: int
@@ -119,15 +330,26 @@ class AssistantResponse(BaseModel):
     message_count: int
     total_tokens: Optional[int] = 0
     total_cost_euros: Optional[float] = 0.0
+    indexing_status: Optional[str] = "completed"
+
+class ContextSettingsRequest(BaseModel):
+    # None restores the server default (CONTEXT_* settings)
+    strategy: Optional[str] = None
+    last_messages: Optional[int] = None
+    summary: Optional[bool] = None
 
 class MessageResponse(BaseModel):
     response: str
+    cached: bool = False
 
 class ChatMessage(BaseModel):
     role: str
     content: str
     timestamp: str
 
+class UserRoleRequest(BaseModel):
+    role: str
+
 class UniversalPromptRequest(BaseModel):
     prompt_content: str
 
@@ -139,15 +361,11 @@ class UniversalPromptResponse(BaseModel):
 def get_universal_prompt(theme: str) -> str:
     """Get universal prompt from database or return default."""
     try:
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT prompt_content FROM universal_prompt WHERE id = 1')
-        result = cursor.fetchone()
-        conn.close()
+        result = db.get_universal_prompt()
         
         if result:
             # Replace {theme} placeholder in stored prompt
-            return result[0].replace('{theme}', theme)
+            return result['prompt_content'].replace('{theme}', theme)
         else:
             # Return default prompt if none stored
             return get_default_prompt(theme)
@@ -155,6 +373,11 @@ def get_universal_prompt(theme: str) -> str:
         # Fallback to default prompt on any error
         return get_default_prompt(theme)
 
+def get_prompt_version() -> str:
+    """Version of the universal prompt, used to key cached answers."""
+    result = db.get_universal_prompt()
+    return result['updated_at'] if result else "default"
+
 def get_default_prompt(theme: str) -> str:
     """Get the default universal prompt."""
     return f"""Tu es un assistant expert en analyse de données sectorielles.
@@ -177,44 +400,23 @@ Toujours utiliser la signification exacte des champs ci-dessus pour interpréter
 Si la question de l'utilisateur n'est pas claire, commence par demander une précision.
 Commence l'analyse dès la prochaine question utilisateur."""
 
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.datetime.utcnow() + datetime.timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return user_id
-    except jwt.PyJWTError:
+    claims = authenticator.decode(credentials.credentials)
+    if claims is None:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return claims['user_id']
 
 def verify_admin_role(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify token and check if user has admin role."""
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        # Get user from database to check role
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT role FROM users WHERE id = ?', (user_id,))
-        user = cursor.fetchone()
-        conn.close()
-        
-        if not user or user[0] != 'admin':
-            raise HTTPException(status_code=403, detail="Access denied. Admin role required.")
-        
-        return user_id
-    except jwt.PyJWTError:
+    claims = authenticator.decode(credentials.credentials)
+    if claims is None:
         raise HTTPException(status_code=401, detail="Invalid token")
+    
+    # Role cached in-process, invalidated when it changes
+    if not authenticator.is_admin(claims):
+        raise HTTPException(status_code=403, detail="Access denied. Admin role required.")
+    
+    return claims['user_id']
 
 def extract_text_from_pdf(pdf_file) -> str:
     """Extract text content from PDF file."""
@@ -255,100 +457,122 @@ def extract_text_from_txt(txt_file) -> str:
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing TXT file: {str(e)}")
 
-def create_vector_store_via_api(name: str, file_content: bytes, filename: str, api_key: str) -> Optional[str]:
-    """Create vector store using direct API calls with proper file upload."""
-    try:
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "OpenAI-Beta": "assistants=v2"
-        }
-        
-        # Step 1: Create vector store
-        vs_response = requests.post(
-            "https://api.openai.com/v1/vector_stores",
-            headers=headers,
+VECTOR_STORE_HEADERS = {"OpenAI-Beta": "assistants=v2"}
+
+def create_vector_store(name: str, api_key: str) -> str:
+    """Create an empty vector store and return its id."""
+    with openai_request_duration.time(operation="create_vector_store"):
+        vs_response = http_transport.post(
+            "/vector_stores",
+            api_key,
+            headers=VECTOR_STORE_HEADERS,
             json={"name": f"vs_{name}"}
         )
+    
+    if vs_response.status_code != 200:
+        raise HTTPException(status_code=400, detail=f"Failed to create vector store: {vs_response.text}")
         
-        if vs_response.status_code != 200:
-            raise HTTPException(status_code=400, detail=f"Failed to create vector store: {vs_response.text}")
-            
-        vector_store_id = vs_response.json()["id"]
-        
-        # Step 2: Upload file to OpenAI Files
-        if filename.endswith('.json'):
-            content_type = "application/json"
-        elif filename.endswith('.jsonl'):
-            content_type = "application/x-ndjson"
-        elif filename.endswith('.txt'):
-            content_type = "text/plain"
-        elif filename.endswith('.pdf'):
-            content_type = "application/pdf"
-        else:
-            content_type = "application/octet-stream"
-        
-        files = {
-            'file': (filename, file_content, content_type),
-            'purpose': (None, 'assistants')
-        }
-        
-        file_response = requests.post(
-            "https://api.openai.com/v1/files",
-            headers={"Authorization": f"Bearer {api_key}"},
-            files=files
+    return vs_response.json()["id"]
+
+def upload_openai_file(file_content: bytes, filename: str, api_key: str) -> str:
+    """Upload a file to OpenAI Files for the assistants and return its id."""
+    if filename.endswith('.json'):
+        content_type = "application/json"
+    elif filename.endswith('.jsonl'):
+        content_type = "application/x-ndjson"
+    elif filename.endswith('.txt'):
+        content_type = "text/plain"
+    elif filename.endswith('.md'):
+        content_type = "text/markdown"
+    elif filename.endswith('.pdf'):
+        content_type = "application/pdf"
+    else:
+        content_type = "application/octet-stream"
+    
+    files = {
+        'file': (filename, file_content, content_type),
+        'purpose': (None, 'assistants')
+    }
+    
+    with openai_request_duration.time(operation="upload_file"):
+        file_response = http_transport.post(
+            "/files",
+            api_key,
+            files=files,
+            # Large uploads get more time than the default read timeout
+            timeout=(http_transport.timeout[0], max(http_transport.timeout[1], 300))
         )
+    
+    if file_response.status_code != 200:
+        raise HTTPException(status_code=400, detail=f"Failed to upload file: {file_response.text}")
         
-        if file_response.status_code != 200:
-            raise HTTPException(status_code=400, detail=f"Failed to upload file: {file_response.text}")
-            
-        file_id = file_response.json()["id"]
+    return file_response.json()["id"]
+
+def upload_file_to_vector_store(name: str, file_content: bytes, filename: str, api_key: str) -> tuple[str, str]:
+    """Create a vector store and attach the uploaded file; return (vector_store_id, file_id)."""
+    try:
+        # Step 1: Create vector store
+        vector_store_id = create_vector_store(name, api_key)
+        
+        # Step 2: Upload file to OpenAI Files
+        file_id = upload_openai_file(file_content, filename, api_key)
         
         # Step 3: Attach file to vector store
-        vs_file_response = requests.post(
-            f"https://api.openai.com/v1/vector_stores/{vector_store_id}/files",
-            headers=headers,
-            json={"file_id": file_id}
-        )
+        with openai_request_duration.time(operation="attach_file"):
+            vs_file_response = http_transport.post(
+                f"/vector_stores/{vector_store_id}/files",
+                api_key,
+                headers=VECTOR_STORE_HEADERS,
+                json={"file_id": file_id}
+            )
         
         if vs_file_response.status_code != 200:
             raise HTTPException(status_code=400, detail=f"Failed to attach file to vector store: {vs_file_response.text}")
         
-        # Wait for file indexing
-        max_wait = 30
-        wait_count = 0
+        return vector_store_id, file_id
         
-        while wait_count < max_wait:
-            vs_status_response = requests.get(
-                f"https://api.openai.com/v1/vector_stores/{vector_store_id}",
-                headers=headers
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating vector store: {str(e)}")
+
+def upload_documents_to_vector_store(name: str, documents: List[tuple], api_key: str) -> tuple[str, str]:
+    """Create a vector store and add the documents as one file batch; return (vector_store_id, batch_id)."""
+    try:
+        vector_store_id = create_vector_store(name, api_key)
+        
+        # Uploads are independent: run a few at once over the pooled sessions
+        with ThreadPoolExecutor(max_workers=PARTITION_UPLOAD_WORKERS) as pool:
+            file_ids = list(pool.map(lambda doc: upload_openai_file(doc[1], doc[0], api_key), documents))
+        
+        with openai_request_duration.time(operation="create_file_batch"):
+            batch_response = http_transport.post(
+                f"/vector_stores/{vector_store_id}/file_batches",
+                api_key,
+                headers=VECTOR_STORE_HEADERS,
+                json={
+                    "file_ids": file_ids,
+                    # Small chunks: each one holds rows of a single family
+                    "chunking_strategy": {
+                        "type": "static",
+                        "static": {
+                            "max_chunk_size_tokens": PARTITION_CHUNK_TOKENS,
+                            "chunk_overlap_tokens": PARTITION_CHUNK_OVERLAP
+                        }
+                    }
+                }
             )
-            
-            if vs_status_response.status_code == 200:
-                vs_data = vs_status_response.json()
-                file_counts = vs_data.get("file_counts", {})
-                
-                if file_counts.get("completed", 0) > 0:
-                    break
-                elif file_counts.get("failed", 0) > 0:
-                    break
-            
-            time.sleep(2)
-            wait_count += 2
         
-        return vector_store_id
+        if batch_response.status_code != 200:
+            raise HTTPException(status_code=400, detail=f"Failed to add file batch to vector store: {batch_response.text}")
+        
+        return vector_store_id, batch_response.json()["id"]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating vector store: {str(e)}")
 
-def create_openai_assistant(name: str, instructions: str, file_content: bytes, filename: str, file_type: str, api_key: str) -> Optional[str]:
-    """Create an OpenAI assistant with vector store and file search."""
+def create_openai_assistant(name: str, instructions: str, vector_store_id: str, file_type: str, api_key: str,
+                            max_num_results: Optional[int] = None) -> Optional[str]:
+    """Create an OpenAI assistant with file search over an indexed vector store."""
     try:
-        # Create vector store and upload file
-        vector_store_id = create_vector_store_via_api(name, file_content, filename, api_key)
-        
-        if not vector_store_id:
-            raise HTTPException(status_code=500, detail="Failed to create vector store")
-        
         # Create assistant instructions
         full_instructions = f"""
 {instructions}
@@ -358,93 +582,278 @@ Please use the document content to answer user questions accurately and helpfull
 If a question cannot be answered based on the provided document, please say so clearly.
 """
         
-        # Create the assistant
+        # Create the assistant (file_search returns up to 20 chunks unless limited)
+        file_search_tool = {"type": "file_search"}
+        if max_num_results:
+            file_search_tool["file_search"] = {"max_num_results": max_num_results}
         client = get_openai_client(api_key)
-        assistant = client.beta.assistants.create(
-            name=name,
-            instructions=full_instructions,
-            model="gpt-4o",
-            tools=[{"type": "file_search"}],
-            tool_resources={
-                "file_search": {
-                    "vector_store_ids": [vector_store_id]
+        with openai_request_duration.time(operation="create_assistant"):
+            assistant = client.beta.assistants.create(
+                name=name,
+                instructions=full_instructions,
+                model="gpt-4o",
+                tools=[file_search_tool],
+                tool_resources={
+                    "file_search": {
+                        "vector_store_ids": [vector_store_id]
+                    }
                 }
-            }
-        )
+            )
         
         return assistant.id
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating assistant: {str(e)}")
 
-# Store for threads (in production, use Redis or database)
-threads_store = {}
+# Assistant creation pipeline, run by the job manager in a worker thread
 
-def get_or_create_thread(assistant_id: str, api_key: str) -> Optional[str]:
-    """Get existing thread or create new one for the assistant."""
-    thread_key = f"{assistant_id}_{api_key[:10]}"  # Use API key prefix to separate threads
+def convert_stage(job: dict):
+    """Convert an uploaded TGI workbook to JSONL (other files are uploaded as is)."""
+    payload = job['payload']
+    if not payload['is_excel']:
+        payload['upload_file'] = "input"
+        return
     
-    if thread_key not in threads_store:
+    print("🔄 Conversion du fichier TGI Excel vers JSONL...")
+    with open(job['input_path'], 'rb') as f:
+        file_content = f.read()
+    # Convert in memory straight to JSONL bytes (no temp files, no Excel writer);
+    # a workbook already seen is served from the cache without being opened
+    with tgi_conversion_duration.time():
+        converted = conversion_cache.get_or_convert(file_content, convert_tgi_to_jsonl_bytes)
+    with open(os.path.join(job['dir'], "converted"), 'wb') as f:
+        f.write(converted)
+    payload['upload_file'] = "converted"
+    print(f"✅ Conversion terminée - Fichier converti: {payload['file_name']}")
+
+def upload_stage(job: dict):
+    """Upload the file as is, or partitioned into one document per family as a file batch."""
+    payload = job['payload']
+    with open(os.path.join(job['dir'], payload['upload_file']), 'rb') as f:
+        file_content = f.read()
+    
+    mode = payload.get('ingestion_mode', 'single')
+    if mode != 'single':
         try:
-            client = get_openai_client(api_key)
-            thread = client.beta.threads.create()
-            threads_store[thread_key] = thread.id
+            base_name = os.path.splitext(payload['file_name'])[0]
+            documents = partition_documents(TGIDataset.from_jsonl(file_content), mode, base_name)
+        except Exception as e:
+            print(f"⚠️ Partitioning skipped, uploading a single file: {e}")
+            mode = 'single'
+    payload['ingestion_mode'] = mode
+    
+    if mode == 'single':
+        payload['vector_store_id'], payload['file_id'] = upload_file_to_vector_store(
+            payload['name'], file_content, payload['file_name'], job['api_key']
+        )
+    else:
+        print(f"📚 {len(documents)} documents ({mode}) envoyés en lot")
+        payload['vector_store_id'], payload['file_id'] = upload_documents_to_vector_store(
+            payload['name'], documents, job['api_key']
+        )
+        payload['file_batch'] = True
+    # Wall-clock, so the indexing time survives a restart between stages
+    payload['uploaded_at'] = time.time()
+
+def observe_indexing(payload: dict, status: str):
+    if 'uploaded_at' in payload:
+        vector_store_indexing_duration.observe(max(time.time() - payload['uploaded_at'], 0.0), status=status)
+
+def index_stage(job: dict):
+    """Wait for the file to be searchable, at most INDEXING_WAIT_SECONDS (then it is tracked in the background)."""
+    payload = job['payload']
+    status = indexing_tracker.wait_until_ready(
+        payload['vector_store_id'], payload['file_id'], job['api_key'], INDEXING_WAIT_SECONDS,
+        batch=payload.get('file_batch', False)
+    )
+    if status != 'in_progress':
+        observe_indexing(payload, status)
+    if status in ('failed', 'cancelled'):
+        raise HTTPException(status_code=500, detail=f"Indexing of {payload['file_name']} {status}")
+    payload['indexing_status'] = status
+
+def save_dataset(assistant_id: str, path: str):
+    """Keep a queryable copy of a converted TGI file (other files are skipped)."""
+    try:
+        with open(path, 'rb') as f:
+            dataset = TGIDataset.from_jsonl(f.read())
+        dataset_store.save(assistant_id, dataset)
+        print(f"🗂️ Dataset local prêt : {len(dataset)} lignes")
+    except Exception as e:
+        # Chat still works through file_search, only local queries are unavailable
+        print(f"⚠️ No local dataset for {assistant_id}: {e}")
+
+def resume_indexing(assistants: list, api_key: str):
+    """Follow again, with the caller's key, the assistants still indexing that no tracker follows.
+    
+    Background tracking lives in memory: after a restart, an assistant stays ``in_progress`` until
+    it is listed again. Its vector store is then polled until every file is indexed.
+    """
+    for a in assistants:
+        if a['indexing_status'] == 'in_progress' and a['vector_store_id']:
+            indexing_tracker.track(
+                a['vector_store_id'], None, api_key,
+                on_done=lambda state, assistant_id=a['openai_id']: db.set_assistant_indexing_status(assistant_id, state)
+            )
+
+def create_assistant_stage(job: dict) -> dict:
+    payload = job['payload']
+    partitioned = payload.get('ingestion_mode', 'single') != 'single'
+    instructions = payload['instructions']
+    if partitioned:
+        instructions += (f"\n\nLes données sont réparties en un document par famille ; "
+                         f"chaque ligne donne, dans l'ordre : {DOCUMENT_COLUMNS}.")
+    assistant_id = create_openai_assistant(
+        payload['name'], instructions, payload['vector_store_id'], payload['file_type'], job['api_key'],
+        max_num_results=PARTITION_MAX_RESULTS if partitioned else None
+    )
+    if not assistant_id:
+        raise HTTPException(status_code=500, detail="Failed to create assistant")
+    
+    # Log to database
+    db.log_assistant_creation(
+        assistant_id, payload['name'], payload['theme'], job['user_id'], payload['file_name'], payload['file_type'],
+        vector_store_id=payload['vector_store_id'], indexing_status=payload['indexing_status'],
+        api_key_hash=api_key_hash(job['api_key']), ingestion_mode=payload.get('ingestion_mode', 'single')
+    )
+    assistant_sync.invalidate(job['api_key'])
+    if payload['is_excel'] or payload['file_type'] in ('JSON', 'JSONL'):
+        save_dataset(assistant_id, os.path.join(job['dir'], payload['upload_file']))
+    if payload['indexing_status'] == 'in_progress':
+        def on_indexed(state: str):
+            db.set_assistant_indexing_status(assistant_id, state)
+            observe_indexing(payload, state)
+        
+        indexing_tracker.track(
+            payload['vector_store_id'], payload['file_id'], job['api_key'],
+            on_done=on_indexed,
+            batch=partitioned
+        )
+    return {"assistant_id": assistant_id, "indexing_status": payload['indexing_status']}
+
+job_manager.register("create_assistant", [
+    (name, job_stage_duration.wrap(stage, stage=name)) for name, stage in [
+        ("convert", convert_stage),
+        ("upload", upload_stage),
+        ("index", index_stage),
+        ("create_assistant", create_assistant_stage),
+    ]
+])
+
+def run_dataset_query(assistant_id: str, query: DatasetQueryRequest) -> dict:
+    """Run a local query on an assistant's dataset."""
+    if query.op == "filter":
+        params = dict(group=query.group, segment=query.segment, metric=query.metric, min_value=query.min_value,
+                      max_value=query.max_value, sort_by=query.sort_by or query.metric,
+                      descending=query.descending, limit=query.limit, include_totals=query.include_totals)
+    elif query.op == "top":
+        params = dict(metric=query.metric, k=query.limit, group=query.group, segment=query.segment,
+                      ascending=not query.descending, include_totals=query.include_totals)
+    elif query.op == "compare":
+        if not query.segment or not query.segment_b:
+            raise HTTPException(status_code=400, detail="compare needs segment and segment_b")
+        params = dict(segment_a=query.segment, segment_b=query.segment_b, metric=query.metric,
+                      group=query.group, limit=query.limit)
+    else:
+        raise HTTPException(status_code=400, detail="Unknown query, use filter, top or compare")
+    
+    try:
+        result = dataset_store.query(assistant_id, query.op, **params)
+    except (ValueError, LookupError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="No queryable dataset for this assistant")
+    return result
+
+def message_with_context(assistant_id: str, request: MessageRequest) -> str:
+    """The question sent to the assistant, preceded by the results of its local query if any."""
+    if request.query is None:
+        return request.message
+    context = format_context(run_dataset_query(assistant_id, request.query))
+    return f"{context}\n\nQuestion : {request.message}"
+
+async def get_or_create_thread(assistant_id: str, user_id: int, api_key: str) -> Optional[str]:
+    """Get the user's conversation thread with the assistant, or create one."""
+    thread_id = thread_registry.get(assistant_id, user_id, api_key)
+    if thread_id is None:
+        try:
+            client = get_async_openai_client(api_key)
+            with openai_request_duration.time(operation="create_thread"):
+                thread = await client.beta.threads.create()
+            thread_id = thread_registry.put(assistant_id, user_id, api_key, thread.id)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error creating thread: {str(e)}")
-    return threads_store[thread_key]
+    return thread_id
+
+async def wait_for_run(client: AsyncOpenAI, thread_id: str, run):
+    """Poll a run until it leaves the queued/in_progress states, without blocking the event loop."""
+    delay = RUN_POLL_INITIAL_DELAY
+    deadline = time.monotonic() + RUN_TIMEOUT_SECONDS
+    while run.status in ['queued', 'in_progress']:
+        if time.monotonic() >= deadline:
+            await client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+            raise HTTPException(status_code=504, detail="Assistant run timed out")
+        await asyncio.sleep(delay)
+        delay = min(delay * RUN_POLL_BACKOFF, RUN_POLL_MAX_DELAY)
+        assistant_run_polls.inc()
+        with openai_request_duration.time(operation="retrieve_run"):
+            run = await client.beta.threads.runs.retrieve(
+                thread_id=thread_id,
+                run_id=run.id
+            )
+    return run
 
-def send_message_to_assistant(assistant_id: str, message: str, api_key: str) -> tuple[str, int, int]:
-    """Send message to assistant and get response with token usage."""
+async def send_message_to_assistant(assistant_id: str, user_id: int, message: str, api_key: str) -> tuple[str, int, int, dict]:
+    """Send message to assistant and get response with token usage and its turn in the conversation."""
     try:
-        client = get_openai_client(api_key)
-        thread_id = get_or_create_thread(assistant_id, api_key)
+        client = get_async_openai_client(api_key)
+        thread_id = await get_or_create_thread(assistant_id, user_id, api_key)
         if not thread_id:
             raise HTTPException(status_code=500, detail="Could not create conversation thread")
         
         # Add message to thread
-        client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=message
-        )
-        
-        # Create and run assistant
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=assistant_id
-        )
-        
-        # Wait for completion
-        while run.status in ['queued', 'in_progress']:
-            time.sleep(1)
-            run = client.beta.threads.runs.retrieve(
+        with openai_request_duration.time(operation="create_message"):
+            await client.beta.threads.messages.create(
                 thread_id=thread_id,
-                run_id=run.id
+                role="user",
+                content=message
             )
         
-        if run.status == 'completed':
-            # Get the completed run to extract token usage
-            completed_run = client.beta.threads.runs.retrieve(
+        # Create and run assistant, with the history allowed by its context strategy
+        run_options, turn = context_manager.run_options(assistant_id, thread_id)
+        run_start = time.perf_counter()
+        with openai_request_duration.time(operation="create_run"):
+            run = await client.beta.threads.runs.create(
                 thread_id=thread_id,
-                run_id=run.id
+                assistant_id=assistant_id,
+                **run_options
             )
-            
+        
+        # Wait for completion (the last retrieved run carries the token usage)
+        run = await wait_for_run(client, thread_id, run)
+        assistant_run_duration.observe(time.perf_counter() - run_start, mode="blocking", status=run.status)
+        
+        if run.status == 'completed':
             # Extract token usage
             input_tokens = 0
             output_tokens = 0
-            if hasattr(completed_run, 'usage') and completed_run.usage:
-                input_tokens = completed_run.usage.prompt_tokens or 0
-                output_tokens = completed_run.usage.completion_tokens or 0
+            if hasattr(run, 'usage') and run.usage:
+                input_tokens = run.usage.prompt_tokens or 0
+                output_tokens = run.usage.completion_tokens or 0
             
-            # Get messages
-            messages = client.beta.threads.messages.list(thread_id=thread_id)
+            # Get the reply produced by this run
+            with openai_request_duration.time(operation="list_messages"):
+                messages = await client.beta.threads.messages.list(thread_id=thread_id, run_id=run.id, limit=1)
             content = messages.data[0].content[0]
             if content.type == 'text':
-                return content.text.value, input_tokens, output_tokens
+                context_manager.complete_turn(assistant_id, thread_id, client)
+                return content.text.value, input_tokens, output_tokens, turn
             else:
                 raise HTTPException(status_code=500, detail="Assistant response format is unexpected")
         else:
             raise HTTPException(status_code=500, detail=f"Assistant run failed with status: {run.status}")
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error sending message: {str(e)}")
 
@@ -460,54 +869,83 @@ async def login(request: LoginRequest):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
     
-    token = create_access_token({"user_id": user["id"]})
+    token = authenticator.create_token(user["id"], user["role"])
     
     return LoginResponse(
         user=UserResponse(**user),
         token=token
     )
 
+def encode_cursor(cursor: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/assistants", response_model=List[AssistantResponse])
 async def get_assistants(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     user_id: int = Depends(verify_token),
     api_key: str = Depends(get_api_key_from_header)
 ):
+    """List assistants from the local table, newest first.
+    
+    Pages are chained with the ``X-Next-Cursor`` response header (absent on the last page).
+    """
+    if not api_key:
+        raise HTTPException(status_code=400, detail="No OpenAI API key provided")
+    page_cursor = decode_cursor(cursor) if cursor else None
     try:
-        # Get assistants from OpenAI with the provided API key
-        client = get_openai_client(api_key)
-        assistants = client.beta.assistants.list(limit=100)
-        
-        # Get additional data from database
-        db_assistants = db.get_user_assistants(user_id)
-        db_dict = {a['openai_id']: a for a in db_assistants}
-        
-        result = []
-        for assistant in assistants.data:
-            db_data = db_dict.get(assistant.id, {})
-            result.append(AssistantResponse(
-                id=assistant.id,
-                name=assistant.name or "Assistant",
-                theme=db_data.get('theme', 'N/A'),
-                created_at=datetime.datetime.fromtimestamp(assistant.created_at).isoformat(),
-                file_name=db_data.get('file_name'),
-                file_type=db_data.get('file_type'),
-                message_count=db_data.get('message_count', 0),
-                total_tokens=db_data.get('total_tokens', 0),
-                total_cost_euros=db_data.get('total_cost_euros', 0.0)
-            ))
-        
-        return result
+        # First sight of this key: pick up assistants created outside the app, off the request path
+        if assistant_sync.note_key(api_key):
+            task = asyncio.create_task(assistant_sync.reconcile_async(api_key))
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+        
+        assistants, next_cursor = db.list_assistants(user_id, api_key_hash(api_key), limit, page_cursor)
+        resume_indexing(assistants, api_key)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = encode_cursor(next_cursor)
+        
+        return [
+            AssistantResponse(
+                id=a['openai_id'],
+                name=a['name'] or "Assistant",
+                theme=a['theme'],
+                # Stored in UTC by SQLite
+                created_at=datetime.datetime.fromisoformat(a['created_at']).replace(tzinfo=datetime.timezone.utc).isoformat(),
+                file_name=a['file_name'],
+                file_type=a['file_type'],
+                message_count=a['message_count'],
+                total_tokens=a['total_tokens'],
+                total_cost_euros=a['total_cost_euros'],
+                indexing_status=a['indexing_status']
+            )
+            for a in assistants
+        ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching assistants: {str(e)}")
 
-@app.post("/assistants")
+@app.post("/assistants", status_code=202)
 async def create_assistant(
     name: str = Form(...),
     theme: str = Form(...),
     file: UploadFile = File(...),
+    ingestion_mode: Optional[str] = Form(None),
     user_id: int = Depends(verify_token),
     api_key: str = Depends(get_api_key_from_header)
 ):
+    """Queue the creation of an assistant; poll GET /jobs/{job_id} for its progress.
+    
+    ``ingestion_mode`` (TGI data only): ``single`` uploads one file, ``groups`` / ``segments``
+    one document per interview group family / segment family (default: INGESTION_MODE).
+    """
     try:
         # Validate file type - now including Excel files
         allowed_types = ['application/json', 'text/plain', 'application/x-ndjson', 
@@ -519,53 +957,27 @@ async def create_assistant(
         if file.content_type not in allowed_types and not is_jsonl and not is_excel:
             raise HTTPException(status_code=400, detail="Unsupported file type. Use JSON, JSONL, TXT, XLS or XLSX.")
         
+        if not api_key:
+            raise HTTPException(status_code=400, detail="No OpenAI API key provided")
+        
+        ingestion_mode = ingestion_mode or INGESTION_MODE
+        if ingestion_mode not in INGESTION_MODES:
+            raise HTTPException(status_code=400, detail=f"Unknown ingestion mode. Use {', '.join(INGESTION_MODES)}.")
+        if not (is_excel or is_jsonl or file.filename.endswith('.json')):
+            # Only converted TGI tables can be partitioned
+            ingestion_mode = "single"
+        
         # Read file content
         file_content = await file.read()
         original_filename = file.filename
         
-        # Handle Excel file conversion
         if is_excel:
-            print("📊 Détection d'un fichier Excel - Début de la conversion...")
+            print("📊 Détection d'un fichier Excel - conversion dans la tâche de création...")
             
-            # Create temporary files for conversion
-            with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as temp_input:
-                temp_input.write(file_content)
-                temp_input_path = temp_input.name
-            
-            try:
-                # Generate output paths
-                base_name = os.path.splitext(original_filename)[0]
-                temp_output_jsonl = tempfile.mktemp(suffix='_converted.json')
-                
-                print("🔄 Conversion du fichier TGI Excel vers JSONL...")
-                
-                # Convert using the conversion function
-                convert_tgi_to_xlsx_and_jsonl(
-                    input_xlsx=temp_input_path,
-                    output_xlsx=None,  # We don't need the Excel output
-                    output_jsonl=temp_output_jsonl
-                )
-                
-                print("✅ Conversion terminée - Lecture du fichier JSONL...")
-                
-                # Read the converted JSONL file
-                with open(temp_output_jsonl, 'rb') as f:
-                    file_content = f.read()
-                
-                # Update filename and type for the assistant
-                original_filename = f"{base_name}_converted.json"
-                file_type = "JSON (converti depuis Excel)"
-                
-                print(f"📁 Fichier converti: {original_filename}")
-                
-            finally:
-                # Clean up temporary files
-                try:
-                    os.unlink(temp_input_path)
-                    if os.path.exists(temp_output_jsonl):
-                        os.unlink(temp_output_jsonl)
-                except:
-                    pass
+            # Update filename and type for the assistant
+            base_name = os.path.splitext(original_filename)[0]
+            original_filename = f"{base_name}_converted.json"
+            file_type = "JSON (converti depuis Excel)"
         else:
             # Determine file type for non-Excel files
             file_type = "JSONL"
@@ -576,27 +988,55 @@ async def create_assistant(
             elif file.content_type == "text/plain" or file.filename.endswith('.txt'):
                 file_type = "TXT"
         
-        # Get universal prompt (from database or default)
+        # Get universal prompt (from database or default) as of submission time
         universal_prompt = get_universal_prompt(theme)
         
-        # Create assistant with universal prompt
-        assistant_id = create_openai_assistant(
-            name, universal_prompt, file_content, original_filename, file_type, api_key
+        job_id = job_manager.submit(
+            "create_assistant",
+            user_id,
+            {
+                "name": name,
+                "theme": theme,
+                "file_name": original_filename,
+                "file_type": file_type,
+                "is_excel": is_excel,
+                "ingestion_mode": ingestion_mode,
+                "instructions": universal_prompt
+            },
+            file_content,
+            api_key,
+            uses_default_key=api_key == DEFAULT_OPENAI_API_KEY
         )
         
-        if assistant_id:
-            # Log to database
-            db.log_assistant_creation(
-                assistant_id, name, theme, user_id, original_filename, file_type
-            )
-            
-            return {"message": f"Assistant '{name}' created successfully", "assistant_id": assistant_id}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to create assistant")
-            
+        return {"message": f"Assistant '{name}' creation queued", "job_id": job_id, "status": "queued"}
+    
+    except JobQueueFull:
+        raise HTTPException(status_code=429, detail="Too many assistant creations in progress, retry later")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating assistant: {str(e)}")
 
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, user_id: int = Depends(verify_token)):
+    """Status of a background job with per-stage progress and timing."""
+    job = job_manager.get(job_id)
+    if not job or job['user_id'] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "id": job['id'],
+        "kind": job['kind'],
+        "status": job['status'],
+        "current_stage": job['current_stage'],
+        "progress": job['progress'],
+        "stages": job['stages'],
+        "result": job['result'],
+        "error": job['error'],
+        "created_at": job['created_at'],
+        "updated_at": job['updated_at'],
+        "finished_at": job['finished_at']
+    }
+
 @app.delete("/assistants/{assistant_id}")
 async def delete_assistant(
     assistant_id: str, 
@@ -607,10 +1047,14 @@ async def delete_assistant(
         client = get_openai_client(api_key)
         client.beta.assistants.delete(assistant_id)
         
-        # Remove from threads store
-        thread_key = f"{assistant_id}_{api_key[:10]}"
-        if thread_key in threads_store:
-            del threads_store[thread_key]
+        # Hide it from the local listing right away
+        db.mark_assistant_deleted(assistant_id)
+        answer_cache.invalidate(assistant_id)
+        assistant_sync.invalidate(api_key)
+        dataset_store.delete(assistant_id)
+        
+        # Forget its conversation threads
+        thread_registry.forget(assistant_id)
         
         return {"message": "Assistant deleted successfully"}
     except Exception as e:
@@ -620,6 +1064,8 @@ async def delete_assistant(
 async def get_chat_history(assistant_id: str, user_id: int = Depends(verify_token)):
     """Get chat history for an assistant from the database."""
     try:
+        # Make messages still queued for writing visible to this read
+        message_writer.flush()
         messages = db.get_assistant_messages(assistant_id)
         return [
             ChatMessage(
@@ -640,12 +1086,13 @@ async def clear_chat_history(
 ):
     """Clear chat history for an assistant."""
     try:
+        # Write queued messages first so they do not reappear after the clear
+        message_writer.flush()
         db.clear_assistant_messages(assistant_id)
         
-        # Also clear the thread to start fresh
-        thread_key = f"{assistant_id}_{api_key[:10]}"
-        if thread_key in threads_store:
-            del threads_store[thread_key]
+        # Also clear the threads to start fresh (the history is shared by all users of the assistant)
+        thread_registry.forget(assistant_id)
+        answer_cache.invalidate(assistant_id)
         
         return {"message": "Chat history cleared successfully"}
     except Exception as e:
@@ -658,19 +1105,189 @@ async def send_message(
     user_id: int = Depends(verify_token),
     api_key: str = Depends(get_api_key_from_header)
 ):
+    message = message_with_context(assistant_id, request)
     try:
         start_time = time.time()
-        response, input_tokens, output_tokens = send_message_to_assistant(assistant_id, request.message, api_key)
+        prompt_version = get_prompt_version() if answer_cache.enabled and request.use_cache else None
+        cached = answer_cache.get(assistant_id, message, prompt_version) if prompt_version else None
+        
+        if cached is not None:
+            # Replayed answer: logged like any other, without tokens or cost
+            response_time = int((time.time() - start_time) * 1000)
+            message_writer.submit(assistant_id, "user", request.message, input_tokens=len(request.message.split()))
+            message_writer.submit(assistant_id, "assistant", cached, response_time, ttfb_ms=response_time)
+            return MessageResponse(response=cached, cached=True)
+        
+        response, input_tokens, output_tokens, turn = await send_message_to_assistant(assistant_id, user_id, message, api_key)
         response_time = int((time.time() - start_time) * 1000)
         
-        # Log to database with token usage
-        db.log_message(assistant_id, "user", request.message, input_tokens=len(request.message.split()))
-        db.log_message(assistant_id, "assistant", response, response_time, input_tokens, output_tokens)
+        # Queue both messages for the background writer (logged with token usage)
+        message_writer.submit(assistant_id, "user", request.message, input_tokens=len(request.message.split()))
+        # Without streaming, the first byte reaches the client with the full answer
+        message_writer.submit(assistant_id, "assistant", response, response_time, input_tokens, output_tokens,
+                              ttfb_ms=response_time, **turn)
+        if prompt_version:
+            answer_cache.put(assistant_id, message, prompt_version, response,
+                             input_tokens, output_tokens, response_time)
         
         return MessageResponse(response=response)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error sending message: {str(e)}")
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/assistants/{assistant_id}/message/stream")
+async def stream_message(
+    assistant_id: str, 
+    request: MessageRequest, 
+    user_id: int = Depends(verify_token),
+    api_key: str = Depends(get_api_key_from_header)
+):
+    """Relay the assistant answer token by token as server-sent events.
+    
+    Events: ``delta`` ({"content"}) for each text fragment, ``error`` ({"detail"}) if the run
+    fails, and a final ``done`` with token usage, response time, time-to-first-byte and
+    whether the answer came from the answer cache (sent as a single delta).
+    """
+    start_time = time.time()
+    message = message_with_context(assistant_id, request)
+    prompt_version = get_prompt_version() if answer_cache.enabled and request.use_cache else None
+    cached = answer_cache.get(assistant_id, message, prompt_version) if prompt_version else None
+    
+    if cached is not None:
+        async def cached_stream():
+            response_time = int((time.time() - start_time) * 1000)
+            yield sse_event("delta", {"content": cached})
+            message_writer.submit(assistant_id, "user", request.message, input_tokens=len(request.message.split()))
+            message_writer.submit(assistant_id, "assistant", cached, response_time, ttfb_ms=response_time)
+            yield sse_event("done", {
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "response_time_ms": response_time,
+                "ttfb_ms": response_time,
+                "cached": True
+            })
+        
+        return StreamingResponse(
+            cached_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    try:
+        client = get_async_openai_client(api_key)
+        thread_id = await get_or_create_thread(assistant_id, user_id, api_key)
+        with openai_request_duration.time(operation="create_message"):
+            await client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=message
+            )
+        run_options, turn = context_manager.run_options(assistant_id, thread_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error sending message: {str(e)}")
+    
+    async def event_stream():
+        parts = []
+        input_tokens = 0
+        output_tokens = 0
+        ttfb_ms = None
+        completed = False
+        status = "failed"
+        run_start = time.perf_counter()
+        try:
+            stream = await client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+                stream=True,
+                **run_options
+            )
+            async for event in stream:
+                if event.event == 'thread.message.delta':
+                    for block in event.data.delta.content or []:
+                        if block.type == 'text' and block.text and block.text.value:
+                            if ttfb_ms is None:
+                                ttfb_ms = int((time.time() - start_time) * 1000)
+                            parts.append(block.text.value)
+                            yield sse_event("delta", {"content": block.text.value})
+                elif event.event == 'thread.run.completed':
+                    completed = True
+                    status = event.data.status
+                    if event.data.usage:
+                        input_tokens = event.data.usage.prompt_tokens or 0
+                        output_tokens = event.data.usage.completion_tokens or 0
+                elif event.event in ('thread.run.failed', 'thread.run.cancelled', 'thread.run.expired'):
+                    status = event.data.status
+                    yield sse_event("error", {"detail": f"Assistant run failed with status: {event.data.status}"})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error sending message: {str(e)}"})
+        assistant_run_duration.observe(time.perf_counter() - run_start, mode="streaming", status=status)
+        
+        response_time = int((time.time() - start_time) * 1000)
+        response = "".join(parts)
+        if completed and response:
+            context_manager.complete_turn(assistant_id, thread_id, client)
+            # Same logging as the non-streaming endpoint, plus time-to-first-byte
+            message_writer.submit(assistant_id, "user", request.message, input_tokens=len(request.message.split()))
+            message_writer.submit(assistant_id, "assistant", response, response_time, input_tokens, output_tokens,
+                                  ttfb_ms=ttfb_ms, **turn)
+            if prompt_version:
+                answer_cache.put(assistant_id, message, prompt_version, response,
+                                 input_tokens, output_tokens, response_time)
+        yield sse_event("done", {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "response_time_ms": response_time,
+            "ttfb_ms": ttfb_ms,
+            "cached": False
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/assistants/{assistant_id}/context")
+async def get_context_settings(assistant_id: str, user_id: int = Depends(verify_token)):
+    """Conversation context settings in effect for an assistant."""
+    if db.get_context_settings(assistant_id) is None:
+        raise HTTPException(status_code=404, detail="Assistant not found")
+    return {**context_manager.settings(assistant_id), "strategies": list(CONTEXT_STRATEGIES)}
+
+@app.put("/assistants/{assistant_id}/context")
+async def update_context_settings(
+    assistant_id: str,
+    request: ContextSettingsRequest,
+    user_id: int = Depends(verify_token)
+):
+    """Set how much history the assistant's runs send: ``full``, ``auto`` or the ``last_messages``
+    most recent messages, optionally with a rolling summary of older turns."""
+    try:
+        updated = context_manager.update(assistant_id, request.strategy, request.last_messages, request.summary)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="Assistant not found")
+    return {**context_manager.settings(assistant_id), "strategies": list(CONTEXT_STRATEGIES)}
+
+@app.get("/assistants/{assistant_id}/dataset")
+async def get_dataset(assistant_id: str, user_id: int = Depends(verify_token)):
+    """Groups, segments and metrics available to local queries."""
+    dataset = dataset_store.get(assistant_id)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail="No queryable dataset for this assistant")
+    return dataset.describe()
+
+@app.post("/assistants/{assistant_id}/query")
+async def query_dataset(assistant_id: str, query: DatasetQueryRequest, user_id: int = Depends(verify_token)):
+    """Answer a numeric question (filter, top or compare) from the local dataset, without OpenAI."""
+    return run_dataset_query(assistant_id, query)
+
 @app.get("/dashboard/stats")
 async def get_dashboard_stats(user_id: int = Depends(verify_token)):
     try:
@@ -688,31 +1305,55 @@ async def get_analytics_data(user_id: int = Depends(verify_admin_role)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching analytics data: {str(e)}")
 
+@app.get("/admin/stats")
+async def get_admin_stats(user_id: int = Depends(verify_admin_role)):
+    """Get internal cache statistics. Admin only."""
+    return {
+        "conversion_cache": conversion_cache.stats(),
+        "message_writer": message_writer.stats(),
+        "jobs": job_manager.stats(),
+        "http_transport": http_transport.stats(),
+        "indexing": indexing_tracker.stats(),
+        "threads": thread_registry.stats(),
+        "openai_clients": openai_clients.stats(),
+        "assistant_sync": assistant_sync.stats(),
+        "answer_cache": answer_cache.stats(),
+        "context": context_manager.stats(),
+        "datasets": dataset_store.stats(),
+        "auth": authenticator.stats()
+    }
+
+@app.put("/admin/users/{target_user_id}/role", response_model=UserResponse)
+async def update_user_role(target_user_id: int, request: UserRoleRequest, user_id: int = Depends(verify_admin_role)):
+    """Change the role of a user. Admin only; a promoted user gets admin access at their next login."""
+    if target_user_id == user_id and request.role != 'admin':
+        raise HTTPException(status_code=400, detail="You cannot remove your own admin role")
+    try:
+        updated = authenticator.set_role(target_user_id, request.role)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return UserResponse(**db.get_user(target_user_id))
+
+@app.get("/metrics")
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    """Metrics of this process in the Prometheus text format (bearer METRICS_TOKEN when set)."""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
 @app.get("/settings/universal-prompt", response_model=UniversalPromptResponse)
 async def get_universal_prompt_setting(user_id: int = Depends(verify_admin_role)):
     """Get current universal prompt. Admin only."""
     try:
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        
-        # Create table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS universal_prompt (
-                id INTEGER PRIMARY KEY,
-                prompt_content TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_by INTEGER
-            )
-        ''')
-        
-        cursor.execute('SELECT prompt_content, updated_at FROM universal_prompt WHERE id = 1')
-        result = cursor.fetchone()
-        conn.close()
+        result = db.get_universal_prompt()
         
         if result:
             return UniversalPromptResponse(
-                prompt_content=result[0],
-                updated_at=result[1]
+                prompt_content=result['prompt_content'],
+                updated_at=result['updated_at']
             )
         else:
             # Return default prompt if none stored
@@ -728,28 +1369,9 @@ async def get_universal_prompt_setting(user_id: int = Depends(verify_admin_role)
 async def update_universal_prompt(request: UniversalPromptRequest, user_id: int = Depends(verify_admin_role)):
     """Update universal prompt. Admin only."""
     try:
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        
-        # Create table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS universal_prompt (
-                id INTEGER PRIMARY KEY,
-                prompt_content TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_by INTEGER
-            )
-        ''')
-        
         # Insert or update the prompt
-        current_time = datetime.datetime.now().isoformat()
-        cursor.execute('''
-            INSERT OR REPLACE INTO universal_prompt (id, prompt_content, updated_at, updated_by)
-            VALUES (1, ?, ?, ?)
-        ''', (request.prompt_content, current_time, user_id))
-        
-        conn.commit()
-        conn.close()
+        current_time = db.set_universal_prompt(request.prompt_content, user_id)
+        answer_cache.invalidate()
         
         return UniversalPromptResponse(
             prompt_content=request.prompt_content,
@@ -762,14 +1384,9 @@ async def update_universal_prompt(request: UniversalPromptRequest, user_id: int
 async def reset_universal_prompt(user_id: int = Depends(verify_admin_role)):
     """Reset universal prompt to default. Admin only."""
     try:
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        
         # Delete the custom prompt to fall back to default
-        cursor.execute('DELETE FROM universal_prompt WHERE id = 1')
-        
-        conn.commit()
-        conn.close()
+        db.reset_universal_prompt()
+        answer_cache.invalidate()
         
         return {"message": "Universal prompt reset to default successfully"}
     except Exception as e:
@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from database import DatabaseManager
+
+
+class _FlushMarker:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class MessageLogWriter:
+    """Write-behind queue for chat message logging.
+
+    Request handlers ``submit`` log events and return immediately; a background
+    thread coalesces them into one SQLite transaction per batch, flushing when
+    ``max_batch`` events are pending or ``max_delay`` seconds after the first one.
+    """
+
+    def __init__(self, db: DatabaseManager, max_batch: int = 200, max_delay: float = 0.25):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.events_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background writer thread."""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="message-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Write every pending event, then stop the writer thread."""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, assistant_openai_id: str, role: str, content: str, response_time_ms: int = None,
+               input_tokens: int = 0, output_tokens: int = 0, ttfb_ms: int = None,
+               context_strategy: str = None, context_turn: int = None):
+        """Queue a message log event (written synchronously if the writer is not running)."""
+        event = {
+            'assistant_openai_id': assistant_openai_id,
+            'role': role,
+            'content': content,
+            'response_time_ms': response_time_ms,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'ttfb_ms': ttfb_ms,
+            'context_strategy': context_strategy,
+            'context_turn': context_turn
+        }
+        if self.running:
+            self._queue.put(event)
+        else:
+            self._write([event])
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every event submitted so far is committed."""
+        if not self.running or self._queue.unfinished_tasks == 0:
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def _write(self, events: List[Dict[str, Any]]):
+        failed = 0
+        try:
+            self.db.log_messages(events)
+        except Exception as e:
+            # Retry one by one so a single bad event does not drop the whole batch
+            print(f"⚠️ Batched message logging failed ({e}), retrying individually")
+            for event in events:
+                try:
+                    self.db.log_messages([event])
+                except Exception as event_error:
+                    failed += 1
+                    print(f"❌ Could not log message for {event['assistant_openai_id']}: {event_error}")
+        with self._lock:
+            self.events_written += len(events) - failed
+            self.write_errors += failed
+            self.batches_written += 1
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            items = [item]
+            deadline = time.monotonic() + self.max_delay
+            # Coalesce until the batch is full, the delay has passed, or a flush/stop is requested
+            while isinstance(items[-1], dict) and len(items) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            events = [i for i in items if isinstance(i, dict)]
+            if events:
+                self._write(events)
+            for i in items:
+                if isinstance(i, _FlushMarker):
+                    i.done.set()
+                elif i is _STOP:
+                    stop = True
+                self._queue.task_done()
+
+        # Drain anything submitted concurrently with the stop request
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        events = [i for i in leftovers if isinstance(i, dict)]
+        if events:
+            self._write(events)
+        for i in leftovers:
+            if isinstance(i, _FlushMarker):
+                i.done.set()
+            self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'running': self.running,
+                'pending': self.pending(),
+                'events_written': self.events_written,
+                'batches_written': self.batches_written,
+                'write_errors': self.write_errors
+            }
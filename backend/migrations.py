@@ -0,0 +1,409 @@
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+# Conversation turn buckets of the context analytics: (first turn, label)
+CONTEXT_TURN_BUCKETS = ((1, '1-5'), (6, '6-10'), (11, '11-20'), (21, '21+'))
+
+# A migration step is either a list of SQL statements or a callable taking the connection.
+Step = Union[List[str], Callable[[sqlite3.Connection], None]]
+
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: List[Tuple[str, str]]):
+    """Add columns that databases created by older versions do not have yet."""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+def _baseline(conn: sqlite3.Connection):
+    """Schema as it existed before versioned migrations (idempotent on older databases)."""
+    # Users table for authentication
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+    ''')
+
+    # Assistants table for tracking created assistants
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS assistants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            openai_id TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            theme TEXT NOT NULL,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used TIMESTAMP,
+            message_count INTEGER DEFAULT 0,
+            file_name TEXT,
+            file_type TEXT,
+            total_tokens INTEGER DEFAULT 0,
+            total_cost_euros REAL DEFAULT 0.0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Messages table for tracking conversations with token usage
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assistant_id INTEGER,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            response_time_ms INTEGER,
+            input_tokens INTEGER DEFAULT 0,
+            output_tokens INTEGER DEFAULT 0,
+            total_tokens INTEGER DEFAULT 0,
+            cost_euros REAL DEFAULT 0.0,
+            FOREIGN KEY (assistant_id) REFERENCES assistants (id)
+        )
+    ''')
+
+    # Activity log table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Universal prompt table (single row, id = 1)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS universal_prompt (
+            id INTEGER PRIMARY KEY,
+            prompt_content TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_by INTEGER
+        )
+    ''')
+
+    # Columns added after the first release
+    _add_missing_columns(conn, 'assistants', [
+        ('total_tokens', 'INTEGER DEFAULT 0'),
+        ('total_cost_euros', 'REAL DEFAULT 0.0'),
+    ])
+    _add_missing_columns(conn, 'messages', [
+        ('input_tokens', 'INTEGER DEFAULT 0'),
+        ('output_tokens', 'INTEGER DEFAULT 0'),
+        ('total_tokens', 'INTEGER DEFAULT 0'),
+        ('cost_euros', 'REAL DEFAULT 0.0'),
+    ])
+    _add_missing_columns(conn, 'users', [
+        ('role', 'TEXT DEFAULT "user"'),
+    ])
+
+
+def _usage_daily(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS usage_daily (
+            user_id INTEGER,
+            assistant_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            total_tokens INTEGER NOT NULL DEFAULT 0,
+            cost_euros REAL NOT NULL DEFAULT 0.0,
+            response_time_sum_ms INTEGER NOT NULL DEFAULT 0,
+            response_time_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (assistant_id, day),
+            FOREIGN KEY (assistant_id) REFERENCES assistants (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_usage_daily_user_day ON usage_daily (user_id, day)')
+    conn.execute('''
+        INSERT INTO usage_daily (user_id, assistant_id, day, message_count, total_tokens, cost_euros,
+                                 response_time_sum_ms, response_time_count)
+        SELECT a.user_id, m.assistant_id, DATE(m.created_at), COUNT(*),
+               COALESCE(SUM(m.total_tokens), 0), COALESCE(SUM(m.cost_euros), 0.0),
+               COALESCE(SUM(m.response_time_ms), 0), COUNT(m.response_time_ms)
+        FROM messages m
+        JOIN assistants a ON m.assistant_id = a.id
+        GROUP BY m.assistant_id, DATE(m.created_at)
+    ''')
+
+
+def _time_to_first_byte(conn: sqlite3.Connection):
+    _add_missing_columns(conn, 'messages', [
+        ('ttfb_ms', 'INTEGER'),
+    ])
+    _add_missing_columns(conn, 'usage_daily', [
+        ('ttfb_sum_ms', 'INTEGER NOT NULL DEFAULT 0'),
+        ('ttfb_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ])
+
+
+def _jobs(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            user_id INTEGER,
+            status TEXT NOT NULL,
+            current_stage TEXT,
+            stages TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            uses_default_key INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at)')
+
+
+def _indexing_status(conn: sqlite3.Connection):
+    # Assistants created before this migration were only logged once their upload had been waited on
+    _add_missing_columns(conn, 'assistants', [
+        ('vector_store_id', 'TEXT'),
+        ('indexing_status', "TEXT DEFAULT 'completed'"),
+    ])
+
+
+def _threads(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS threads (
+            assistant_id TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            api_key_hash TEXT NOT NULL,
+            thread_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (assistant_id, user_id, api_key_hash),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_threads_last_used ON threads (last_used_at)')
+
+
+def _assistant_listing(conn: sqlite3.Connection):
+    # Existing rows keep a NULL key hash until a reconciliation finds them under a key
+    _add_missing_columns(conn, 'assistants', [
+        ('api_key_hash', 'TEXT'),
+        ('deleted_at', 'TIMESTAMP'),
+    ])
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_assistants_key_created ON assistants (api_key_hash, created_at)')
+
+
+def _answer_cache(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS answer_cache (
+            cache_key TEXT PRIMARY KEY,
+            assistant_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            input_tokens INTEGER DEFAULT 0,
+            output_tokens INTEGER DEFAULT 0,
+            cost_euros REAL DEFAULT 0.0,
+            response_time_ms INTEGER,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_answer_cache_assistant ON answer_cache (assistant_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_answer_cache_last_hit ON answer_cache (last_hit_at)')
+
+
+def _dataset_path(conn: sqlite3.Connection):
+    # Local copy of the converted TGI data, NULL for non-TGI files and older assistants
+    _add_missing_columns(conn, 'assistants', [('dataset_path', 'TEXT')])
+
+
+def _ingestion_mode(conn: sqlite3.Connection):
+    _add_missing_columns(conn, 'assistants', [('ingestion_mode', "TEXT DEFAULT 'single'")])
+
+
+def _context_management(conn: sqlite3.Connection):
+    # Per-assistant context settings, NULL falls back to the server defaults
+    _add_missing_columns(conn, 'assistants', [
+        ('context_strategy', 'TEXT'),
+        ('context_last_messages', 'INTEGER'),
+        ('context_summary', 'INTEGER'),
+    ])
+    # Completed turns of each thread and the rolling summary of the turns left out of its window
+    _add_missing_columns(conn, 'threads', [
+        ('turns', 'INTEGER NOT NULL DEFAULT 0'),
+        ('summary', 'TEXT'),
+        ('summary_until', 'TEXT'),
+        ('summarized_turns', 'INTEGER NOT NULL DEFAULT 0'),
+        ('summary_input_tokens', 'INTEGER NOT NULL DEFAULT 0'),
+        ('summary_output_tokens', 'INTEGER NOT NULL DEFAULT 0'),
+    ])
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_threads_thread_id ON threads (thread_id)')
+    # Strategy and position in the conversation of each answer, for the per-turn analytics
+    _add_missing_columns(conn, 'messages', [
+        ('context_strategy', 'TEXT'),
+        ('context_turn', 'INTEGER'),
+    ])
+
+
+def _job_ownership(conn: sqlite3.Connection):
+    # Worker process running each job and its last heartbeat (epoch seconds), so that several
+    # workers sharing the database only take over the jobs of a worker that stopped beating
+    _add_missing_columns(conn, 'jobs', [
+        ('owner', 'TEXT'),
+        ('heartbeat_at', 'REAL'),
+    ])
+
+
+def _usage_daily_answers(conn: sqlite3.Connection):
+    # Answers billed by OpenAI (assistant messages with input tokens; cached replays have none),
+    # so the per-ingestion-mode analytics read the rollup instead of scanning messages
+    _add_missing_columns(conn, 'usage_daily', [
+        ('answer_count', 'INTEGER NOT NULL DEFAULT 0'),
+        ('answer_input_tokens', 'INTEGER NOT NULL DEFAULT 0'),
+        ('answer_cost_euros', 'REAL NOT NULL DEFAULT 0.0'),
+    ])
+    _rebuild_daily(conn)
+
+
+def _usage_context(conn: sqlite3.Connection):
+    # Billed answers per context strategy and position in the conversation, so the per-turn
+    # analytics read a rollup instead of scanning messages
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS usage_context (
+            user_id INTEGER,
+            assistant_id INTEGER NOT NULL,
+            context_strategy TEXT NOT NULL,
+            turn_bucket INTEGER NOT NULL,
+            answer_count INTEGER NOT NULL DEFAULT 0,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            response_time_sum_ms INTEGER NOT NULL DEFAULT 0,
+            response_time_count INTEGER NOT NULL DEFAULT 0,
+            cost_euros REAL NOT NULL DEFAULT 0.0,
+            PRIMARY KEY (assistant_id, context_strategy, turn_bucket),
+            FOREIGN KEY (assistant_id) REFERENCES assistants (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_usage_context_user ON usage_context (user_id)')
+    _rebuild_context(conn)
+
+
+def _thread_messages(conn: sqlite3.Connection):
+    # Messages of each thread and those covered by its summary: a failed run leaves a question
+    # without answer, so turns alone do not give the size of the context window
+    _add_missing_columns(conn, 'threads', [
+        ('messages', 'INTEGER NOT NULL DEFAULT 0'),
+        ('summarized_messages', 'INTEGER NOT NULL DEFAULT 0'),
+    ])
+    conn.execute('UPDATE threads SET messages = 2 * turns, summarized_messages = 2 * summarized_turns')
+
+
+def turn_bucket(turn: int) -> int:
+    """First turn of the CONTEXT_TURN_BUCKETS bucket holding ``turn``."""
+    return next((low for low, _ in reversed(CONTEXT_TURN_BUCKETS) if turn >= low), CONTEXT_TURN_BUCKETS[0][0])
+
+
+def _rebuild_context(conn: sqlite3.Connection):
+    bucket = " ".join(f"WHEN m.context_turn >= {low} THEN {low}" for low, _ in reversed(CONTEXT_TURN_BUCKETS[1:]))
+    conn.execute('DELETE FROM usage_context')
+    conn.execute(f'''
+        INSERT INTO usage_context (user_id, assistant_id, context_strategy, turn_bucket, answer_count, input_tokens,
+                                   response_time_sum_ms, response_time_count, cost_euros)
+        SELECT a.user_id, m.assistant_id, m.context_strategy,
+               CASE {bucket} ELSE {CONTEXT_TURN_BUCKETS[0][0]} END, COUNT(*), SUM(m.input_tokens),
+               COALESCE(SUM(m.response_time_ms), 0), COUNT(m.response_time_ms), COALESCE(SUM(m.cost_euros), 0.0)
+        FROM messages m
+        JOIN assistants a ON m.assistant_id = a.id
+        WHERE m.role = 'assistant' AND m.input_tokens > 0
+          AND m.context_strategy IS NOT NULL AND m.context_turn IS NOT NULL
+        GROUP BY 2, 3, 4
+    ''')
+
+
+def _rebuild_daily(conn: sqlite3.Connection):
+    conn.execute('DELETE FROM usage_daily')
+    conn.execute('''
+        INSERT INTO usage_daily (user_id, assistant_id, day, message_count, total_tokens, cost_euros,
+                                 response_time_sum_ms, response_time_count, ttfb_sum_ms, ttfb_count,
+                                 answer_count, answer_input_tokens, answer_cost_euros)
+        SELECT a.user_id, m.assistant_id, DATE(m.created_at), COUNT(*),
+               COALESCE(SUM(m.total_tokens), 0), COALESCE(SUM(m.cost_euros), 0.0),
+               COALESCE(SUM(m.response_time_ms), 0), COUNT(m.response_time_ms),
+               COALESCE(SUM(m.ttfb_ms), 0), COUNT(m.ttfb_ms),
+               SUM(m.role = 'assistant' AND m.input_tokens > 0),
+               COALESCE(SUM(CASE WHEN m.role = 'assistant' AND m.input_tokens > 0 THEN m.input_tokens END), 0),
+               COALESCE(SUM(CASE WHEN m.role = 'assistant' AND m.input_tokens > 0 THEN m.cost_euros END), 0.0)
+        FROM messages m
+        JOIN assistants a ON m.assistant_id = a.id
+        GROUP BY m.assistant_id, DATE(m.created_at)
+    ''')
+
+
+def rebuild_usage_daily(conn: sqlite3.Connection):
+    """Recompute the usage rollups (per day, and per context strategy and turn) from the messages table."""
+    _rebuild_daily(conn)
+    _rebuild_context(conn)
+
+
+# Ordered list of (version, description, step). Never edit an applied migration: append a new one.
+MIGRATIONS: List[Tuple[int, str, Step]] = [
+    (1, 'baseline schema', _baseline),
+    (2, 'indexes for message, assistant and activity access paths', [
+        # History (ORDER BY created_at) and per-user aggregates; covers the SUM/AVG columns
+        '''CREATE INDEX IF NOT EXISTS idx_messages_assistant_created
+           ON messages (assistant_id, created_at, response_time_ms, total_tokens, cost_euros)''',
+        'CREATE INDEX IF NOT EXISTS idx_assistants_user_created ON assistants (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_activity_log_user_created ON activity_log (user_id, created_at)',
+    ]),
+    (3, 'daily usage rollup per user and assistant', _usage_daily),
+    (4, 'time-to-first-byte of streamed answers', _time_to_first_byte),
+    (5, 'background jobs for assistant creation', _jobs),
+    (6, 'vector store indexing state of assistants', _indexing_status),
+    (7, 'conversation thread registry', _threads),
+    (8, 'local assistant listing scoped by API key', _assistant_listing),
+    (9, 'answer cache for repeated questions', _answer_cache),
+    (10, 'local dataset file of assistants', _dataset_path),
+    (11, 'file_search ingestion mode of assistants', _ingestion_mode),
+    (12, 'conversation context strategy and rolling summaries', _context_management),
+    (13, 'worker ownership and heartbeat of background jobs', _job_ownership),
+    (14, 'billed answers in the daily usage rollup', _usage_daily_answers),
+    (15, 'usage rollup per context strategy and conversation turn', _usage_context),
+    (16, 'message counts of conversation threads', _thread_messages),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply pending migrations in order, each in its own transaction; return the versions applied."""
+    applied = []
+    for version, _description, step in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        # BEGIN IMMEDIATE takes the writer lock, so concurrent workers apply each migration once
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= current_version(conn):
+                conn.execute('ROLLBACK')
+                continue
+            if callable(step):
+                step(conn)
+            else:
+                for statement in step:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        applied.append(version)
+    if applied:
+        conn.execute('PRAGMA optimize')
+    return applied
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+Client = Union[OpenAI, AsyncOpenAI]
+
+
+class OpenAIClientManager:
+    """Bounded cache of OpenAI SDK clients, one sync and one async client per API key.
+
+    Clients unused for ``idle_seconds`` or beyond ``max_clients`` (least recently used first)
+    are evicted. With ``shared_transport`` every client sends its requests through the same
+    pair of httpx clients, so the number of open sockets is capped by ``max_connections``
+    whatever the number of keys; evicting a client then only drops the reference, since the
+    shared pool must stay open. Without it, each client owns a pool that is closed on eviction.
+    """
+
+    def __init__(self, max_clients: int = 64, idle_seconds: float = 900.0, max_connections: int = 100,
+                 max_keepalive: int = 20, timeout: float = 600.0, shared_transport: bool = True):
+        self.max_clients = max_clients
+        self.idle_seconds = idle_seconds
+        self.shared_transport = shared_transport
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._timeout = httpx.Timeout(timeout, connect=5.0)
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._clients: "OrderedDict[Tuple[str, str], Tuple[Client, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _transport(self, kind: str) -> Dict[str, Any]:
+        if not self.shared_transport:
+            return {}
+        if kind == "sync":
+            if self._http_client is None:
+                self._http_client = DefaultHttpxClient(limits=self._limits, timeout=self._timeout)
+            return {"http_client": self._http_client}
+        if self._async_http_client is None:
+            self._async_http_client = DefaultAsyncHttpxClient(limits=self._limits, timeout=self._timeout)
+        return {"http_client": self._async_http_client}
+
+    def _close_client(self, client: Client):
+        if self.shared_transport:
+            return
+        if isinstance(client, OpenAI):
+            client.close()
+            return
+        try:
+            asyncio.get_running_loop().create_task(client.close())
+        except RuntimeError:
+            # No running loop (e.g. at shutdown): the pool is released with the client object
+            pass
+
+    def _evict(self, now: float):
+        """Drop clients idle for too long, then the least recently used ones above the bound."""
+        evicted = []
+        while self._clients:
+            key, (client, last_used) = next(iter(self._clients.items()))
+            if now - last_used < self.idle_seconds and len(self._clients) <= self.max_clients:
+                break
+            del self._clients[key]
+            evicted.append(client)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _get(self, kind: str, api_key: str) -> Client:
+        key = (kind, api_key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry:
+                self.hits += 1
+                client = entry[0]
+            else:
+                self.misses += 1
+                cls = OpenAI if kind == "sync" else AsyncOpenAI
+                client = cls(api_key=api_key, **self._transport(kind))
+            self._clients[key] = (client, now)
+            self._clients.move_to_end(key)
+            evicted = self._evict(now)
+        for old in evicted:
+            self._close_client(old)
+        return client
+
+    def get(self, api_key: str) -> OpenAI:
+        """Sync client for an API key."""
+        return self._get("sync", api_key)
+
+    def get_async(self, api_key: str) -> AsyncOpenAI:
+        """Async client for an API key."""
+        return self._get("async", api_key)
+
+    async def aclose(self):
+        """Close every client and the shared transport."""
+        with self._lock:
+            clients = [client for client, _ in self._clients.values()]
+            self._clients.clear()
+        for client in clients:
+            self._close_client(client)
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+        if self._async_http_client is not None:
+            await self._async_http_client.aclose()
+            self._async_http_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'clients': len(self._clients),
+                'api_keys': len({key for _, key in self._clients}),
+                'max_clients': self.max_clients,
+                'idle_seconds': self.idle_seconds,
+                'shared_transport': self.shared_transport,
+                'max_connections': self._limits.max_connections,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,89 @@
+import re
+import unicodedata
+from typing import List, Tuple
+
+import numpy as np
+
+from conversion import GROUP_MARKER, METRIC_LABELS, TOTAL_LABEL
+from tgi_query import TGIDataset
+
+# single: the converted JSONL as one file; groups: one document per interview group;
+# segments: one document per segment family
+INGESTION_MODES = ("single", "groups", "segments")
+# Most files a vector store file batch accepts
+MAX_DOCUMENTS = 500
+# Column order of the document lines, given once in the assistant instructions rather than in
+# every document (a legend in each header would make every header chunk match metric names)
+DOCUMENT_COLUMNS = " | ".join(["Groupe_interviewé", "Segment"] + METRIC_LABELS)
+
+
+def _strip_group_prefix(group: str) -> str:
+    """'Interviewé: Sexe: Femmes' and 'Total interviewé : Sexe: Femmes' -> 'Sexe: Femmes'."""
+    for prefix in (GROUP_MARKER, TOTAL_LABEL):
+        if group.startswith(prefix) and group != TOTAL_LABEL:
+            return group[len(prefix):].lstrip(" :")
+    return group
+
+
+def group_family(group: str) -> str:
+    """Family of an interview group, its first label: 'Interviewé: Sexe: Femmes' -> 'Sexe'."""
+    return _strip_group_prefix(group).partition(":")[0].strip()
+
+
+def segment_family(segment: str) -> str:
+    """Family of a segment: the label before its first ':' ('Marque: Peugeot' -> 'Marque')."""
+    return segment.partition(":")[0].strip()
+
+
+def _format_value(value: float) -> str:
+    if np.isnan(value):
+        return ""
+    return str(int(value)) if value.is_integer() else format(value, ".10g")
+
+
+def _slug(text: str) -> str:
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.sub(r"[^A-Za-z0-9]+", "_", ascii_text).strip("_")[:40] or "document"
+
+
+def partition_documents(dataset: TGIDataset, mode: str, base_name: str) -> List[Tuple[str, bytes]]:
+    """Split a TGI dataset into Markdown documents, one per interview group or segment family.
+
+    An interview group document also holds the group's "Total" column. Beyond MAX_DOCUMENTS
+    interview groups, groups sharing their first label ('Sexe: ...') share a document.
+
+    Each document starts with a header naming its family, then holds one compact line per row
+    (DOCUMENT_COLUMNS, no repeated JSON keys) that still names its group, so file_search chunks
+    only carry rows of a single family and each chunk can be matched on its own.
+    Returns (filename, content) pairs; raises ValueError above MAX_DOCUMENTS documents.
+    """
+    if mode == "groups":
+        names_by_group = [_strip_group_prefix(str(g)) for g in dataset.groups]
+        if len(set(names_by_group)) > MAX_DOCUMENTS:
+            names_by_group = [group_family(str(g)) for g in dataset.groups]
+        family_of_row = np.array(names_by_group, dtype=object)[dataset.group_codes]
+        title = "Groupe interviewé"
+    elif mode == "segments":
+        family_of_row = np.array([segment_family(str(s)) for s in dataset.segments], dtype=object)[dataset.segment_codes]
+        title = "Segment"
+    else:
+        raise ValueError(f"Unknown ingestion mode '{mode}', expected groups or segments")
+
+    names, family_codes = np.unique(family_of_row.astype(str), return_inverse=True)
+    if len(names) > MAX_DOCUMENTS:
+        raise ValueError(f"{len(names)} {title.lower()} families, more than the {MAX_DOCUMENTS} documents of a batch")
+
+    # Rows of each family in their original order
+    order = np.argsort(family_codes, kind="stable")
+    bounds = np.searchsorted(family_codes[order], np.arange(len(names) + 1))
+    metrics = [dataset.metrics[label] for label in METRIC_LABELS]
+    documents = []
+    for code, name in enumerate(names):
+        rows = order[bounds[code]:bounds[code + 1]]
+        lines = [f"# {title} : {name}", ""]
+        for row in rows:
+            group = _strip_group_prefix(str(dataset.groups[dataset.group_codes[row]]))
+            segment = str(dataset.segments[dataset.segment_codes[row]])
+            lines.append(" | ".join([group, segment] + [_format_value(values[row]) for values in metrics]))
+        documents.append((f"{base_name}_{code + 1:03d}_{_slug(name)}.md", "\n".join(lines).encode("utf-8")))
+    return documents
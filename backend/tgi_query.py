@@ -0,0 +1,394 @@
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # Without pyarrow, datasets are stored as .npz files
+    pa = None
+
+from conversion import METRIC_LABELS, TOTAL_LABEL
+from database import DatabaseManager
+
+GROUP_COLUMN = "Groupe_interviewé"
+SEGMENT_COLUMN = "Segment"
+TOTAL_SEGMENT = "Total"
+ARROW_COMPRESSIONS = ("none", "lz4", "zstd")
+# Most rows a query returns
+MAX_LIMIT = 1000
+
+
+class _Index:
+    """Row positions per category code, sorted by code (CSR layout: one slice per code)."""
+
+    def __init__(self, codes: np.ndarray, n_categories: int):
+        self.order = np.argsort(codes, kind="stable").astype(np.int32)
+        self.starts = np.searchsorted(codes[self.order], np.arange(n_categories + 1))
+
+    def rows(self, code_list: List[int]) -> np.ndarray:
+        if len(code_list) == 1:
+            return self.order[self.starts[code_list[0]]:self.starts[code_list[0] + 1]]
+        return np.sort(np.concatenate([self.order[self.starts[c]:self.starts[c + 1]] for c in code_list]))
+
+
+class TGIDataset:
+    """Columnar, in-memory copy of a converted TGI table, indexed on group and segment.
+
+    Groups and segments are stored once as categories with an integer code per row, the
+    five metrics as float arrays (NaN for empty cells). Filters on a group or segment read
+    only the rows of that group or segment through the indexes.
+    """
+
+    def __init__(self, groups: np.ndarray, segments: np.ndarray, group_codes: np.ndarray,
+                 segment_codes: np.ndarray, metrics: Dict[str, np.ndarray]):
+        self.groups = groups
+        self.segments = segments
+        self.group_codes = group_codes
+        self.segment_codes = segment_codes
+        self.metrics = metrics
+
+    # Lookup structures are built on first use, so loading a saved dataset only maps its columns
+
+    @cached_property
+    def _group_index(self) -> _Index:
+        return _Index(self.group_codes, len(self.groups))
+
+    @cached_property
+    def _segment_index(self) -> _Index:
+        return _Index(self.segment_codes, len(self.segments))
+
+    @cached_property
+    def _group_keys(self) -> List[str]:
+        return [str(g).casefold() for g in self.groups]
+
+    @cached_property
+    def _segment_keys(self) -> List[str]:
+        return [str(s).casefold() for s in self.segments]
+
+    @cached_property
+    def _total_groups(self) -> np.ndarray:
+        return np.char.startswith(self.groups, TOTAL_LABEL)
+
+    @cached_property
+    def _total_segment(self) -> np.ndarray:
+        return self.segments == TOTAL_SEGMENT
+
+    def __len__(self) -> int:
+        return len(self.group_codes)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TGIDataset":
+        """Build from the long format produced by the converter."""
+        missing = {GROUP_COLUMN, SEGMENT_COLUMN, *METRIC_LABELS} - set(df.columns)
+        if missing:
+            raise ValueError(f"Not a converted TGI table, missing columns: {', '.join(sorted(missing))}")
+        group_codes, groups = pd.factorize(df[GROUP_COLUMN].astype(str))
+        segment_codes, segments = pd.factorize(df[SEGMENT_COLUMN].astype(str))
+        metrics = {
+            label: pd.to_numeric(df[label], errors="coerce").to_numpy(dtype=np.float64)
+            for label in METRIC_LABELS
+        }
+        return cls(np.asarray(groups, dtype=str), np.asarray(segments, dtype=str),
+                   group_codes.astype(np.int32), segment_codes.astype(np.int32), metrics)
+
+    @classmethod
+    def from_jsonl(cls, content: bytes) -> "TGIDataset":
+        """Build from converted JSONL bytes."""
+        return cls.from_frame(pd.read_json(io.BytesIO(content), lines=True, dtype=False))
+
+    def to_arrow(self) -> "pa.Table":
+        """Arrow table with dictionary-encoded group and segment columns (smallest index type)."""
+        def dictionary(codes, categories):
+            index_type = np.int16 if len(categories) <= np.iinfo(np.int16).max else np.int32
+            return pa.DictionaryArray.from_arrays(pa.array(codes.astype(index_type)), pa.array(categories))
+
+        return pa.table({
+            GROUP_COLUMN: dictionary(self.group_codes, self.groups),
+            SEGMENT_COLUMN: dictionary(self.segment_codes, self.segments),
+            # Empty cells stay NaN (no validity bitmap), so the columns map straight to NumPy
+            **{label: pa.array(self.metrics[label]) for label in METRIC_LABELS}
+        })
+
+    @classmethod
+    def from_arrow(cls, table: "pa.Table") -> "TGIDataset":
+        groups = table.column(GROUP_COLUMN).combine_chunks()
+        segments = table.column(SEGMENT_COLUMN).combine_chunks()
+        return cls(
+            groups.dictionary.to_numpy(zero_copy_only=False).astype(str),
+            segments.dictionary.to_numpy(zero_copy_only=False).astype(str),
+            groups.indices.to_numpy(), segments.indices.to_numpy(),
+            {label: table.column(label).combine_chunks().to_numpy() for label in METRIC_LABELS}
+        )
+
+    def save(self, path: str, compression: str = "none"):
+        """Write the dataset atomically: Arrow IPC file for .arrow paths, NumPy archive for .npz."""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if path.endswith(".arrow"):
+            table = self.to_arrow()
+            options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        else:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, groups=self.groups, segments=self.segments, group_codes=self.group_codes,
+                         segment_codes=self.segment_codes,
+                         **{f"metric_{i}": self.metrics[label] for i, label in enumerate(METRIC_LABELS)})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TGIDataset":
+        """Load a saved dataset; Arrow files are memory-mapped.
+
+        Uncompressed Arrow files (the default) are used in place, without copying the columns;
+        lz4 and zstd ones are decompressed into memory on every load.
+        """
+        if path.endswith(".arrow"):
+            # The mapping stays open as long as the arrays read from it are referenced
+            return cls.from_arrow(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
+        with np.load(path) as data:
+            return cls(data["groups"], data["segments"], data["group_codes"], data["segment_codes"],
+                       {label: data[f"metric_{i}"] for i, label in enumerate(METRIC_LABELS)})
+
+    def _match(self, name: str, keys: List[str]) -> List[int]:
+        """Codes of the categories named exactly ``name``, else of those containing it (case-insensitive)."""
+        wanted = name.strip().casefold()
+        exact = [code for code, key in enumerate(keys) if key == wanted]
+        if exact:
+            return exact
+        matches = [code for code, key in enumerate(keys) if wanted in key]
+        if not matches:
+            raise LookupError(f"No match for '{name}'")
+        return matches
+
+    def _single_segment(self, name: str) -> str:
+        codes = self._match(name, self._segment_keys)
+        if len(codes) > 1:
+            raise LookupError(f"'{name}' matches {len(codes)} segments, be more specific")
+        return str(self.segments[codes[0]])
+
+    def _rows(self, group: Optional[str], segment: Optional[str], include_totals: bool) -> np.ndarray:
+        rows = None
+        if group:
+            rows = self._group_index.rows(self._match(group, self._group_keys))
+        if segment:
+            segment_rows = self._segment_index.rows(self._match(segment, self._segment_keys))
+            rows = segment_rows if rows is None else np.intersect1d(rows, segment_rows, assume_unique=True)
+        if rows is None:
+            rows = np.arange(len(self), dtype=np.int32)
+        if not include_totals:
+            keep = ~(self._total_groups[self.group_codes[rows]] | self._total_segment[self.segment_codes[rows]])
+            rows = rows[keep]
+        return rows
+
+    def _metric(self, metric: str) -> np.ndarray:
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown metric '{metric}', expected one of: {', '.join(METRIC_LABELS)}")
+        return self.metrics[metric]
+
+    def _check_limit(self, limit: int):
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_LIMIT}, got {limit}")
+
+    def _records(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        columns = {label: values[rows] for label, values in self.metrics.items()}
+        groups = self.groups[self.group_codes[rows]]
+        segments = self.segments[self.segment_codes[rows]]
+        return [
+            {
+                GROUP_COLUMN: str(groups[i]),
+                SEGMENT_COLUMN: str(segments[i]),
+                **{label: (None if np.isnan(columns[label][i]) else float(columns[label][i])) for label in columns}
+            }
+            for i in range(len(rows))
+        ]
+
+    def filter(self, group: str = None, segment: str = None, metric: str = "Indice", min_value: float = None,
+               max_value: float = None, sort_by: str = None, descending: bool = True, limit: int = 50,
+               include_totals: bool = False) -> Dict[str, Any]:
+        """Rows of a group and/or segment whose ``metric`` lies in [min_value, max_value], sorted."""
+        self._check_limit(limit)
+        rows = self._rows(group, segment, include_totals)
+        values = self._metric(metric)[rows]
+        if min_value is not None or max_value is not None:
+            keep = ~np.isnan(values)
+            if min_value is not None:
+                keep &= values >= min_value
+            if max_value is not None:
+                keep &= values <= max_value
+            rows = rows[keep]
+        total = len(rows)
+        if sort_by:
+            keys = self._metric(sort_by)[rows]
+            # NaN last in both directions
+            order = np.argsort(np.where(np.isnan(keys), np.inf, -keys if descending else keys), kind="stable")
+            rows = rows[order]
+        return {"count": total, "rows": self._records(rows[:limit])}
+
+    def top(self, metric: str = "Indice", k: int = 10, group: str = None, segment: str = None,
+            ascending: bool = False, include_totals: bool = False) -> Dict[str, Any]:
+        """The ``k`` rows with the highest (or lowest) ``metric``."""
+        self._check_limit(k)
+        rows = self._rows(group, segment, include_totals)
+        values = self._metric(metric)[rows]
+        rows, values = rows[~np.isnan(values)], values[~np.isnan(values)]
+        keys = values if ascending else -values
+        if k < len(rows):
+            # Partial selection, then only the k kept rows are sorted
+            keep = np.argpartition(keys, k)[:k]
+            rows, keys = rows[keep], keys[keep]
+        return {"count": len(values), "rows": self._records(rows[np.argsort(keys, kind="stable")])}
+
+    def compare(self, segment_a: str, segment_b: str, metric: str = "Indice", group: str = None,
+                limit: int = 50) -> Dict[str, Any]:
+        """``metric`` of two segments side by side for each group, largest gaps first."""
+        self._check_limit(limit)
+        values = self._metric(metric)
+        name_a, name_b = self._single_segment(segment_a), self._single_segment(segment_b)
+        rows_a = self._rows(group, name_a, include_totals=True)
+        rows_b = self._rows(group, name_b, include_totals=True)
+        # One slot per group: the value of each segment, NaN where the group lacks it
+        value_a = np.full(len(self.groups), np.nan)
+        value_b = np.full(len(self.groups), np.nan)
+        value_a[self.group_codes[rows_a]] = values[rows_a]
+        value_b[self.group_codes[rows_b]] = values[rows_b]
+        gap = value_a - value_b
+        codes = np.flatnonzero(~np.isnan(gap))
+        codes = codes[np.argsort(-np.abs(gap[codes]), kind="stable")]
+        result = [
+            {GROUP_COLUMN: str(self.groups[code]), name_a: float(value_a[code]), name_b: float(value_b[code]),
+             "Écart": round(float(gap[code]), 6)}
+            for code in codes[:limit]
+        ]
+        return {"count": len(codes), "segments": [name_a, name_b], "metric": metric, "rows": result}
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "rows": len(self),
+            "groups": self.groups.tolist(),
+            "segments": self.segments.tolist(),
+            "metrics": list(METRIC_LABELS)
+        }
+
+
+def format_context(result: Dict[str, Any], max_rows: int = 30) -> str:
+    """Render a query result as a compact table to prepend to a question."""
+    rows = result["rows"][:max_rows]
+    if not rows:
+        return "Données pré-calculées (moteur local) : aucun résultat."
+    columns = list(rows[0].keys())
+    lines = [
+        f"Données pré-calculées (moteur local, {len(rows)} ligne(s) sur {result['count']}) :",
+        " | ".join(columns),
+    ]
+    for row in rows:
+        lines.append(" | ".join("" if row[c] is None else (f"{row[c]:g}" if isinstance(row[c], float) else str(row[c]))
+                                for c in columns))
+    return "\n".join(lines)
+
+
+class DatasetStore:
+    """Query datasets of the assistants, saved under ``data_dir`` and linked to their ``assistants`` row.
+
+    Datasets are Arrow IPC files when pyarrow is installed, NumPy archives otherwise. Arrow files are
+    uncompressed by default and used in place through the memory mapping; ``compression`` lz4 or zstd
+    makes them smaller on disk, at the cost of decompressing them on every load.
+    The most recently used ones are kept loaded.
+    """
+
+    def __init__(self, db: DatabaseManager, data_dir: str = "datasets", max_loaded: int = 16,
+                 compression: str = "none"):
+        if compression not in ARROW_COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}', expected one of: {', '.join(ARROW_COMPRESSIONS)}")
+        self.db = db
+        self.data_dir = data_dir
+        self.max_loaded = max_loaded
+        self.compression = compression
+        self.extension = ".arrow" if pa is not None else ".npz"
+        self._loaded: "OrderedDict[str, TGIDataset]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        os.makedirs(data_dir, exist_ok=True)
+
+    def save(self, assistant_id: str, dataset: TGIDataset) -> str:
+        """Write an assistant's dataset and record its path on the assistant."""
+        path = os.path.join(self.data_dir, f"{assistant_id}{self.extension}")
+        dataset.save(path, self.compression)
+        self.db.set_assistant_dataset_path(assistant_id, path)
+        with self._lock:
+            self._loaded.pop(assistant_id, None)
+        return path
+
+    def get(self, assistant_id: str) -> Optional[TGIDataset]:
+        """Dataset of an assistant, or None if it has none (not a TGI file)."""
+        with self._lock:
+            dataset = self._loaded.get(assistant_id)
+            if dataset is not None:
+                self._loaded.move_to_end(assistant_id)
+                return dataset
+        path = self.db.get_assistant_dataset_path(assistant_id)
+        if path is None:
+            return None
+        start = time.perf_counter()
+        try:
+            dataset = TGIDataset.load(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self.loads += 1
+            self.load_seconds += time.perf_counter() - start
+            self._loaded[assistant_id] = dataset
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return dataset
+
+    def delete(self, assistant_id: str):
+        path = self.db.get_assistant_dataset_path(assistant_id)
+        with self._lock:
+            self._loaded.pop(assistant_id, None)
+        if path is None:
+            return
+        self.db.set_assistant_dataset_path(assistant_id, None)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def query(self, assistant_id: str, op: str, **params) -> Optional[Dict[str, Any]]:
+        """Run ``filter``, ``top`` or ``compare`` on an assistant's dataset (None without dataset)."""
+        if op not in ("filter", "top", "compare"):
+            raise ValueError(f"Unknown query '{op}', expected filter, top or compare")
+        dataset = self.get(assistant_id)
+        if dataset is None:
+            return None
+        start = time.perf_counter()
+        result = getattr(dataset, op)(**params)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += elapsed
+        result["elapsed_ms"] = round(elapsed * 1000, 3)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'loaded': len(self._loaded),
+                'max_loaded': self.max_loaded,
+                'format': self.extension.lstrip('.'),
+                'compression': self.compression if pa is not None else None,
+                'loads': self.loads,
+                'avg_load_ms': round(self.load_seconds / self.loads * 1000, 3) if self.loads else 0.0,
+                'queries': self.queries,
+                'avg_query_ms': round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0.0
+            }
@@ -0,0 +1,92 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from database import DatabaseManager
+
+
+def api_key_hash(api_key: str) -> str:
+    """Stable identifier of an API key that does not reveal it."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class ThreadRegistry:
+    """Conversation threads per (assistant, user, API key), stored in SQLite.
+
+    Threads survive restarts and are shared by every worker process using the same database.
+    A bounded in-process LRU cache answers repeated lookups; its entries are re-validated
+    against the database after ``cache_seconds`` so that a thread cleared by another worker
+    is not reused for long. Threads unused for ``ttl_seconds`` expire and are replaced.
+    """
+
+    def __init__(self, db: DatabaseManager, ttl_seconds: float = 7 * 86400, max_entries: int = 10000,
+                 cache_seconds: float = 60.0):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.cache_seconds = cache_seconds
+        self._cache: "OrderedDict[Tuple[str, int, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key: Tuple[str, int, str], thread_id: str):
+        with self._lock:
+            self._cache[key] = (thread_id, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, assistant_id: str, user_id: int, api_key: str) -> Optional[str]:
+        """Thread id of the conversation, or None if there is none (or it expired)."""
+        key = (assistant_id, user_id, api_key_hash(api_key))
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.monotonic() - entry[1] < self.cache_seconds:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        thread_id = self.db.get_thread(*key, self.ttl_seconds)
+        if thread_id:
+            self._remember(key, thread_id)
+        else:
+            with self._lock:
+                self._cache.pop(key, None)
+        return thread_id
+
+    def put(self, assistant_id: str, user_id: int, api_key: str, thread_id: str) -> str:
+        """Register a new thread; returns the thread to use if another worker registered one first."""
+        key = (assistant_id, user_id, api_key_hash(api_key))
+        thread_id = self.db.save_thread(*key, thread_id, self.ttl_seconds)
+        self._remember(key, thread_id)
+        return thread_id
+
+    def forget(self, assistant_id: str):
+        """Drop every thread of an assistant (history cleared or assistant deleted)."""
+        self.db.delete_threads(assistant_id)
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == assistant_id]:
+                del self._cache[key]
+
+    def purge_expired(self) -> int:
+        """Delete expired threads from the database; returns how many were removed."""
+        return self.db.purge_threads(self.ttl_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cached': len(self._cache),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'ttl_seconds': self.ttl_seconds
+            }
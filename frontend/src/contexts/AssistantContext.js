@@ -77,25 +77,57 @@ export const AssistantProvider = ({ children }) => {
     }
   };
 
+  const STAGE_LABELS = {
+    convert: 'Conversion du fichier',
+    upload: 'Envoi du fichier',
+    index: 'Indexation',
+    create_assistant: 'Création de l\'assistant',
+  };
+
+  // Poll a background job until it succeeds or fails, reporting the current stage
+  const waitForJob = async (jobId, onStage) => {
+    for (;;) {
+      const { data: job } = await assistantAPI.getJob(jobId);
+      if (job.status === 'succeeded') {
+        return job;
+      }
+      if (job.status === 'failed') {
+        throw Object.assign(new Error(job.error), { response: { data: { detail: job.error } } });
+      }
+      if (job.current_stage) {
+        onStage(job.current_stage);
+      }
+      await new Promise(resolve => setTimeout(resolve, 1500));
+    }
+  };
+
   const createAssistant = async (assistantData, file) => {
+    const toastId = toast.loading('Création de l\'assistant en file d\'attente...');
     try {
       setLoading(true);
       const formData = new FormData();
       formData.append('name', assistantData.name);
       formData.append('theme', assistantData.theme);
+      if (assistantData.ingestionMode) {
+        formData.append('ingestion_mode', assistantData.ingestionMode);
+      }
       formData.append('file', file);
 
+      // The API answers at once with a job id; conversion, upload and indexing run in the background
       const response = await assistantAPI.createAssistant(formData);
+      const job = await waitForJob(response.data.job_id, (stage) => {
+        toast.loading(`${STAGE_LABELS[stage] || stage}...`, { id: toastId });
+      });
       
       // Reload assistants list
       await loadAssistants();
       
-      toast.success(`Assistant "${assistantData.name}" créé avec succès!`);
-      return { success: true, data: response.data };
+      toast.success(`Assistant "${assistantData.name}" créé avec succès!`, { id: toastId });
+      return { success: true, data: { ...response.data, assistant_id: job.result?.assistant_id } };
     } catch (error) {
       console.error('Error creating assistant:', error);
       const errorMessage = error.response?.data?.detail || 'Erreur lors de la création de l\'assistant';
-      toast.error(errorMessage);
+      toast.error(errorMessage, { id: toastId });
       return { success: false, error: errorMessage };
     } finally {
       setLoading(false);
@@ -135,44 +167,47 @@ export const AssistantProvider = ({ children }) => {
   };
 
   const sendMessage = async (assistantId, message) => {
+    // Add user message to chat history immediately, followed by the assistant answer being streamed
+    const userMessage = {
+      role: 'user',
+      content: message,
+      timestamp: new Date().toISOString()
+    };
+    const assistantMessage = {
+      role: 'assistant',
+      content: '',
+      timestamp: new Date().toISOString()
+    };
+    
     try {
-      // Add user message to chat history immediately
-      const userMessage = {
-        role: 'user',
-        content: message,
-        timestamp: new Date().toISOString()
-      };
-      
       setChatHistory(prev => ({
         ...prev,
-        [assistantId]: [...(prev[assistantId] || []), userMessage]
+        [assistantId]: [...(prev[assistantId] || []), userMessage, assistantMessage]
       }));
 
-      // Send message to API
-      const response = await assistantAPI.sendMessage(assistantId, message);
-      
-      // Add assistant response to chat history
-      const assistantMessage = {
-        role: 'assistant',
-        content: response.data.response,
-        timestamp: new Date().toISOString()
-      };
-      
-      setChatHistory(prev => ({
-        ...prev,
-        [assistantId]: [...(prev[assistantId] || []).slice(0, -1), userMessage, assistantMessage]
-      }));
+      // Stream the answer, replacing the last message as fragments arrive
+      let content = '';
+      await assistantAPI.streamMessage(assistantId, message, (delta) => {
+        content += delta;
+        const updated = { ...assistantMessage, content };
+        setChatHistory(prev => ({
+          ...prev,
+          [assistantId]: [...(prev[assistantId] || []).slice(0, -1), updated]
+        }));
+      });
 
-      return { success: true, response: response.data.response };
+      return { success: true, response: content };
     } catch (error) {
       console.error('Error sending message:', error);
       const errorMessage = error.response?.data?.detail || 'Erreur lors de l\'envoi du message';
       toast.error(errorMessage);
       
-      // Remove the user message that was added optimistically
+      // Remove the messages that were added optimistically
       setChatHistory(prev => ({
         ...prev,
-        [assistantId]: (prev[assistantId] || []).slice(0, -1)
+        [assistantId]: (prev[assistantId] || []).filter(
+          msg => msg !== userMessage && !(msg.role === 'assistant' && msg.timestamp === assistantMessage.timestamp)
+        )
       }));
       
       return { success: false, error: errorMessage };
@@ -64,6 +64,11 @@ const Assistants = () => {
               {assistant.file_type.toUpperCase()}
             </span>
           )}
+          {assistant.indexing_status && assistant.indexing_status !== 'completed' && (
+            <span className="px-2 py-1 bg-yellow-100 text-yellow-800 rounded text-xs font-medium">
+              {assistant.indexing_status === 'in_progress' ? 'Indexation en cours' : 'Indexation échouée'}
+            </span>
+          )}
         </div>
 
         <div className="flex items-center gap-2 text-sm text-gray-600">
@@ -24,6 +24,7 @@ const CreateAssistant = () => {
   const [formData, setFormData] = useState({
     name: '',
     theme: '',
+    ingestionMode: '',
     file: null
   });
   const [progress, setProgress] = useState({
@@ -298,6 +299,26 @@ const CreateAssistant = () => {
                   </p>
                 </div>
 
+                <div>
+                  <label className="block text-sm font-medium text-gray-700 mb-2">
+                    Découpage des données TGI
+                  </label>
+                  <select
+                    name="ingestionMode"
+                    value={formData.ingestionMode}
+                    onChange={handleInputChange}
+                    className="input-field"
+                  >
+                    <option value="">Par défaut (configuration du serveur)</option>
+                    <option value="single">Un seul fichier</option>
+                    <option value="groups">Un document par groupe interviewé</option>
+                    <option value="segments">Un document par famille de segments</option>
+                  </select>
+                  <p className="text-xs text-gray-500 mt-1">
+                    Des documents par groupe réduisent les tokens consommés par chaque réponse
+                  </p>
+                </div>
+
                 <div className="bg-blue-50 border border-blue-200 rounded-lg p-4">
                   <h3 className="font-medium text-blue-900 mb-2">À propos des assistants</h3>
                   <p className="text-sm text-blue-700">
@@ -47,12 +47,24 @@ export const authAPI = {
   
   logout: () => 
     api.post('/auth/logout'),
+  
+  updateUserRole: (userId, role) => 
+    api.put(`/admin/users/${userId}/role`, { role }),
 };
 
 // Assistant API
 export const assistantAPI = {
-  getAssistants: () => 
-    api.get('/assistants'),
+  // Follows the X-Next-Cursor header so callers still receive the full list
+  getAssistants: async () => {
+    const response = await api.get('/assistants');
+    let cursor = response.headers['x-next-cursor'];
+    while (cursor) {
+      const page = await api.get('/assistants', { params: { cursor } });
+      response.data = response.data.concat(page.data);
+      cursor = page.headers['x-next-cursor'];
+    }
+    return response;
+  },
   
   createAssistant: (formData) => {
     const config = {
@@ -63,17 +75,90 @@ export const assistantAPI = {
     return api.post('/assistants', formData, config);
   },
   
+  getJob: (jobId) => 
+    api.get(`/jobs/${jobId}`),
+  
   deleteAssistant: (assistantId) => 
     api.delete(`/assistants/${assistantId}`),
   
   sendMessage: (assistantId, message) => 
     api.post(`/assistants/${assistantId}/message`, { message }),
   
+  // Streams the answer over server-sent events; onDelta receives each text fragment.
+  // Resolves with the final "done" payload (token usage, response time, time-to-first-byte).
+  streamMessage: async (assistantId, message, onDelta) => {
+    const headers = { 'Content-Type': 'application/json' };
+    const token = localStorage.getItem('token');
+    if (token) {
+      headers.Authorization = `Bearer ${token}`;
+    }
+    const openaiApiKey = localStorage.getItem('openai_api_key');
+    if (openaiApiKey) {
+      headers['X-OpenAI-Key'] = openaiApiKey;
+    }
+    
+    const response = await fetch(`${api.defaults.baseURL}/assistants/${assistantId}/message/stream`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({ message }),
+    });
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
+      if (response.status === 401) {
+        localStorage.removeItem('token');
+        localStorage.removeItem('user');
+        window.location.href = '/';
+      }
+      // Same shape as axios errors so callers can read error.response.data.detail
+      throw Object.assign(new Error(data.detail || response.statusText), {
+        response: { status: response.status, data },
+      });
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const raw of events) {
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (event === 'delta') {
+          onDelta(data.content);
+        } else if (event === 'error') {
+          throw Object.assign(new Error(data.detail), { response: { data } });
+        } else if (event === 'done') {
+          result = data;
+        }
+      }
+    }
+    return result;
+  },
+  
   getChatHistory: (assistantId) => 
     api.get(`/assistants/${assistantId}/messages`),
   
   clearChatHistory: (assistantId) => 
     api.delete(`/assistants/${assistantId}/messages`),
+  
+  // Local queries on the converted TGI data (no OpenAI call)
+  getDataset: (assistantId) => 
+    api.get(`/assistants/${assistantId}/dataset`),
+  
+  queryDataset: (assistantId, query) => 
+    api.post(`/assistants/${assistantId}/query`, query),
+  
+  // Conversation history sent with each question (strategy, last_messages, summary)
+  getContextSettings: (assistantId) => 
+    api.get(`/assistants/${assistantId}/context`),
+  
+  updateContextSettings: (assistantId, settings) => 
+    api.put(`/assistants/${assistantId}/context`, settings),
 };
 
 // Dashboard API